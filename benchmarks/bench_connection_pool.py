@@ -0,0 +1,72 @@
+"""Compare requests per second against the database repository with each kind of connection pool, under concurrent
+load from several client threads.
+
+Usage: python -m benchmarks.bench_connection_pool [threads ...]
+"""
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from sqlalchemy.orm import clear_mappers
+
+from games import create_app
+from games.adapters.engine import pool_statistics
+
+DEFAULT_THREADS = [1, 4, 16]
+POOLS = ["null", "queue", "singleton"]
+REQUESTS_PER_THREAD = 50
+URLS = ["/gameDescription?id=7940", "/gamesList", "/api/search/suggest?q=sp"]
+DATA_PATH = Path("games") / "adapters" / "data"
+
+
+def make_app(database_uri: str, pool: str, testing: bool):
+    clear_mappers()
+    return create_app({
+        "TESTING": "True" if testing else "False",
+        "REPOSITORY": "database",
+        "SQLALCHEMY_DATABASE_URI": database_uri,
+        "SQLALCHEMY_ECHO": False,
+        "DATABASE_POOL": pool,
+        "TEST_DATA_PATH": DATA_PATH,
+    })
+
+
+def requests_per_second(app, threads: int) -> float:
+    def client_run(_):
+        client = app.test_client()
+        for number in range(REQUESTS_PER_THREAD):
+            assert client.get(URLS[number % len(URLS)]).status_code == 200
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as executor:
+        list(executor.map(client_run, range(threads)))
+    return threads * REQUESTS_PER_THREAD / (time.perf_counter() - started)
+
+
+def main(thread_counts):
+    print(f"{'pool':>10} {'threads':>8} {'requests/s':>11} {'connects':>9} {'checkouts':>10} {'wait (ms)':>10} "
+          f"{'stmt (ms)':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = f"sqlite:///{Path(tmp) / 'bench_pool.db'}"
+        # Load the catalogue once, then start an app on the existing database for each pool
+        app = make_app(database_uri, "null", testing=True)
+        for engine in {app.extensions["database_engine"], app.extensions["database_read_engine"]}:
+            engine.dispose()
+        for pool in POOLS:
+            for threads in thread_counts:
+                app = make_app(database_uri, pool, testing=False)
+                # Every request here is a GET, so it is served by the read engine
+                engine = app.extensions["database_read_engine"]
+                rate = requests_per_second(app, threads)
+                statistics = pool_statistics(engine)
+                print(f"{pool:>10} {threads:>8} {rate:>11.0f} {statistics['connections_opened']:>9} "
+                      f"{statistics['checkouts']:>10} {statistics['average_wait'] * 1000:>10.3f} "
+                      f"{statistics['average_statement_time'] * 1000:>10.3f}")
+                engine.dispose()
+                app.extensions["database_engine"].dispose()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_THREADS)
@@ -0,0 +1,35 @@
+"""Time SqlAlchemyRepository.bulk_load against synthetic catalogues of increasing size.
+
+Usage: python -m benchmarks.bench_database_populate [rows ...]
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from benchmarks.synthetic import synthetic_games
+from games.adapters.database_repository import SqlAlchemyRepository
+from games.adapters.orm import metadata, map_model_to_tables
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+
+def main(sizes):
+    clear_mappers()
+    map_model_to_tables()
+    print(f"{'games':>10} {'rows':>10} {'seconds':>10} {'rows/s':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for games in sizes:
+            # A file database, so every commit pays for a real fsync as it would in production
+            engine = create_engine(f"sqlite:///{Path(tmp) / f'bench_{games}.db'}")
+            metadata.create_all(engine)
+            repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+            stats = repo.bulk_load(synthetic_games(games))
+            print(f"{games:>10} {stats['rows']:>10} {stats['seconds']:>10.2f} {stats['rows_per_second']:>10.0f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,56 @@
+"""Compare LIKE scans with FTS5 MATCH queries on the games table of a synthetic SQLite database.
+
+Usage: python -m benchmarks.bench_fts_search [games ...]
+"""
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from benchmarks.synthetic import synthetic_games
+from games.adapters.database_repository import SqlAlchemyRepository, search_match_expression
+from games.adapters.orm import metadata, map_model_to_tables, SEARCH_TABLE
+
+DEFAULT_SIZES = [10_000, 1_000_000]
+QUERIES = ["witcher", "12345", "zombie survival"]
+
+COUNT_LIKE = text("SELECT count(*) FROM games WHERE game_title LIKE :like OR game_description LIKE :like")
+COUNT_MATCH = text(f"SELECT count(*) FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH :match")
+
+
+def per_call_ms(function, number: int = 5) -> float:
+    return timeit.timeit(function, number=number) / number * 1000
+
+
+def main(sizes):
+    clear_mappers()
+    map_model_to_tables()
+    print(f"{'games':>10} {'query':>16} {'LIKE hits':>10} {'LIKE (ms)':>10} {'MATCH hits':>11} {'MATCH (ms)':>11} "
+          f"{'top 20 (ms)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for games in sizes:
+            engine = create_engine(f"sqlite:///{Path(tmp) / f'bench_{games}.db'}")
+            metadata.create_all(engine)
+            repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+            repo.bulk_load(synthetic_games(games))
+
+            with engine.connect() as connection:
+                for query in QUERIES:
+                    # LIKE can only look for the whole query as a substring, so give it the first word
+                    like = {"like": f"%{query.split()[0]}%"}
+                    match = {"match": search_match_expression(query)}
+                    like_hits = connection.execute(COUNT_LIKE, like).scalar()
+                    like_ms = per_call_ms(lambda: connection.execute(COUNT_LIKE, like).scalar())
+                    match_hits = connection.execute(COUNT_MATCH, match).scalar()
+                    match_ms = per_call_ms(lambda: connection.execute(COUNT_MATCH, match).scalar())
+                    ranked_ms = per_call_ms(lambda: repo.get_games_by_relevance(query, 20))
+                    print(f"{games:>10} {query:>16} {like_hits:>10} {like_ms:>10.1f} {match_hits:>11} "
+                          f"{match_ms:>11.1f} {ranked_ms:>12.1f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
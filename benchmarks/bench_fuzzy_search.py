@@ -0,0 +1,47 @@
+"""Time typo-tolerant title search with the deletion index, against comparing the query with every title word.
+
+Usage: python -m benchmarks.bench_fuzzy_search [games ...]
+"""
+import sys
+import time
+import timeit
+
+from benchmarks.synthetic import synthetic_games
+from games.adapters.fuzzy_index import FuzzyTitleIndex, edit_distance
+from games.adapters.text_index import tokenize
+
+DEFAULT_SIZES = [10_000, 100_000]
+QUERIES = ["Wticher", "skyrm zombei", "dargon qeust"]
+
+
+def per_call_ms(function, number: int = 5) -> float:
+    return timeit.timeit(function, number=number) / number * 1000
+
+
+def scan(titles, query: str) -> list:
+    # What a fuzzy search costs without an index: a distance calculation for every word of every title
+    def near(query_word, title):
+        return any(edit_distance(query_word, word, 2) <= 2 for word in tokenize(title))
+
+    query_words = tokenize(query)
+    return [key for key, title in titles if all(near(query_word, title) for query_word in query_words)]
+
+
+def main(sizes):
+    print(f"{'games':>10} {'build (s)':>10} {'query':>14} {'matches':>9} {'index (ms)':>11} {'scan (ms)':>10}")
+    for size in sizes:
+        titles = [(game.game_id, game.title) for game in synthetic_games(size)]
+
+        started = time.perf_counter()
+        index = FuzzyTitleIndex(titles)
+        build = time.perf_counter() - started
+
+        for query in QUERIES:
+            indexed = per_call_ms(lambda: index.search(query))
+            scanned = per_call_ms(lambda: scan(titles, query), number=1)
+            print(f"{size:>10} {build:>10.2f} {query:>14} {len(index.search(query)):>9} {indexed:>11.2f} "
+                  f"{scanned:>10.0f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
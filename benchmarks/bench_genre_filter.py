@@ -0,0 +1,40 @@
+"""Time genre filtering in the memory repository, for a full result list and for a single page of results.
+
+Usage: python -m benchmarks.bench_genre_filter [games ...]
+"""
+import sys
+import timeit
+
+from benchmarks.synthetic import synthetic_games
+from games.adapters.memory_repository import MemoryRepository
+from games.domainmodel.model import Genre
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+QUERIES = {
+    "one genre": ([Genre("Action")], False),
+    "OR of two": ([Genre("Action"), Genre("Racing")], False),
+    "AND of two": ([Genre("Action"), Genre("Racing")], True),
+}
+
+
+def per_call_ms(function, number: int = 20) -> float:
+    return timeit.timeit(function, number=number) / number * 1000
+
+
+def main(sizes):
+    print(f"{'games':>10} {'query':>12} {'matches':>9} {'count (ms)':>11} {'page (ms)':>10} {'full (ms)':>10}")
+    for size in sizes:
+        repo = MemoryRepository()
+        repo.add_games(synthetic_games(size))
+        index = repo.genre_index
+        for name, (genres, match_all) in QUERIES.items():
+            genre_names = [genre.genre_name for genre in genres]
+            count = per_call_ms(lambda: index.count(genre_names, match_all))
+            page = per_call_ms(lambda: index.games(genre_names, match_all, 0, 6))
+            full = per_call_ms(lambda: repo.get_games_by_genres(genres, match_all), number=3)
+            print(f"{size:>10} {name:>12} {index.count(genre_names, match_all):>9} {count:>11.3f} {page:>10.3f} "
+                  f"{full:>10.2f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
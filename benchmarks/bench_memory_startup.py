@@ -0,0 +1,34 @@
+"""Time MemoryRepository startup against synthetic catalogues of increasing size.
+
+Usage: python -m benchmarks.bench_memory_startup [rows ...]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_synthetic_csv
+from games.adapters.memory_repository import MemoryRepository, populate
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+
+
+def time_populate(data_path: Path) -> float:
+    repo = MemoryRepository()
+    start = time.perf_counter()
+    populate(repo, data_path)
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'seconds':>10} {'us/row':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            write_synthetic_csv(Path(tmp) / "games.csv", rows)
+            seconds = time_populate(Path(tmp))
+            # Near-linear scaling shows up as a roughly constant cost per row
+            print(f"{rows:>10} {seconds:>10.3f} {seconds / rows * 1e6:>10.2f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
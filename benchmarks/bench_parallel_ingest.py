@@ -0,0 +1,41 @@
+"""Compare sequential and multi-process parsing of a synthetic games.csv.
+
+Usage: python -m benchmarks.bench_parallel_ingest [rows] [workers ...]
+The speedup is bounded by the number of cores on the machine running it.
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_synthetic_csv
+from games.adapters.datareader.csvdatareader import GameFileCSVReader
+
+
+def time_read(path: Path, workers: int) -> float:
+    reader = GameFileCSVReader(str(path))
+    start = time.perf_counter()
+    if workers == 1:
+        reader.read_csv_file()
+    else:
+        reader.read_csv_file_parallel(workers)
+    return time.perf_counter() - start
+
+
+def main(rows: int, worker_counts):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic_csv(Path(tmp) / "games.csv", rows)
+        baseline = time_read(path, 1)
+        print(f"{rows} rows, {os.cpu_count()} cores")
+        print(f"{'workers':>8} {'seconds':>10} {'speedup':>8}")
+        print(f"{1:>8} {baseline:>10.2f} {1.0:>8.2f}")
+        for workers in worker_counts:
+            seconds = time_read(path, workers)
+            print(f"{workers:>8} {seconds:>10.2f} {baseline / seconds:>8.2f}")
+
+
+if __name__ == "__main__":
+    cores = os.cpu_count() or 1
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000,
+         [int(arg) for arg in sys.argv[2:]] or [workers for workers in (2, 4, 8, 16) if workers <= cores] or [2])
@@ -0,0 +1,45 @@
+"""Time MemoryRepository point lookups as the catalogue grows. Latency should stay flat.
+
+Usage: python -m benchmarks.bench_point_lookups [games ...]
+"""
+import random
+import sys
+import timeit
+
+from benchmarks.synthetic import synthetic_games
+from games.adapters.memory_repository import MemoryRepository
+from games.domainmodel.model import User
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+LOOKUPS = 10_000
+
+
+def main(sizes):
+    print(f"{'games':>10} {'game_id (us)':>14} {'user (us)':>10} {'genre (us)':>11} {'publisher (us)':>15}")
+    rng = random.Random(235)
+    for size in sizes:
+        repo = MemoryRepository()
+        repo.add_games(synthetic_games(size))
+        repo.add_genres(genre for game in repo.get_all_games() for genre in game.genres)
+        repo.add_publishers(game.publisher for game in repo.get_all_games())
+        for user_number in range(1000):
+            repo.add_user(User(f"user{user_number}", "benchmark password"))
+
+        game_ids = [rng.randint(1, size) for _ in range(LOOKUPS)]
+        user_names = [f"User{rng.randrange(1000)}" for _ in range(LOOKUPS)]
+        genre_names = [rng.choice(repo.get_all_genres()).genre_name for _ in range(LOOKUPS)]
+        publisher_names = [rng.choice(repo.get_all_publishers()).publisher_name for _ in range(LOOKUPS)]
+
+        timings = [
+            timeit.timeit(lambda: [repo.get_game_by_id(game_id) for game_id in game_ids], number=1),
+            timeit.timeit(lambda: [repo.get_user(user_name) for user_name in user_names], number=1),
+            timeit.timeit(lambda: [repo.get_genre(genre_name) for genre_name in genre_names], number=1),
+            timeit.timeit(lambda: [repo.get_publisher(name) for name in publisher_names], number=1),
+        ]
+        per_lookup = [seconds / LOOKUPS * 1e6 for seconds in timings]
+        print(f"{size:>10} {per_lookup[0]:>14.3f} {per_lookup[1]:>10.3f} {per_lookup[2]:>11.3f} "
+              f"{per_lookup[3]:>15.3f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,37 @@
+"""Time building the BM25 index over synthetic games, and ranked queries against it.
+
+Usage: python -m benchmarks.bench_relevance_search [games ...]
+"""
+import sys
+import time
+import timeit
+
+from benchmarks.synthetic import synthetic_games
+from games.adapters.text_index import BM25Index
+
+DEFAULT_SIZES = [1_000, 100_000]
+QUERIES = ["zombie survival", "witcher skyrim dragon", "ninja", "12345"]
+LIMIT = 600
+
+
+def per_call_ms(function, number: int = 10) -> float:
+    return timeit.timeit(function, number=number) / number * 1000
+
+
+def main(sizes):
+    print(f"{'games':>10} {'build (s)':>10} {'query':>22} {'matches':>9} {'top 600 (ms)':>13}")
+    for size in sizes:
+        documents = [(game.game_id, game.title, game.description) for game in synthetic_games(size)]
+
+        started = time.perf_counter()
+        index = BM25Index(documents)
+        build = time.perf_counter() - started
+
+        for query in QUERIES:
+            matches = len(index.search(query))
+            ranked = per_call_ms(lambda: index.search(query, LIMIT))
+            print(f"{size:>10} {build:>10.2f} {query:>22} {matches:>9} {ranked:>13.2f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
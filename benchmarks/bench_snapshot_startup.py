@@ -0,0 +1,37 @@
+"""Compare memory repository startup from games.csv against startup from the catalogue snapshot.
+
+Usage: python -m benchmarks.bench_snapshot_startup [rows ...]
+"""
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.synthetic import write_synthetic_csv
+from games.adapters.memory_repository import MemoryRepository, populate
+
+DEFAULT_SIZES = [1_000, 100_000]
+
+
+def time_populate(data_path: Path, use_snapshot: bool) -> float:
+    start = time.perf_counter()
+    populate(MemoryRepository(), data_path, use_snapshot=use_snapshot)
+    return time.perf_counter() - start
+
+
+def main(sizes):
+    print(f"{'rows':>10} {'csv (s)':>10} {'first (s)':>10} {'snapshot (s)':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for rows in sizes:
+            data_path = Path(tmp) / str(rows)
+            data_path.mkdir()
+            write_synthetic_csv(data_path / "games.csv", rows)
+            parse = time_populate(data_path, False)
+            # The first startup parses the CSV file and writes the snapshot, later ones load it
+            first = time_populate(data_path, True)
+            cached = time_populate(data_path, True)
+            print(f"{rows:>10} {parse:>10.3f} {first:>10.3f} {cached:>12.3f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,47 @@
+"""Micro-benchmark sorting and inserting games (and sorting history) with parsed keys versus strptime.
+
+Usage: python -m benchmarks.bench_sort_keys [games]
+"""
+import sys
+import timeit
+from datetime import datetime
+
+from benchmarks.synthetic import synthetic_games
+from games.adapters.memory_repository import MemoryRepository
+from games.domainmodel.model import User, History, RELEASE_DATE_FORMAT, HISTORY_TIMESTAMP_FORMAT
+
+INSERTS = 100
+
+
+def report(name: str, seconds: float, repeats: int):
+    print(f"{name:<40} {seconds / repeats * 1000:>10.2f} ms")
+
+
+def main(size: int):
+    games = list(synthetic_games(size))
+    print(f"{size} games")
+
+    report("sort, strptime key", timeit.timeit(
+        lambda: sorted(games, key=lambda x: datetime.strptime(x.release_date, RELEASE_DATE_FORMAT), reverse=True),
+        number=3), 3)
+    report("sort, release_ordinal key", timeit.timeit(
+        lambda: sorted(games, key=lambda x: -x.release_ordinal), number=3), 3)
+
+    # Inserting into an already loaded repository, which used to re-sort (and re-parse) everything each time
+    repo = MemoryRepository()
+    repo.add_games(games[INSERTS:])
+    extra = games[:INSERTS]
+    report(f"add_game x{INSERTS} into {size - INSERTS}", timeit.timeit(
+        lambda: [repo.add_game(game) for game in extra], number=1), 1)
+
+    user = User("benchmark", "benchmark password")
+    history = [History(user, str(entry)) for entry in range(size)]
+    report("history sort, strptime key", timeit.timeit(
+        lambda: sorted(history, key=lambda x: datetime.strptime(x.datetimestamp, HISTORY_TIMESTAMP_FORMAT)),
+        number=3), 3)
+    report("history sort, timestamp_key", timeit.timeit(
+        lambda: sorted(history, key=lambda x: x.timestamp_key), number=3), 3)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,88 @@
+"""Time genre filtering in the SQL repository on a synthetic SQLite database, for AND and OR filters of up to five
+genres: counting the matches, the statement that picks the ids of the first page, fetching the first page of games,
+and fetching a page deep into the results by keyset cursor.
+
+Counts join the games to the matching ids found with one GROUP BY ... HAVING over game_genres, and pages check each
+game with a correlated EXISTS per genre. Each is also timed the other way round, to show why.
+
+Usage: python -m benchmarks.bench_sql_genre_filter [games ...]
+"""
+import sys
+import tempfile
+import timeit
+from pathlib import Path
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from benchmarks.synthetic import synthetic_games
+from games.adapters.database_repository import SqlAlchemyRepository, NEWEST_FIRST, _filter_clauses, _genre_matches
+from games.adapters.orm import metadata, map_model_to_tables, games_table
+from games.adapters.repository import GameFilters
+from games.domainmodel.model import Genre
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+GENRES = [Genre(name) for name in ["Action", "Indie", "RPG", "Casual", "Racing"]]
+QUERIES = {
+    "OR of five": GameFilters(GENRES),
+    "AND of two": GameFilters(GENRES[:2], match_all_genres=True),
+    "AND of five": GameFilters(GENRES, match_all_genres=True),
+    "AND of two + search": GameFilters(GENRES[:2], match_all_genres=True, search_query="dragon"),
+}
+PAGE = 6
+DEEP_PAGES = 50
+
+
+def per_call_ms(function, number: int = 3) -> float:
+    return timeit.timeit(function, number=number) / number * 1000
+
+
+def grouped_clauses(filters: GameFilters) -> list:
+    # The games' ids checked against the grouped matches, instead of a correlated EXISTS per genre
+    genre_names = [genre.genre_name for genre in filters.genres]
+    matches = select(_genre_matches(genre_names, filters.match_all_genres).c.game_id)
+    return [games_table.c.game_id.in_(matches)] + _filter_clauses(filters, genres=False)
+
+
+def main(sizes):
+    clear_mappers()
+    map_model_to_tables()
+    print(f"{'games':>10} {'query':>20} {'matches':>9} {'count (ms)':>11} {'EXISTS (ms)':>12} {'page ids (ms)':>14} "
+          f"{'grouped (ms)':>13} {'page 1 (ms)':>12} {f'page {DEEP_PAGES} (ms)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for games in sizes:
+            engine = create_engine(f"sqlite:///{Path(tmp) / f'bench_{games}.db'}")
+            metadata.create_all(engine)
+            repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+            repo.bulk_load(synthetic_games(games))
+
+            for name, filters in QUERIES.items():
+                matches = repo.count_games(filters)
+                count_ms = per_call_ms(lambda: repo.count_games(filters))
+                page_ms = per_call_ms(lambda: repo.get_games_page(filters, limit=PAGE))
+
+                # Walk to a deep page by cursor, then time fetching it
+                cursor = None
+                for _ in range(DEEP_PAGES - 1):
+                    _, cursor = repo.get_games_page(filters, limit=PAGE, cursor=cursor)
+                    if cursor is None:
+                        break
+                deep_ms = per_call_ms(lambda: repo.get_games_page(filters, limit=PAGE, cursor=cursor))
+
+                exists_count = select(func.count()).select_from(games_table).where(*_filter_clauses(filters))
+                page_ids = (select(games_table.c.game_id).where(*_filter_clauses(filters))
+                            .order_by(*NEWEST_FIRST).limit(PAGE + 1))
+                grouped_ids = (select(games_table.c.game_id).where(*grouped_clauses(filters))
+                               .order_by(*NEWEST_FIRST).limit(PAGE + 1))
+                with engine.connect() as connection:
+                    exists_count_ms = per_call_ms(lambda: connection.execute(exists_count).scalar())
+                    ids_ms = per_call_ms(lambda: connection.execute(page_ids).all())
+                    grouped_ids_ms = per_call_ms(lambda: connection.execute(grouped_ids).all())
+
+                print(f"{games:>10} {name:>20} {matches:>9} {count_ms:>11.1f} {exists_count_ms:>12.1f} {ids_ms:>14.1f} "
+                      f"{grouped_ids_ms:>13.1f} {page_ms:>12.1f} {deep_ms:>13.1f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,126 @@
+"""Compare SQLite's default journal and sync settings with WAL and the tuned pragmas, on a file database: how fast
+single-row commits go, and how many game pages reader threads manage while a writer thread keeps adding reviews.
+
+With the default rollback journal a reader has to wait while the writer commits, so read latency spikes whenever a
+review is written. In WAL mode readers see the last committed state and carry on.
+
+Usage: python -m benchmarks.bench_sqlite_pragmas [reader threads ...]
+"""
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker, clear_mappers
+
+from benchmarks.synthetic import synthetic_games
+from games.adapters.database_repository import SqlAlchemyRepository
+from games.adapters.engine import create_database_engine
+from games.adapters.orm import metadata, map_model_to_tables
+from games.adapters.repository import LOAD_LIST
+from games.domainmodel.model import User, create_review
+
+DEFAULT_THREADS = [1, 4]
+GAMES = 20_000
+USERS = 200
+SECONDS = 5
+CONFIGS = {
+    "defaults": {},
+    "wal": {"journal_mode": "WAL"},
+    # What config.Config sets by default
+    "wal tuned": {"journal_mode": "WAL", "synchronous": "NORMAL", "cache_size": -65536, "mmap_size": 268435456,
+                  "temp_store": "MEMORY", "busy_timeout": 5000},
+}
+
+
+def percentile(values: list, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def run(repo: SqlAlchemyRepository, readers: int) -> dict:
+    stop = threading.Event()
+    latencies = [[] for _ in range(readers)]
+    writes = [0]
+    errors = [0]
+
+    def read(number):
+        rng = random.Random(number)
+        while not stop.is_set():
+            game_id = rng.randint(1, GAMES)
+            started = time.perf_counter()
+            try:
+                # What the game description page reads
+                repo.get_game_by_id(game_id, LOAD_LIST)
+                repo.get_reviews_for_game(game_id)
+                repo.get_rating_summary(game_id)
+            except OperationalError:
+                errors[0] += 1
+            finally:
+                repo.reset_session()
+            latencies[number].append(time.perf_counter() - started)
+
+    def write():
+        rng = random.Random(235)
+        while not stop.is_set():
+            try:
+                user = repo.get_user(f"user{rng.randrange(USERS)}")
+                repo.add_review(create_review(user, repo.get_game_by_id(rng.randint(1, GAMES)), rng.randint(1, 5),
+                                              "A benchmark review"))
+                writes[0] += 1
+            except OperationalError:
+                errors[0] += 1
+            finally:
+                repo.reset_session()
+
+    threads = [threading.Thread(target=read, args=(number,)) for number in range(readers)]
+    threads.append(threading.Thread(target=write))
+    for thread in threads:
+        thread.start()
+    time.sleep(SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    every_latency = [latency for thread_latencies in latencies for latency in thread_latencies]
+    return {
+        "reads": len(every_latency) / SECONDS,
+        "p50": percentile(every_latency, 0.5) * 1000,
+        "p99": percentile(every_latency, 0.99) * 1000,
+        "writes": writes[0] / SECONDS,
+        "errors": errors[0],
+    }
+
+
+def main(thread_counts):
+    clear_mappers()
+    map_model_to_tables()
+    print(f"{'pragmas':>10} {'commits/s':>10} {'readers':>8} {'reads/s':>8} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+          f"{'writes/s':>9} {'errors':>7}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, pragmas in CONFIGS.items():
+            engine = create_database_engine(f"sqlite:///{Path(tmp) / f'{name}.db'}", "queue",
+                                            pool_size=max(thread_counts) + 1, sqlite_pragmas=pragmas)
+            metadata.create_all(engine)
+            repo = SqlAlchemyRepository(sessionmaker(bind=engine))
+            repo.bulk_load(synthetic_games(GAMES))
+
+            # One commit per row, as adding users and reviews does
+            started = time.perf_counter()
+            for number in range(USERS):
+                repo.add_user(User(f"user{number}", "benchmark password"))
+            commits_per_second = USERS / (time.perf_counter() - started)
+            repo.reset_session()
+
+            for readers in thread_counts:
+                result = run(repo, readers)
+                print(f"{name:>10} {commits_per_second:>10.0f} {readers:>8} {result['reads']:>8.0f} "
+                      f"{result['p50']:>9.2f} {result['p99']:>9.2f} {result['writes']:>9.0f} {result['errors']:>7}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_THREADS)
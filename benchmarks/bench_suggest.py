@@ -0,0 +1,44 @@
+"""Measure prefix suggestion latency (median and p99) and the size of the prefix index for synthetic titles.
+
+Usage: python -m benchmarks.bench_suggest [titles ...]
+"""
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic import WORDS, synthetic_games
+from games.adapters.prefix_index import PrefixIndex
+
+DEFAULT_SIZES = [100_000, 1_000_000]
+LOOKUPS = 10_000
+
+
+def main(sizes):
+    rng = random.Random(235)
+    print(f"{'titles':>10} {'build (s)':>10} {'index (MB)':>11} {'median (us)':>12} {'p99 (us)':>10}")
+    for size in sizes:
+        titles = [game.title for game in synthetic_games(size)]
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        index = PrefixIndex(titles)
+        build = time.perf_counter() - started
+        size_mb = tracemalloc.get_traced_memory()[0] / 1024 / 1024
+        tracemalloc.stop()
+
+        # What someone typing a title would send: the first few letters of a word
+        prefixes = [rng.choice(WORDS)[:rng.randint(1, 6)] for _ in range(LOOKUPS)]
+        timings = []
+        for prefix in prefixes:
+            started = time.perf_counter()
+            index.starting_with(prefix, 8)
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        timings.sort()
+        print(f"{size:>10} {build:>10.2f} {size_mb:>11.1f} {statistics.median(timings):>12.1f} "
+              f"{timings[int(len(timings) * 0.99)]:>10.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,39 @@
+"""Time title substring search in the memory repository, with the trigram index and with a scan of every title.
+
+Usage: python -m benchmarks.bench_title_search [games ...]
+"""
+import sys
+import time
+import timeit
+
+from benchmarks.synthetic import synthetic_games
+from games.adapters.memory_repository import MemoryRepository
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+QUERIES = ["Witcher Skyrim 4", "Zombie Survival", "Ninja", "1234"]
+
+
+def per_call_ms(function, number: int = 20) -> float:
+    return timeit.timeit(function, number=number) / number * 1000
+
+
+def main(sizes):
+    print(f"{'games':>10} {'build (s)':>10} {'query':>18} {'matches':>9} {'index (ms)':>11} {'scan (ms)':>10}")
+    for size in sizes:
+        repo = MemoryRepository()
+        repo.add_games(synthetic_games(size))
+        games = repo.get_all_games()
+
+        started = time.perf_counter()
+        repo.title_index
+        build = time.perf_counter() - started
+
+        for query in QUERIES:
+            indexed = per_call_ms(lambda: repo.get_games_by_name_query(query))
+            scan = per_call_ms(lambda: [game for game in games if query in game.title], number=3)
+            matches = len(repo.get_games_by_name_query(query))
+            print(f"{size:>10} {build:>10.2f} {query:>18} {matches:>9} {indexed:>11.3f} {scan:>10.2f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
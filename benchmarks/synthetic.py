@@ -0,0 +1,68 @@
+import csv
+import random
+from pathlib import Path
+
+from games.domainmodel.model import Game, Genre, Publisher
+
+# Same header as the Steam export in games/adapters/data/games.csv
+HEADERS = ["AppID", "Name", "Release date", "Price", "About the game", "Supported languages", "Reviews",
+           "Header image", "Website", "Windows", "Mac", "Linux", "Achievements", "Recommendations", "Notes",
+           "Developers", "Publishers", "Categories", "Genres", "Tags", "Screenshots", "Movies"]
+
+MONTHS = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+
+GENRES = ["Action", "Adventure", "Casual", "Indie", "RPG", "Simulation", "Strategy", "Racing", "Sports",
+          "Violent", "Free to Play", "Early Access", "Massively Multiplayer", "Education", "Utilities"]
+
+WORDS = ["zombie", "survival", "space", "quest", "dungeon", "legend", "racing", "farm", "tactics", "ninja",
+         "shadow", "kingdom", "puzzle", "arena", "galaxy", "witcher", "skyrim", "machine", "island", "dragon"]
+
+
+def synthetic_row(app_id: int, rng: random.Random) -> list:
+    title = " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(1, 4)))
+    release_date = f"{rng.choice(MONTHS)} {rng.randint(1, 28)}, {rng.randint(1998, 2023)}"
+    # Descriptions contain commas, quotes and newlines, just like the real export
+    description = (f'A "{rng.choice(WORDS)}" game about {rng.choice(WORDS)}, {rng.choice(WORDS)} and more.\n'
+                   f'Features: {", ".join(rng.sample(WORDS, 5))}.')
+    genres = ",".join(rng.sample(GENRES, rng.randint(1, 3)))
+    row = dict.fromkeys(HEADERS, "")
+    row.update({
+        "AppID": str(app_id),
+        "Name": f"{title} {app_id}",
+        "Release date": release_date,
+        "Price": f"{rng.randint(0, 6000) / 100:.2f}",
+        "About the game": description,
+        "Header image": f"https://cdn.akamai.steamstatic.com/steam/apps/{app_id}/header.jpg",
+        "Publishers": f"Publisher {rng.randint(0, max(1, app_id // 20))}",
+        "Genres": genres,
+        "Screenshots": ",".join(f"https://cdn.example.com/{app_id}/{i}.jpg" for i in range(4)),
+    })
+    return [row[header] for header in HEADERS]
+
+
+def write_synthetic_csv(path: Path, rows: int, seed: int = 235) -> Path:
+    """ Write a games.csv with the given number of synthetic rows and return its path """
+    path = Path(path)
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADERS)
+        for app_id in range(1, rows + 1):
+            writer.writerow(synthetic_row(app_id, rng))
+    return path
+
+
+def synthetic_games(rows: int, seed: int = 235):
+    """ Yield synthetic Game objects without going through a CSV file """
+    rng = random.Random(seed)
+    for app_id in range(1, rows + 1):
+        row = dict(zip(HEADERS, synthetic_row(app_id, rng)))
+        game = Game(app_id, row["Name"])
+        game.release_date = row["Release date"]
+        game.price = float(row["Price"])
+        game.description = row["About the game"]
+        game.image_url = row["Header image"]
+        game.publisher = Publisher(row["Publishers"])
+        for genre_name in row["Genres"].split(","):
+            game.add_genre(Genre(genre_name))
+        yield game
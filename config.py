@@ -16,6 +16,12 @@ class Config:
     TESTING = environ.get('TESTING')
     REPOSITORY = environ.get('REPOSITORY')
 
+    # Number of processes used to parse games.csv when loading the catalogue
+    INGEST_WORKERS = int(environ.get('INGEST_WORKERS', 1))
+
+    # Keep a binary snapshot of the parsed catalogue next to games.csv, so the memory repository starts up faster
+    CATALOGUE_SNAPSHOT = environ.get('CATALOGUE_SNAPSHOT', 'True').lower().strip() == "true"
+
     # Database configuration
     SQLALCHEMY_DATABASE_URI = environ.get('SQLALCHEMY_DATABASE_URI')
 
@@ -24,3 +30,32 @@ class Config:
     if echo_string.lower().strip() == "true":
         SQLALCHEMY_ECHO = True
 
+    # Connection pool for the database engine: "queue" keeps up to DATABASE_POOL_SIZE connections open (plus
+    # DATABASE_MAX_OVERFLOW more under load), "null" opens a new connection for every request, "singleton" keeps one
+    # per thread, and "static" shares a single connection, which an in-memory SQLite database needs.
+    DATABASE_POOL = environ.get('DATABASE_POOL', 'queue').lower().strip()
+    DATABASE_POOL_SIZE = int(environ.get('DATABASE_POOL_SIZE', 5))
+    DATABASE_MAX_OVERFLOW = int(environ.get('DATABASE_MAX_OVERFLOW', 10))
+    DATABASE_POOL_TIMEOUT = float(environ.get('DATABASE_POOL_TIMEOUT', 30))
+    # Seconds before a pooled connection is replaced (-1 never), and whether to test connections before using them
+    DATABASE_POOL_RECYCLE = int(environ.get('DATABASE_POOL_RECYCLE', -1))
+    DATABASE_POOL_PRE_PING = environ.get('DATABASE_POOL_PRE_PING', 'False').lower().strip() == "true"
+
+    # Serve GET requests from a second, read-only engine, so readers never queue behind writes. It opens
+    # DATABASE_READ_URI (a replica), or by default the SQLite database file itself with mode=ro, and uses the pool
+    # settings above. Writes then get an engine of their own with DATABASE_WRITE_POOL_SIZE connections.
+    DATABASE_READ_ENGINE = environ.get('DATABASE_READ_ENGINE', 'True').lower().strip() == "true"
+    DATABASE_READ_URI = environ.get('DATABASE_READ_URI', '')
+    DATABASE_WRITE_POOL_SIZE = int(environ.get('DATABASE_WRITE_POOL_SIZE', 2))
+
+    # SQLite settings for every new connection (see games.adapters.engine.SQLITE_PRAGMAS). An empty value leaves
+    # SQLite's own default. In WAL mode readers carry on while a review is being written, and synchronous=NORMAL only
+    # waits for the disk at checkpoints rather than on every commit.
+    DATABASE_JOURNAL_MODE = environ.get('DATABASE_JOURNAL_MODE', 'WAL')
+    DATABASE_SYNCHRONOUS = environ.get('DATABASE_SYNCHRONOUS', 'NORMAL')
+    # Negative cache sizes are in KiB, so the default is a 64 MiB page cache per connection
+    DATABASE_CACHE_SIZE = environ.get('DATABASE_CACHE_SIZE', '-65536')
+    DATABASE_MMAP_SIZE = environ.get('DATABASE_MMAP_SIZE', '268435456')
+    DATABASE_TEMP_STORE = environ.get('DATABASE_TEMP_STORE', 'MEMORY')
+    # Milliseconds a connection waits for another one's lock before giving up with "database is locked"
+    DATABASE_BUSY_TIMEOUT = environ.get('DATABASE_BUSY_TIMEOUT', '5000')
@@ -1,17 +1,21 @@
 """Initialize Flask app."""
 
 from pathlib import Path
-from flask import Flask, session
+from flask import Flask, session, request
 
 # imports from SQLAlchemy
-from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, clear_mappers
-from sqlalchemy.pool import NullPool
 
 import games.adapters.repository as repo
 from games.adapters import database_repository
+from games.adapters.engine import create_database_engine, read_only_uri, SQLITE_PRAGMAS
 from games.adapters.memory_repository import MemoryRepository, populate, load_users
-from games.adapters.orm import metadata, map_model_to_tables
+from games.adapters.orm import metadata, map_model_to_tables, migrate_database
+
+
+def sqlite_pragmas(config) -> dict:
+    # DATABASE_JOURNAL_MODE, DATABASE_SYNCHRONOUS and so on, by pragma name
+    return {name: config.get(f'DATABASE_{name.upper()}') for name in SQLITE_PRAGMAS}
 
 
 def create_app(test_config=None):
@@ -33,7 +37,7 @@ def create_app(test_config=None):
         # create repository instance
         repo.repo_instance = MemoryRepository()
         # fill content of the repository from the provided csv file
-        populate(repo.repo_instance, data_path)
+        populate(repo.repo_instance, data_path, app.config['INGEST_WORKERS'], app.config['CATALOGUE_SNAPSHOT'])
 
         # We need users to test with, if using e2e testing
         if test_config is not None:
@@ -43,28 +47,53 @@ def create_app(test_config=None):
         database_uri = app.config['SQLALCHEMY_DATABASE_URI']
         database_echo = app.config['SQLALCHEMY_ECHO']
 
-        database_engine = create_engine(database_uri, connect_args={"check_same_thread": False}, poolclass=NullPool,
-                                        echo=database_echo)
+        read_uri = None
+        if app.config['DATABASE_READ_ENGINE']:
+            read_uri = app.config['DATABASE_READ_URI'] or read_only_uri(database_uri)
+
+        def engine_for(uri, pool_size, pragmas):
+            return create_database_engine(uri, app.config['DATABASE_POOL'], pool_size,
+                                          app.config['DATABASE_MAX_OVERFLOW'], app.config['DATABASE_POOL_TIMEOUT'],
+                                          app.config['DATABASE_POOL_RECYCLE'], app.config['DATABASE_POOL_PRE_PING'],
+                                          database_echo, pragmas)
+
+        pragmas = sqlite_pragmas(app.config)
+        if read_uri:
+            database_engine = engine_for(database_uri, app.config['DATABASE_WRITE_POOL_SIZE'], pragmas)
+            # The journal mode belongs to the database file, and only the write engine can change it
+            read_engine = engine_for(read_uri, app.config['DATABASE_POOL_SIZE'], {**pragmas, 'journal_mode': None})
+        else:
+            database_engine = read_engine = engine_for(database_uri, app.config['DATABASE_POOL_SIZE'], pragmas)
+        # Pool and statement statistics for each engine can be read with games.adapters.engine.pool_statistics
+        app.extensions['database_engine'] = database_engine
+        app.extensions['database_read_engine'] = read_engine
         session_factory = sessionmaker(autocommit=False, autoflush=True, bind=database_engine)
+        read_session_factory = None
+        if read_engine is not database_engine:
+            read_session_factory = sessionmaker(autocommit=False, autoflush=True, bind=read_engine)
 
-        repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory)
+        repo.repo_instance = database_repository.SqlAlchemyRepository(session_factory, read_session_factory)
 
         if app.config['TESTING'] == 'True' or len(database_engine.table_names()) == 0:
             print("REPOPULATING DATABASE...")
-            print("THIS MAY TAKE 10+ SECONDS... PLEASE STAND BY...")
             # For testing, or first-time use of the web application, reinitialise the database.
             clear_mappers()
             metadata.create_all(database_engine)  # Conditionally create database tables.
+            with database_engine.begin() as connection:
+                migrate_database(connection)  # Bring tables from an older version of the app up to date.
             for table in reversed(metadata.sorted_tables):  # Remove any data from the tables.
                 database_engine.execute(table.delete())
 
             # Generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
 
-            database_repository.populate(repo.repo_instance, data_path)
-            print("REPOPULATING DATABASE... FINISHED")
+            stats = database_repository.populate(repo.repo_instance, data_path, app.config['INGEST_WORKERS'])
+            print(f"REPOPULATING DATABASE... FINISHED ({stats['rows']} rows in {stats['seconds']:.2f}s, "
+                  f"{stats['rows_per_second']:.0f} rows/s)")
 
         else:
+            with database_engine.begin() as connection:
+                migrate_database(connection)  # Bring tables from an older version of the app up to date.
             # Solely generate mappings that map domain model classes to the database tables.
             map_model_to_tables()
 
@@ -86,6 +115,12 @@ def create_app(test_config=None):
         from .userProfile import userProfile
         app.register_blueprint(userProfile.userProfile_blueprint)
 
+        from .search import search
+        app.register_blueprint(search.search_blueprint)
+
+        from .catalogue import catalogue
+        app.cli.add_command(catalogue.catalogue_cli)
+
         @app.before_first_request
         def before_flask_first_request():
             session.clear()
@@ -94,6 +129,10 @@ def create_app(test_config=None):
         def before_flask_http_request_function():
             if isinstance(repo.repo_instance, database_repository.SqlAlchemyRepository):
                 repo.repo_instance.reset_session()
+                # GET requests only read, unless their view is marked with writes_on_get
+                view = app.view_functions.get(request.endpoint)
+                if request.method in ('GET', 'HEAD') and not getattr(view, 'writes_on_get', False):
+                    repo.repo_instance.set_read_only()
 
         @app.teardown_appcontext
         def shutdown_session(exception=None):
@@ -1,22 +1,35 @@
-from typing import List, Union
+from typing import Iterable, List, Union
 
 from pathlib import Path
+import hashlib
+import threading
+import time
 
-from sqlalchemy import desc, asc
-from sqlalchemy.orm import scoped_session
+from sqlalchemy import desc, asc, insert, select, bindparam, text, func, exists, and_, or_, table, column
+from sqlalchemy.orm import scoped_session, joinedload, selectinload
 from sqlalchemy.orm.exc import NoResultFound
 
 import csv
+from itertools import chain
 
 from games.domainmodel.model import *
-from games.adapters.repository import AbstractRepository
+from games.adapters.repository import AbstractRepository, GameFilters, SORT_NEWEST, SORT_RELEVANCE, \
+    RELEVANCE_LIMIT, LOAD_LIST, LOAD_DETAIL, LOAD_PROFILE, keyset_cursor, offset_cursor, parse_cursor
 from games.adapters.datareader.csvdatareader import GameFileCSVReader
+from games.adapters.fuzzy_index import MAX_DISTANCE, PREFIX_LENGTH, allowed_distance, deletions, edit_distance
+from games.adapters.text_index import TITLE_WEIGHT, tokenize
+from games.adapters.orm import publishers_table, genres_table, games_table, game_genres_table, reviews_table, \
+    rating_summary_table, title_word_deletions_table, SEARCH_TABLE, add_title_words
 
 
 class SessionContextManager:
-    def __init__(self, session_factory):
+    def __init__(self, session_factory, read_session_factory=None):
         self.__session_factory = session_factory
         self.__session = scoped_session(self.__session_factory)
+        # Sessions on the read engine, for threads switched to it with set_read_only. Without a read engine every
+        # thread uses the session above.
+        self.__read_session = scoped_session(read_session_factory) if read_session_factory is not None else None
+        self.__routing = threading.local()
 
     def __enter__(self):
         return self
@@ -26,29 +39,63 @@ class SessionContextManager:
 
     @property
     def session(self):
+        if self.__read_session is not None and getattr(self.__routing, "read_only", False):
+            return self.__read_session
         return self.__session
 
+    def set_read_only(self, read_only: bool):
+        self.__routing.read_only = read_only
+
     def commit(self):
-        self.__session.commit()
+        self.session.commit()
 
     def rollback(self):
-        self.__session.rollback()
+        self.session.rollback()
 
     def reset_session(self):
         # this method can be used e.g. to allow Flask to start a new session for each http request,
         # via the 'before_request' callback
         self.close_current_session()
-        self.__session = scoped_session(self.__session_factory)
 
     def close_current_session(self):
+        # Sessions are per thread, so this only ends the calling thread's session and hands its connection back to
+        # the pool. Replacing the whole scoped_session here would strand the sessions of requests still running on
+        # other threads, along with their pooled connections. The thread goes back to the write engine.
         if self.__session is not None:
-            self.__session.close()
+            self.__session.remove()
+        if self.__read_session is not None:
+            self.__read_session.remove()
+        self.__routing.read_only = False
+
+
+# Newest games first, sorted on the indexed release_ordinal column. Ties go to the higher game_id, which SQLite can
+# read straight off the index since game_id is the rowid.
+NEWEST_FIRST = (desc(games_table.c.release_ordinal), desc(games_table.c.game_id))
+
+
+# The full-text index as a table that Core statements can join games to, by rowid (the game_id)
+search_table = table(SEARCH_TABLE, column("rowid"))
+
+
+def relevance_statement(match: str, clauses: list = (), limit: int = None):
+    """ Ids of the games matching an FTS5 MATCH expression and any other WHERE clauses on games, best first by
+    SQLite's BM25 (lower is better) with the same title weight as the memory repository's index. The clauses are
+    applied before the limit, so filtering never drops a match that ranks outside the best `limit` overall. """
+    statement = (select(games_table.c.game_id)
+                 .select_from(search_table.join(games_table, games_table.c.game_id == search_table.c.rowid))
+                 .where(text(f"{SEARCH_TABLE} MATCH :match").bindparams(match=match), *clauses)
+                 .order_by(text(f"bm25({SEARCH_TABLE}, {float(TITLE_WEIGHT)}, 1.0)"), *NEWEST_FIRST))
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
 
 
 class SqlAlchemyRepository(AbstractRepository):
 
-    def __init__(self, session_factory):
-        self._session_cm = SessionContextManager(session_factory)
+    def __init__(self, session_factory, read_session_factory=None):
+        """ Writes go through session_factory. If read_session_factory is given (sessions on a read-only engine),
+        threads switched to it with set_read_only make their reads there, so they never wait on a writer's pool. """
+        self._session_cm = SessionContextManager(session_factory, read_session_factory)
 
     def close_session(self):
         self._session_cm.close_current_session()
@@ -56,12 +103,17 @@ class SqlAlchemyRepository(AbstractRepository):
     def reset_session(self):
         self._session_cm.reset_session()
 
+    def set_read_only(self, read_only: bool = True):
+        # Serve the calling thread from the read engine, if there is one, until its session is reset. Writes made
+        # meanwhile fail, since the read engine can't write.
+        self._session_cm.set_read_only(read_only)
+
     def add_user(self, user: User):
         with self._session_cm as scm:
             scm.session.add(user)
             scm.commit()
 
-    def get_user(self, user_name: str) -> User:
+    def get_user(self, user_name: str, load: str = None) -> User:
         # Assume usernames will be modified as they are when set under User constructor
         # For safety, bail if the username isn't a string before trying to format.
         if not isinstance(user_name, str):
@@ -70,7 +122,8 @@ class SqlAlchemyRepository(AbstractRepository):
 
         user = None
         try:
-            user = self._session_cm.session.query(User).filter(User._User__username == user_name).one()
+            user = self._session_cm.session.query(User).options(*load_options(load)).filter(
+                User._User__username == user_name).one()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
@@ -86,52 +139,203 @@ class SqlAlchemyRepository(AbstractRepository):
             scm.commit()
 
     def get_number_of_games(self):
-        return len(self.get_all_games())
+        # Counted by SQLite, without loading any games
+        return self._session_cm.session.execute(select(func.count()).select_from(games_table)).scalar()
 
     def get_all_games(self):
-        games =  self._session_cm.session.query(Game).order_by(Game._Game__release_date).all()
-
-        # Sort by date and reverse order to show newest games first
-        games = list(reversed(sorted(games, key=lambda x: datetime.strptime(x.release_date, "%b %d, %Y"))))
+        return self._session_cm.session.query(Game).order_by(*NEWEST_FIRST).all()
 
-        return games
-
-    def get_games_by_genres(self, genres: List[Genre]):
-        games = None
+    def get_games_by_genres(self, genres: List[Genre], match_all: bool = False):
+        games = []
         genre_names = [genre.genre_name for genre in genres]
+        if not genre_names:
+            return games
         try:
-            # Here we are building a query that has a chain of .filter().filter().filter()... for every Genre..
-            # This progressively thins the output list until only games with ALL genres desired remain.
-            query = self._session_cm.session.query(Game)
-            for genre_name in genre_names:
-                query = query.filter(Game._Game__genres.any(Genre._Genre__genre_name == genre_name))
-            games = query.order_by(Game._Game__release_date).all()
+            # One join against the ids of the matching games, worked out from game_genres alone
+            matches = _genre_matches(genre_names, match_all)
+            games = (self._session_cm.session.query(Game)
+                     .join(matches, matches.c.game_id == Game._Game__game_id)
+                     .order_by(*NEWEST_FIRST).all())
         except NoResultFound:
             # Ignore any exception and return None.
             pass
 
-        # Sort by date and reverse order to show newest games first
-        games = list(reversed(sorted(games, key=lambda x: datetime.strptime(x.release_date, "%b %d, %Y"))))
-
         return games
 
+    def get_games_page(self, filters: GameFilters, sort: str = SORT_NEWEST, limit: int = 6, cursor: str = None,
+                       load: str = LOAD_LIST):
+        limit = max(0, limit)
+        kind, values = parse_cursor(cursor)
+        if _is_ranked(filters, sort):
+            # Ranked searches come back as a list of ids, so page through that and only load the page's games
+            game_ids = self.__ranked_game_ids(filters, sort)
+            if kind == "offset":
+                start = values[0]
+            else:
+                start = next((position + 1 for position, game_id in enumerate(game_ids) if game_id == values[1]), 0)
+            page_ids = game_ids[start:start + limit]
+            more = start + limit < len(game_ids) and page_ids
+            return self.__games_in_order(page_ids, load), offset_cursor(start + limit) if more else None
+
+        # Newest first: the filters, order and LIMIT all go to SQL, which walks the release_ordinal index and stops
+        # once it has one game more than the page. A keyset cursor carries on from the last game shown, rather than
+        # counting past (OFFSET) every game before it.
+        ordinal, game_id = games_table.c.release_ordinal, games_table.c.game_id
+        statement = select(game_id).where(*_filter_clauses(filters)).order_by(*NEWEST_FIRST).limit(limit + 1)
+        if kind == "after":
+            after_ordinal, after_id = values
+            statement = statement.where(or_(ordinal < after_ordinal,
+                                            and_(ordinal == after_ordinal, game_id < after_id)))
+        else:
+            statement = statement.offset(values[0])
+        game_ids = list(self._session_cm.session.execute(statement).scalars())
+        games = self.__games_in_order(game_ids[:limit], load)
+        if len(game_ids) > limit > 0 and games:
+            return games, keyset_cursor(games[-1])
+        return games, None
+
+    def count_games(self, filters: GameFilters, sort: str = SORT_NEWEST) -> int:
+        if _is_ranked(filters, sort):
+            return len(self.__ranked_game_ids(filters, sort))
+        genre_names = [genre.genre_name for genre in filters.genres]
+        if not genre_names:
+            statement = select(func.count()).select_from(games_table).where(*_filter_clauses(filters))
+        else:
+            # Every match has to be counted, so join the games to the ids of those with the genres, found in one pass
+            # over game_genres (GROUP BY ... HAVING for all of them), rather than checking every game for them
+            matches = _genre_matches(genre_names, filters.match_all_genres)
+            statement = (select(func.count())
+                         .select_from(games_table.join(matches, matches.c.game_id == games_table.c.game_id))
+                         .where(*_filter_clauses(filters, genres=False)))
+        return self._session_cm.session.execute(statement).scalar()
+
+    def count_games_per_genre(self) -> dict:
+        statement = (select(game_genres_table.c.genre_name, func.count(game_genres_table.c.game_id.distinct()))
+                     .group_by(game_genres_table.c.genre_name))
+        return dict(self._session_cm.session.execute(statement).all())
+
+    def __ranked_game_ids(self, filters: GameFilters, sort: str) -> List[int]:
+        # Ids of the games matching a fuzzy or relevance search, best first, that pass the other filters
+        if filters.fuzzy:
+            game_ids = self.__fuzzy_game_ids(filters.search_query)
+        else:
+            match = search_match_expression(filters.search_query)
+            if match is None:
+                return []
+            # The genre and publisher filters go in the same statement, ahead of the limit
+            statement = relevance_statement(match, _filter_clauses(filters, search=False), RELEVANCE_LIMIT)
+            return list(self._session_cm.session.execute(statement).scalars())
+
+        clauses = _filter_clauses(filters, search=False)
+        if not clauses:
+            return game_ids
+        passed = set()
+        for ids in _batches(game_ids, SQL_VARIABLE_BATCH):
+            statement = select(games_table.c.game_id).where(games_table.c.game_id.in_(ids), *clauses)
+            passed.update(self._session_cm.session.execute(statement).scalars())
+        return [game_id for game_id in game_ids if game_id in passed]
+
     def get_games_by_name_query(self, query: str):
         games = None
         try:
-            games = self._session_cm.session.query(Game).filter(Game._Game__game_title.like(query)).order_by(Game._Game__release_date).all()
+            games = self._session_cm.session.query(Game).filter(
+                Game._Game__search_key.contains(normalize_search_text(query), autoescape=True)).order_by(
+                *NEWEST_FIRST).all()
         except NoResultFound:
             # Ignore any exception and return None.
             pass
 
-        # Sort by date and reverse order to show newest games first
-        games = list(reversed(sorted(games, key=lambda x: datetime.strptime(x.release_date, "%b %d, %Y"))))
-
         return games
 
-    def get_game_by_id(self, game_id: int) -> Union[None, Game]:
+    def get_games_by_relevance(self, query: str, limit: int = None):
+        # Ranked in SQL from the full-text index. The last word also matches as a prefix, so half-typed searches
+        # still find something.
+        match = search_match_expression(query)
+        if match is None:
+            return []
+        game_ids = self._session_cm.session.execute(relevance_statement(match, limit=limit)).scalars()
+        return self.__games_in_order(list(game_ids))
+
+    def get_games_by_fuzzy_name_query(self, query: str, max_distance: int = 2):
+        return self.__games_in_order(self.__fuzzy_game_ids(query, max_distance))
+
+    def __fuzzy_game_ids(self, query: str, max_distance: int = MAX_DISTANCE) -> List[int]:
+        """ The same search as FuzzyTitleIndex.search, kept in the database: the words near each query word are
+        looked up in title_word_deletions, and the titles they appear in in the full-text index. Games with a word
+        near every query word come back closest first (by total distance), then newest first. """
+        query_words = list(dict.fromkeys(tokenize(query)))
+        if not query_words:
+            return []
+
+        total_distances = None
+        for query_word in query_words:
+            # The closest distance from this query word to any word of each title
+            distances = {}
+            near = self.__title_words_near(query_word, max_distance)
+            for distance in sorted(set(near.values())):
+                words = " OR ".join(f'"{word}"' for word, word_distance in near.items() if word_distance == distance)
+                statement = (select(search_table.c.rowid)
+                             .where(text(f"{SEARCH_TABLE} MATCH :match").bindparams(match=f"game_title : ({words})")))
+                for game_id in self._session_cm.session.execute(statement).scalars():
+                    distances.setdefault(game_id, distance)
+            if total_distances is None:
+                total_distances = distances
+            else:
+                total_distances = {game_id: total + distances[game_id]
+                                   for game_id, total in total_distances.items() if game_id in distances}
+            if not total_distances:
+                return []
+
+        release_ordinals = {}
+        for ids in _batches(list(total_distances), SQL_VARIABLE_BATCH):
+            statement = (select(games_table.c.game_id, games_table.c.release_ordinal)
+                         .where(games_table.c.game_id.in_(ids)))
+            release_ordinals.update(self._session_cm.session.execute(statement).all())
+
+        def closest_then_newest(game_id):
+            release_ordinal = release_ordinals.get(game_id)
+            if release_ordinal is None:
+                release_ordinal = UNKNOWN_RELEASE_ORDINAL
+            return total_distances[game_id], -release_ordinal, -game_id
+        return sorted(total_distances, key=closest_then_newest)
+
+    def __title_words_near(self, query_word: str, max_distance: int) -> dict:
+        # The title words within the allowed distance of query_word, with their distance from it
+        distance = allowed_distance(query_word, max_distance)
+        if not distance:
+            return {query_word: 0}
+        statement = (select(title_word_deletions_table.c.word).distinct()
+                     .where(title_word_deletions_table.c.deletion.in_(deletions(query_word[:PREFIX_LENGTH], distance))))
+        near = {word: edit_distance(query_word, word, distance)
+                for word in self._session_cm.session.execute(statement).scalars()}
+        return {word: word_distance for word, word_distance in near.items() if word_distance <= distance}
+
+    def __games_in_order(self, game_ids: List[int], load: str = None) -> List[Game]:
+        # Load the games with the given ids in as few queries as possible, and return them in the order of game_ids
+        games_by_id = {}
+        for ids in _batches(game_ids, SQL_VARIABLE_BATCH):
+            query = self._session_cm.session.query(Game).options(*load_options(load))
+            for game in query.filter(Game._Game__game_id.in_(ids)):
+                games_by_id[game.game_id] = game
+        return [games_by_id[game_id] for game_id in game_ids if game_id in games_by_id]
+
+    def get_titles_by_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        # A range scan of the search_key index: every key starting with prefix sorts at or after it and before prefix
+        # followed by the highest code point
+        prefix = normalize_search_text(prefix)
+        if not prefix or limit <= 0:
+            return []
+        key = games_table.c.search_key
+        statement = (select(games_table.c.game_title).distinct()
+                     .where(key >= prefix, key < prefix + chr(0x10FFFF))
+                     .order_by(key).limit(limit))
+        return list(self._session_cm.session.execute(statement).scalars())
+
+    def get_game_by_id(self, game_id: int, load: str = None) -> Union[None, Game]:
         game = None
         try:
-            game = self._session_cm.session.query(Game).filter(Game._Game__game_id == game_id).one()
+            game = self._session_cm.session.query(Game).options(*load_options(load)).filter(
+                Game._Game__game_id == game_id).one()
         except NoResultFound:
             print("Couldn't find game")
             # Ignore any exception and return None.
@@ -162,9 +366,108 @@ class SqlAlchemyRepository(AbstractRepository):
             scm.session.merge(publisher)
             scm.commit()
 
+    def get_publisher(self, name: str):
+        publisher = None
+        try:
+            publisher = self._session_cm.session.query(Publisher).filter(
+                Publisher._Publisher__publisher_name == name).one()
+        except NoResultFound:
+            # Ignore any exception and return None.
+            pass
+
+        return publisher
+
     def get_all_publishers(self):
         return self._session_cm.session.query(Publisher).all()
 
+    def get_publisher_names_by_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        # A range scan of the publishers' search_key index, as for titles
+        prefix = normalize_search_text(prefix)
+        if not prefix or limit <= 0:
+            return []
+        key = publishers_table.c.search_key
+        statement = (select(publishers_table.c.name)
+                     .where(key >= prefix, key < prefix + chr(0x10FFFF))
+                     .order_by(key, publishers_table.c.name).limit(limit))
+        return list(self._session_cm.session.execute(statement).scalars())
+
+    def bulk_load(self, games: Iterable[Game], chunk_size: int = 10000) -> dict:
+        """ Insert a whole catalogue with Core executemany statements inside a single transaction.
+
+        Games are consumed in chunks, so the iterable can be a generator over millions of rows. Publishers and genres
+        are taken from the games themselves, and the game_genres links are written alongside each chunk of games.
+        Returns the number of rows written to each table, the time taken and the overall rows per second. """
+        counts = {"publishers": 0, "genres": 0, "games": 0, "game_genres": 0}
+        seen_names = (set(), set())
+        seen_words = set()
+
+        start = time.perf_counter()
+        with self._session_cm as scm:
+            conn = scm.session.connection()
+            for chunk in _unique_chunks(games, chunk_size):
+                _insert_publishers_and_genres(conn, chunk, seen_names, counts)
+                _execute_many(conn, insert(games_table), [_game_row(game) for game in chunk], "games", counts)
+                add_title_words(conn, [game.title for game in chunk], seen_words)
+                _execute_many(conn, insert(game_genres_table), _game_genre_rows(chunk), "game_genres", counts)
+            scm.commit()
+        seconds = time.perf_counter() - start
+
+        counts["rows"] = sum(counts.values())
+        counts["seconds"] = seconds
+        counts["rows_per_second"] = counts["rows"] / seconds if seconds > 0 else 0.0
+        return counts
+
+    def sync_catalogue(self, games: Iterable[Game], chunk_size: int = 10000) -> dict:
+        """ Bring the games table in line with the given games, without touching users, reviews or wishlists.
+
+        Each game's content hash is compared with the one stored when it was last written. New games are inserted,
+        changed games are updated and get their game_genres links replaced, and unchanged games are left alone.
+        Everything happens in one transaction. Returns how many games were inserted, updated and unchanged. """
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "publishers": 0, "genres": 0}
+        seen_names = (set(), set())
+        seen_words = set()
+        update_games = games_table.update().where(games_table.c.game_id == bindparam("b_game_id"))
+
+        start = time.perf_counter()
+        with self._session_cm as scm:
+            conn = scm.session.connection()
+            for chunk in _unique_chunks(games, chunk_size):
+                stored_hashes = _stored_content_hashes(conn, [game.game_id for game in chunk])
+
+                new_games = []
+                changed_games = []
+                for game in chunk:
+                    if game.game_id not in stored_hashes:
+                        new_games.append(game)
+                    elif stored_hashes[game.game_id] != game_content_hash(game):
+                        changed_games.append(game)
+                    else:
+                        counts["unchanged"] += 1
+
+                _insert_publishers_and_genres(conn, new_games + changed_games, seen_names, counts)
+                add_title_words(conn, [game.title for game in new_games + changed_games], seen_words)
+                _execute_many(conn, insert(games_table), [_game_row(game) for game in new_games], "inserted",
+                              counts)
+
+                update_rows = []
+                for game in changed_games:
+                    row = _game_row(game)
+                    row["b_game_id"] = row.pop("game_id")
+                    update_rows.append(row)
+                if update_rows:
+                    conn.execute(update_games, update_rows)
+                    counts["updated"] += len(update_rows)
+                    for ids in _batches([game.game_id for game in changed_games], SQL_VARIABLE_BATCH):
+                        conn.execute(game_genres_table.delete().where(game_genres_table.c.game_id.in_(ids)))
+
+                link_rows = _game_genre_rows(new_games + changed_games)
+                if link_rows:
+                    conn.execute(insert(game_genres_table), link_rows)
+            scm.commit()
+
+        counts["seconds"] = time.perf_counter() - start
+        return counts
+
     def sort_games(self):
         # Depreciated
         return NotImplementedError
@@ -182,6 +485,7 @@ class SqlAlchemyRepository(AbstractRepository):
         return NotImplementedError
 
     def add_review(self, review: Review):
+        # Flushing the review also counts it in its game's rating summary (see map_model_to_tables)
         with self._session_cm as scm:
             scm.session.merge(review)
 
@@ -195,6 +499,20 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_reviews(self) -> List[Review]:
         return self._session_cm.session.query(Review).all()
 
+    def get_reviews_for_game(self, game_id: int) -> List[Review]:
+        # Through the index on reviews.game_id, so this reads the game's own reviews and nothing else
+        return (self._session_cm.session.query(Review).options(joinedload(Review._Review__user))
+                .filter(reviews_table.c.game_id == game_id).order_by(reviews_table.c.id).all())
+
+    def get_rating_summary(self, game_id: int) -> RatingSummary:
+        summary = rating_summary_table.c
+        row = self._session_cm.session.execute(
+            select(rating_summary_table).where(summary.game_id == game_id)).first()
+        if row is None:
+            return RatingSummary(game_id)
+        return RatingSummary(game_id, row.review_count, row.rating_sum,
+                             {rating: row._mapping[f"rating_{rating}"] for rating in HISTOGRAM_RATINGS})
+
     def add_game_to_wishlist(self, user: User, game: Game):
         with self._session_cm as scm:
             user.add_to_wishlist(game)
@@ -213,10 +531,167 @@ class SqlAlchemyRepository(AbstractRepository):
     def get_user_history(self, user: User):
         with self._session_cm as scm:
             history = scm.session.query(History).filter(History._History__user == user).all()
-            history = list(sorted(history, key=lambda x: datetime.strptime(x.datetimestamp, "%d/%m/%Y %I:%M %p")))
+            history = list(sorted(history, key=lambda x: x.timestamp_key))
             return history
 
 
+# Stay well under SQLite's limit on the number of variables in one statement
+SQL_VARIABLE_BATCH = 500
+
+
+def game_content_hash(game: Game) -> str:
+    """ A hash of everything we store about a game, used to tell whether a game has changed since it was written """
+    publisher_name = game.publisher.publisher_name if game.publisher is not None else None
+    fields = (game.title, repr(game.price), game.release_date, game.description, game.image_url, game.website_url,
+              publisher_name, sorted(genre.genre_name for genre in game.genres if genre.genre_name is not None))
+    return hashlib.blake2b(repr(fields).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def search_match_expression(query: str) -> Union[None, str]:
+    """ An FTS5 MATCH expression for games containing any word of query, with the last word as a prefix. Each word is
+    quoted, so nothing the user types is read as FTS5 query syntax. Returns None if query has no words. """
+    terms = [f'"{term}"' for term in tokenize(query)]
+    if not terms:
+        return None
+    terms[-1] += "*"
+    return " OR ".join(terms)
+
+
+def load_options(load: Union[None, str]) -> list:
+    """ Loader options for a load profile. Collections come in one extra SELECT ... IN query each (selectinload)
+    however many rows there are, and single objects are joined onto the query itself (joinedload). None leaves every
+    relationship to load lazily on first use. """
+    if load is None:
+        return []
+    # The mapped attributes only exist once map_model_to_tables has run, so these are built on each call
+    game_options = [selectinload(Game._Game__genres), joinedload(Game._Game__publisher)]
+    if load == LOAD_LIST:
+        return game_options
+    if load == LOAD_DETAIL:
+        return game_options + [selectinload(Game._Game__reviews).joinedload(Review._Review__user)]
+    if load == LOAD_PROFILE:
+        return [joinedload(User._User__wishlist).selectinload(Wishlist._Wishlist__list_of_games)
+                .selectinload(Game._Game__genres)]
+    raise ValueError(f"Unknown load profile {load!r}")
+
+
+def _is_ranked(filters: GameFilters, sort: str) -> bool:
+    # Fuzzy and relevance searches come back best match first rather than newest first
+    return bool(filters.search_query) and (filters.fuzzy or sort == SORT_RELEVANCE)
+
+
+def _genre_matches(genre_names: List[str], match_all: bool = False):
+    """ The ids of the games with any (or all) of the genres, as a subquery: the game_genres rows for those genres,
+    grouped by game, keeping the games with every genre for match_all (HAVING COUNT(DISTINCT genre_name) = n) """
+    link = game_genres_table.c
+    matches = select(link.game_id).where(link.genre_name.in_(genre_names)).group_by(link.game_id)
+    if match_all:
+        matches = matches.having(func.count(link.genre_name.distinct()) == len(set(genre_names)))
+    return matches.subquery('genre_matches')
+
+
+def _filter_clauses(filters: GameFilters, search: bool = True, genres: bool = True) -> list:
+    """ WHERE clauses on the games table for filters, for reading games in newest first order until a page is full.
+    Leaves out the search if search is False, and the genres if genres is False (count_games joins them instead). """
+    clauses = []
+    genre_names = [genre.genre_name for genre in filters.genres]
+    # A page reads games newest first until it is full, so the genres are checked one game at a time: a seek in the
+    # game_genres index per genre, stopping at the first one the game doesn't have. Common genres fill a page after
+    # a handful of games, where finding every match first (as counting does) would read all their game_genres rows.
+    linked = game_genres_table.c.game_id == games_table.c.game_id
+    if genres and genre_names and filters.match_all_genres:
+        clauses.extend(exists().where(linked, game_genres_table.c.genre_name == genre_name)
+                       for genre_name in dict.fromkeys(genre_names))
+    elif genres and genre_names:
+        clauses.append(exists().where(linked, game_genres_table.c.genre_name.in_(genre_names)))
+    if filters.publisher is not None:
+        clauses.append(games_table.c.publisher_name == filters.publisher)
+    if search and filters.search_query:
+        clauses.append(games_table.c.search_key.contains(normalize_search_text(filters.search_query), autoescape=True))
+    return clauses
+
+
+def _game_row(game: Game) -> dict:
+    return {
+        "game_id": game.game_id,
+        "game_title": game.title,
+        "game_price": game.price,
+        "release_date": game.release_date,
+        "release_ordinal": game.release_ordinal,
+        "search_key": game.search_key,
+        "game_description": game.description,
+        "game_image_url": game.image_url,
+        "game_website_url": game.website_url,
+        "publisher_name": game.publisher.publisher_name if game.publisher is not None else None,
+        "content_hash": game_content_hash(game),
+    }
+
+
+def _game_genre_rows(games: List[Game]) -> list:
+    return [{"game_id": game.game_id, "genre_name": genre.genre_name}
+            for game in games for genre in game.genres if genre.genre_name is not None]
+
+
+def _batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _unique_chunks(games: Iterable[Game], chunk_size: int):
+    """ Group games into lists of chunk_size. The CSV can list the same AppID twice; keep the first, as merge() used
+    to """
+    seen_games = set()
+    chunk = []
+    for game in games:
+        if game.game_id in seen_games:
+            continue
+        seen_games.add(game.game_id)
+        chunk.append(game)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _execute_many(conn, statement, rows: list, count_name: str, counts: dict):
+    # executemany with an empty parameter list would insert a single row of defaults, so skip empty batches
+    if rows:
+        result = conn.execute(statement, rows)
+        # rowcount leaves out rows that were skipped by OR IGNORE
+        counts[count_name] += result.rowcount if result.rowcount >= 0 else len(rows)
+
+
+def _insert_publishers_and_genres(conn, games: List[Game], seen_names: tuple, counts: dict):
+    """ Insert any publishers and genres of the given games that haven't been seen yet """
+    seen_publishers, seen_genres = seen_names
+    publisher_rows = []
+    genre_rows = []
+    for game in games:
+        publisher_name = game.publisher.publisher_name if game.publisher is not None else None
+        if publisher_name is not None and publisher_name not in seen_publishers:
+            seen_publishers.add(publisher_name)
+            publisher_rows.append({"name": publisher_name, "search_key": game.publisher.search_key})
+        for genre in game.genres:
+            if genre.genre_name is not None and genre.genre_name not in seen_genres:
+                seen_genres.add(genre.genre_name)
+                genre_rows.append({"genre_name": genre.genre_name})
+
+    # Publishers and genres may already exist (e.g. added by hand), so let SQLite skip those
+    _execute_many(conn, insert(publishers_table).prefix_with("OR IGNORE", dialect="sqlite"), publisher_rows,
+                  "publishers", counts)
+    _execute_many(conn, insert(genres_table).prefix_with("OR IGNORE", dialect="sqlite"), genre_rows, "genres",
+                  counts)
+
+
+def _stored_content_hashes(conn, game_ids: list) -> dict:
+    stored_hashes = {}
+    for ids in _batches(game_ids, SQL_VARIABLE_BATCH):
+        query = select(games_table.c.game_id, games_table.c.content_hash).where(games_table.c.game_id.in_(ids))
+        stored_hashes.update(conn.execute(query).all())
+    return stored_hashes
+
+
 def read_csv_simple(file_path: str):
     with open(file_path, encoding='utf-8-sig') as file:
         reader = csv.reader(file)
@@ -231,23 +706,17 @@ def read_csv_simple(file_path: str):
         return rows
 
 
-def load_games(repo: AbstractRepository, data_path: Path):
+def load_games(repo: AbstractRepository, data_path: Path, workers: int = 1):
     path = str(Path(data_path) / "games.csv")
     reader = GameFileCSVReader(path)
-    reader.read_csv_file()
-
-    # Add everything from the CSV file to the repo for use on the website. Might be slow, but only needs to run once
-    for game in reader.dataset_of_games:
-        repo.add_game(game)
-
-    for genre in reader.dataset_of_genres:
-        repo.add_genre(genre)
-
-    for publisher in reader.dataset_of_publishers:
-        repo.add_publisher(publisher)
 
-    repo.sort_self()
+    # Write the catalogue to the database in one transaction. Publishers and genres are taken from the games
+    # themselves. With one worker the CSV file is streamed in batch by batch.
+    if workers > 1:
+        reader.read_csv_file_parallel(workers)
+        return repo.bulk_load(reader.dataset_of_games)
+    return repo.bulk_load(chain.from_iterable(reader.iter_games()))
 
 
-def populate(repo: AbstractRepository, data_path: Path):
-    load_games(repo, data_path)
+def populate(repo: AbstractRepository, data_path: Path, workers: int = 1):
+    return load_games(repo, data_path, workers)
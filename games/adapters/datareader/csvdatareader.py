@@ -1,10 +1,20 @@
 import csv
+import io
 import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 from games.domainmodel.model import Genre, Game, Publisher
 
+# Bytes read at a time while counting quotes to find record boundaries
+BLOCK_SIZE = 1024 * 1024
+
 
 class GameFileCSVReader:
+    # The only columns we build games from. Everything else in the Steam export (screenshots, movies, tags...) is
+    # skipped by position, so we never build a dict for it.
+    COLUMNS = ("AppID", "Name", "Release date", "Price", "About the game", "Header image", "Publishers", "Genres")
+
     def __init__(self, filename):
         self.__filename = filename
         self.__dataset_of_games = []
@@ -12,37 +22,101 @@ class GameFileCSVReader:
         self.__dataset_of_genres = set()
 
     def read_csv_file(self):
+        for batch in self.iter_games():
+            self.__dataset_of_games.extend(batch)
+
+    def iter_games(self, batch_size: int = 1000):
+        """ Yield the games in the file as lists of at most batch_size games, without keeping them afterwards.
+
+        Only the current batch and the (small) sets of genres and publishers are held in memory, so this can be used
+        to feed a repository from a file far larger than the available RAM. """
+        if not os.path.exists(self.__filename):
+            print(f"path {self.__filename} does not exist!")
+            return
+        with open(self.__filename, 'r', encoding='utf-8-sig', newline='') as file:
+            reader = csv.reader(file)
+            positions = self.__column_positions(next(reader, []))
+            if positions is None:
+                return
+            yield from self._iter_batches(reader, positions, batch_size)
+
+    def read_csv_file_parallel(self, workers: int = None):
+        """ Read the file like read_csv_file, but parse it in worker processes.
+
+        The file is split into byte ranges that each start at the beginning of a record (descriptions can contain
+        quoted newlines, so not every newline is a record boundary). Each range is parsed by a ProcessPoolExecutor
+        worker, and the games come back in file order while the genre and publisher sets are merged. """
         if not os.path.exists(self.__filename):
             print(f"path {self.__filename} does not exist!")
             return
-        with open(self.__filename, 'r', encoding='utf-8-sig') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                try:
-                    game_id = int(row["AppID"])
-                    title = row["Name"]
-                    game = Game(game_id, title)
-                    game.release_date = row["Release date"]
-                    game.price = float(row["Price"])
-                    game.description = row["About the game"]
-                    game.image_url = row["Header image"]
-
-                    publisher = Publisher(row["Publishers"])
-                    self.__dataset_of_publishers.add(publisher)
-                    game.publisher = publisher
-
-                    genre_names = row["Genres"].split(",")
-                    for genre_name in genre_names:
-                        genre = Genre(genre_name.strip())
-                        self.__dataset_of_genres.add(genre)
-                        game.add_genre(genre)
-
-                    self.__dataset_of_games.append(game)
-
-                except ValueError as e:
-                    print(f"Skipping row due to invalid data: {e}")
-                except KeyError as e:
-                    print(f"Skipping row due to missing key: {e}")
+        workers = workers or os.cpu_count() or 1
+
+        with open(self.__filename, 'rb') as file:
+            header_end = _next_record_start(file, 0, False)
+            file.seek(0)
+            header = file.read(header_end).decode('utf-8-sig')
+            # A few ranges per worker, so one slow range doesn't leave the other workers idle
+            boundaries = _record_boundaries(file, header_end, os.path.getsize(self.__filename), workers * 4)
+
+        positions = self.__column_positions(next(csv.reader(io.StringIO(header, newline='')), []))
+        if positions is None:
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(_read_byte_range, repeat(self.__filename), boundaries[:-1], boundaries[1:],
+                                   repeat(positions))
+            for games, genres, publishers in results:
+                self.__dataset_of_games.extend(games)
+                self.__dataset_of_genres |= genres
+                self.__dataset_of_publishers |= publishers
+
+    def __column_positions(self, headers: list):
+        try:
+            return [headers.index(column) for column in self.COLUMNS]
+        except ValueError as e:
+            print(f"Skipping file due to missing key: {e}")
+            return None
+
+    def _iter_batches(self, rows, positions: list, batch_size: int):
+        batch = []
+        for row in rows:
+            game = self.__game_from_row(row, positions)
+            if game is None:
+                continue
+            batch.append(game)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def __game_from_row(self, row: list, positions: list):
+        try:
+            app_id, name, release_date, price, description, image_url, publisher_name, genre_names = \
+                (row[position] for position in positions)
+
+            game = Game(int(app_id), name)
+            game.release_date = release_date
+            game.price = float(price)
+            game.description = description
+            game.image_url = image_url
+
+            publisher = Publisher(publisher_name)
+            self.__dataset_of_publishers.add(publisher)
+            game.publisher = publisher
+
+            for genre_name in genre_names.split(","):
+                genre = Genre(genre_name.strip())
+                self.__dataset_of_genres.add(genre)
+                game.add_genre(genre)
+
+            return game
+
+        except ValueError as e:
+            print(f"Skipping row due to invalid data: {e}")
+        except IndexError as e:
+            print(f"Skipping row due to missing data: {e}")
+        return None
 
     def get_unique_games_count(self):
         return len(self.__dataset_of_games)
@@ -64,3 +138,67 @@ class GameFileCSVReader:
     @property
     def dataset_of_genres(self) -> set:
         return self.__dataset_of_genres
+
+
+def _next_record_start(file, position: int, in_quotes: bool) -> int:
+    """ Walk forward from position to the first newline outside quotes, and return the offset just after it """
+    file.seek(position)
+    while True:
+        block = file.read(4096)
+        if not block:
+            return position
+        for index, byte in enumerate(block):
+            if byte == 0x22:  # "
+                in_quotes = not in_quotes
+            elif byte == 0x0a and not in_quotes:  # \n
+                return position + index + 1
+        position += len(block)
+
+
+def _record_boundaries(file, start: int, size: int, parts: int) -> list:
+    """ Split file[start:size] into about `parts` byte ranges that each begin at a record.
+
+    Whether an offset is inside a quoted field only depends on how many quote characters come before it (an escaped
+    quote is two of them), so we count quotes in bulk up to each target offset and then walk to the end of that
+    record. Returns the sorted, de-duplicated range boundaries, including start and size. """
+    boundaries = [start]
+    position = start
+    in_quotes = False
+    file.seek(start)
+    for part in range(1, parts):
+        target = start + (size - start) * part // parts
+        if target <= position:
+            # The previous record ran past this target
+            continue
+        while position < target:
+            block = file.read(min(BLOCK_SIZE, target - position))
+            if not block:
+                break
+            if block.count(b'"') % 2:
+                in_quotes = not in_quotes
+            position += len(block)
+
+        record_start = _next_record_start(file, position, in_quotes)
+        if record_start >= size:
+            break
+        boundaries.append(record_start)
+        # Everything up to a record boundary is outside quotes
+        position = record_start
+        in_quotes = False
+        file.seek(position)
+
+    boundaries.append(size)
+    return boundaries
+
+
+def _read_byte_range(filename: str, start: int, end: int, positions: list):
+    """ Worker for read_csv_file_parallel: parse the records in file[start:end] """
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        text = file.read(end - start).decode('utf-8')
+
+    reader = GameFileCSVReader(filename)
+    games = []
+    for batch in reader._iter_batches(csv.reader(io.StringIO(text, newline='')), positions, 1000):
+        games.extend(batch)
+    return games, reader.dataset_of_genres, reader.dataset_of_publishers
@@ -0,0 +1,212 @@
+import threading
+import time
+from pathlib import Path
+from typing import Union
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import NullPool, QueuePool, SingletonThreadPool, StaticPool
+
+# Pool classes that DATABASE_POOL can name. "static" shares one connection between every thread, which is what an
+# in-memory SQLite database needs, since each new connection to one would get its own empty database.
+POOL_CLASSES = {
+    "null": NullPool,
+    "queue": QueuePool,
+    "singleton": SingletonThreadPool,
+    "static": StaticPool,
+}
+
+
+# The SQLite pragmas the configuration can set on every new connection, and the values each accepts. busy_timeout
+# comes first, so the connection waits out a lock (in milliseconds) while switching journal mode. cache_size is in
+# pages, or in KiB when negative, and mmap_size in bytes.
+SQLITE_PRAGMAS = {
+    "busy_timeout": int,
+    "journal_mode": {"DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF"},
+    "synchronous": {"OFF", "NORMAL", "FULL", "EXTRA"},
+    "cache_size": int,
+    "mmap_size": int,
+    "temp_store": {"DEFAULT", "FILE", "MEMORY"},
+}
+
+
+def sqlite_pragma_statements(pragmas: dict) -> list:
+    """ PRAGMA statements setting pragmas (names from SQLITE_PRAGMAS, in that order). A value of None or "" leaves
+    SQLite's default. Values are checked here, since they end up in the SQL. """
+    statements = []
+    for name, accepted in SQLITE_PRAGMAS.items():
+        value = pragmas.get(name)
+        if value is None or str(value).strip() == "":
+            continue
+        if accepted is int:
+            try:
+                value = int(value)
+            except ValueError:
+                raise ValueError(f"SQLite pragma {name} must be a whole number, not {value!r}") from None
+        else:
+            value = str(value).strip().upper()
+            if value not in accepted:
+                raise ValueError(f"Unknown value {value!r} for SQLite pragma {name}, expected one of "
+                                 f"{', '.join(sorted(accepted))}")
+        statements.append(f"PRAGMA {name} = {value}")
+    unknown = set(pragmas) - set(SQLITE_PRAGMAS)
+    if unknown:
+        raise ValueError(f"Unknown SQLite pragma {', '.join(sorted(unknown))}")
+    return statements
+
+
+def _pragma_setter(statements: list):
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+    return set_pragmas
+
+
+class PoolStatistics:
+    """ Counts what the connection pool of an engine does, for spotting a pool that is too small or connections that
+    are never reused, and times the statements run on its connections. Times are in seconds. """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__connections_opened = 0
+        self.__checkouts = 0
+        self.__checked_out = 0
+        self.__peak_checked_out = 0
+        self.__total_wait = 0.0
+        self.__longest_wait = 0.0
+        self.__statements = 0
+        self.__total_statement_time = 0.0
+        self.__longest_statement_time = 0.0
+
+    def listen(self, engine: Engine):
+        event.listen(engine, "connect", self.__on_connect)
+        event.listen(engine, "checkout", self.__on_checkout)
+        event.listen(engine, "checkin", self.__on_checkin)
+        event.listen(engine, "before_cursor_execute", self.__before_execute)
+        event.listen(engine, "after_cursor_execute", self.__after_execute)
+        event.listen(engine, "handle_error", self.__on_error)
+
+    @staticmethod
+    def __before_execute(conn, cursor, statement, parameters, context, executemany):
+        # A connection is only used by one thread at a time, so its own info dict can hold the start time
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
+
+    def __after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        seconds = time.perf_counter() - conn.info["statement_started"].pop()
+        with self.__lock:
+            self.__statements += 1
+            self.__total_statement_time += seconds
+            self.__longest_statement_time = max(self.__longest_statement_time, seconds)
+
+    @staticmethod
+    def __on_error(context):
+        started = context.connection.info.get("statement_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    def __on_connect(self, dbapi_connection, connection_record):
+        with self.__lock:
+            self.__connections_opened += 1
+
+    def __on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self.__lock:
+            self.__checkouts += 1
+            self.__checked_out += 1
+            self.__peak_checked_out = max(self.__peak_checked_out, self.__checked_out)
+
+    def __on_checkin(self, dbapi_connection, connection_record):
+        with self.__lock:
+            self.__checked_out -= 1
+
+    def record_wait(self, seconds: float):
+        with self.__lock:
+            self.__total_wait += seconds
+            self.__longest_wait = max(self.__longest_wait, seconds)
+
+    def snapshot(self) -> dict:
+        with self.__lock:
+            return {
+                "connections_opened": self.__connections_opened,
+                "checkouts": self.__checkouts,
+                "checked_out": self.__checked_out,
+                "peak_checked_out": self.__peak_checked_out,
+                "total_wait": self.__total_wait,
+                "longest_wait": self.__longest_wait,
+                "average_wait": self.__total_wait / self.__checkouts if self.__checkouts else 0.0,
+                "statements": self.__statements,
+                "total_statement_time": self.__total_statement_time,
+                "longest_statement_time": self.__longest_statement_time,
+                "average_statement_time": (self.__total_statement_time / self.__statements
+                                           if self.__statements else 0.0),
+            }
+
+
+class _TimedPool:
+    """ Mixed into a pool class to time how long each checkout waits for a connection, including opening a new one.
+    The pool events only fire once a connection has been handed out, so they can't see this. """
+    statistics = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            self.statistics.record_wait(time.perf_counter() - started)
+
+
+def create_database_engine(database_uri: str, pool: str = "queue", pool_size: int = 5, max_overflow: int = 10,
+                           pool_timeout: float = 30, pool_recycle: int = -1, pool_pre_ping: bool = False,
+                           echo: bool = False, sqlite_pragmas: dict = None) -> Engine:
+    """ An engine with the given kind of connection pool (a key of POOL_CLASSES), keeping PoolStatistics on
+    engine.pool.statistics. Sizes and timeouts only apply to the pools that use them. On SQLite, sqlite_pragmas (see
+    SQLITE_PRAGMAS) are set on each connection as it is opened; other databases ignore them. """
+    if pool not in POOL_CLASSES:
+        raise ValueError(f"Unknown connection pool {pool!r}, expected one of {', '.join(POOL_CLASSES)}")
+    is_sqlite = make_url(database_uri).get_backend_name() == "sqlite"
+    pragma_statements = sqlite_pragma_statements(sqlite_pragmas or {}) if is_sqlite else []
+
+    statistics = PoolStatistics()
+    # A subclass per engine, so the statistics survive engine.dispose() recreating the pool from its class
+    pool_class = type(f"Timed{POOL_CLASSES[pool].__name__}", (_TimedPool, POOL_CLASSES[pool]),
+                      {"statistics": statistics})
+
+    options = {"poolclass": pool_class, "pool_pre_ping": pool_pre_ping, "echo": echo}
+    if pool == "queue":
+        options.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    elif pool == "singleton":
+        options.update(pool_size=pool_size)
+    if pool != "static":
+        options.update(pool_recycle=pool_recycle)
+    if is_sqlite:
+        # Flask serves requests on several threads, and a pooled connection can be handed to any of them
+        options["connect_args"] = {"check_same_thread": False}
+
+    engine = create_engine(database_uri, **options)
+    statistics.listen(engine)
+    if pragma_statements:
+        event.listen(engine, "connect", _pragma_setter(pragma_statements))
+    return engine
+
+
+def pool_statistics(engine: Engine) -> dict:
+    """ What engine's connection pool has done so far, along with the pool's own description of its state """
+    statistics = engine.pool.statistics.snapshot()
+    statistics["pool"] = engine.pool.status()
+    return statistics
+
+
+def read_only_uri(database_uri: str) -> Union[None, str]:
+    """ A URI opening the same SQLite database file read-only (mode=ro), so a read engine can never write to it.
+    None for in-memory SQLite databases, which can't be shared between engines, and for other databases, which need a
+    replica named explicitly. """
+    url = make_url(database_uri)
+    if url.get_backend_name() != "sqlite" or url.database in (None, "", ":memory:") or \
+            url.database.startswith("file:"):
+        return None
+    path = quote(Path(url.database).resolve().as_posix())
+    return f"sqlite:///file:{path}?mode=ro&uri=true"
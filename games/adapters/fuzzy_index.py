@@ -0,0 +1,137 @@
+from array import array
+from typing import Hashable, Iterable, List, Tuple
+
+from games.adapters.text_index import tokenize
+
+# Furthest a title word can be from a query word and still match it. Words of up to SHORT_WORD_LENGTH letters only
+# get one edit, since two edits would let a four letter word match almost anything.
+MAX_DISTANCE = 2
+SHORT_WORD_LENGTH = 4
+
+# Words shorter than this, and words without a letter in them (years, sequel numbers), have to match exactly
+MIN_FUZZY_LENGTH = 3
+
+# Deletions are only generated from the start of each word, which bounds how many there are per word. Candidates
+# are checked against the whole word afterwards.
+PREFIX_LENGTH = 7
+
+
+def allowed_distance(word: str, max_distance: int = MAX_DISTANCE) -> int:
+    if len(word) < MIN_FUZZY_LENGTH or not any(character.isalpha() for character in word):
+        return 0
+    if len(word) <= SHORT_WORD_LENGTH:
+        return min(1, max_distance)
+    return max_distance
+
+
+def deletions(word: str, distance: int) -> set:
+    """ word and every string made by deleting up to distance characters from it """
+    found = {word}
+    current = {word}
+    for _ in range(distance):
+        current = {candidate[:position] + candidate[position + 1:]
+                   for candidate in current for position in range(len(candidate))}
+        found |= current
+    return found
+
+
+def word_deletions(word: str) -> set:
+    """ The deletions a title word is indexed under, none for words that have to match exactly """
+    distance = allowed_distance(word)
+    return deletions(word[:PREFIX_LENGTH], distance) if distance else set()
+
+
+def edit_distance(first: str, second: str, limit: int) -> int:
+    """ Optimal string alignment distance (insertions, deletions, substitutions and swaps of neighbouring
+    characters), or limit + 1 as soon as it is known to be more than limit """
+    if abs(len(first) - len(second)) > limit:
+        return limit + 1
+    previous_previous = None
+    previous = list(range(len(second) + 1))
+    for i in range(1, len(first) + 1):
+        current = [i] + [0] * len(second)
+        for j in range(1, len(second) + 1):
+            cost = 0 if first[i - 1] == second[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and first[i - 1] == second[j - 2] and first[i - 2] == second[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return previous[-1]
+
+
+class FuzzyTitleIndex:
+    """ A SymSpell style index for finding titles whose words are within a small edit distance of the query's words.
+
+    Every distinct title word is stored under each string made by deleting up to MAX_DISTANCE characters from (the
+    start of) it. Two words within distance d of each other always share such a deletion, so the words close to a
+    query word are found by looking up the query word's own deletions, without comparing it to every word in the
+    catalogue. Each word also has a posting list of the titles it appears in. """
+
+    def __init__(self, documents: Iterable[Tuple[Hashable, str]] = None):
+        self.__keys = []
+        self.__postings = {}
+        self.__deletions = {}
+        if documents is not None:
+            self.rebuild(documents)
+
+    def rebuild(self, documents: Iterable[Tuple[Hashable, str]]):
+        """ Index (key, title) pairs """
+        keys = []
+        postings = {}
+        for number, (key, title) in enumerate(documents):
+            for word in set(tokenize(title)):
+                posting = postings.get(word)
+                if posting is None:
+                    posting = postings[word] = array("I")
+                posting.append(number)
+            keys.append(key)
+
+        words_by_deletion = {}
+        for word in postings:
+            for deletion in word_deletions(word):
+                words_by_deletion.setdefault(deletion, []).append(word)
+
+        self.__keys = keys
+        self.__postings = postings
+        self.__deletions = words_by_deletion
+
+    def words_near(self, query_word: str, max_distance: int = MAX_DISTANCE) -> dict:
+        """ The indexed words within the allowed distance of query_word, with their distance from it """
+        distance = allowed_distance(query_word, max_distance)
+        if not distance:
+            return {query_word: 0} if query_word in self.__postings else {}
+
+        near = {}
+        for deletion in deletions(query_word[:PREFIX_LENGTH], distance):
+            for word in self.__deletions.get(deletion, ()):
+                if word not in near:
+                    near[word] = edit_distance(query_word, word, distance)
+        return {word: word_distance for word, word_distance in near.items() if word_distance <= distance}
+
+    def search(self, query: str, max_distance: int = MAX_DISTANCE) -> List[Hashable]:
+        """ Keys of the titles that have a word near every word of the query, closest first (by total distance), then
+        in the order they were indexed """
+        query_words = list(dict.fromkeys(tokenize(query)))
+        if not query_words:
+            return []
+
+        total_distances = None
+        for query_word in query_words:
+            # The closest distance from this query word to any word of each title
+            distances = {}
+            for word, distance in self.words_near(query_word, max_distance).items():
+                for number in self.__postings[word]:
+                    if distance < distances.get(number, distance + 1):
+                        distances[number] = distance
+            if total_distances is None:
+                total_distances = distances
+            else:
+                total_distances = {number: total + distances[number]
+                                   for number, total in total_distances.items() if number in distances}
+            if not total_distances:
+                return []
+
+        ranked = sorted(total_distances.items(), key=lambda item: (item[1], item[0]))
+        return [self.__keys[number] for number, _ in ranked]
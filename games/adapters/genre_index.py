@@ -0,0 +1,90 @@
+from functools import reduce
+from operator import and_, or_
+from typing import Iterable, List
+
+from games.domainmodel.model import Game
+
+# Bits converted to a string at a time when listing the set bits of a bitset
+WINDOW_BITS = 4096
+WINDOW_MASK = (1 << WINDOW_BITS) - 1
+
+
+class GenreBitsetIndex:
+    """ An inverted index from genre name to the games with that genre, stored as one bitset (a Python int) per genre.
+
+    Bit i of a bitset stands for the i-th game in the list the index was built from, so AND and OR queries across
+    genres are single bitwise operations, and reading the set bits from low to high gives the games back in the same
+    order as that list. """
+
+    def __init__(self, games: List[Game] = None):
+        self.__games = []
+        self.__bitsets = {}
+        if games is not None:
+            self.rebuild(games)
+
+    def rebuild(self, games: List[Game]):
+        """ Index the games in the order given. Costs one pass over every game's genres. """
+        positions_by_genre = {}
+        for position, game in enumerate(games):
+            for genre in game.genres:
+                positions_by_genre.setdefault(genre.genre_name, []).append(position)
+
+        # Setting bits one at a time on an int would copy the whole int for every game, so build each bitset in a
+        # bytearray and convert it once
+        size = (len(games) + 7) // 8
+        bitsets = {}
+        for genre_name, positions in positions_by_genre.items():
+            buffer = bytearray(size)
+            for position in positions:
+                buffer[position >> 3] |= 1 << (position & 7)
+            bitsets[genre_name] = int.from_bytes(buffer, "little")
+
+        self.__games = list(games)
+        self.__bitsets = bitsets
+
+    def bitset(self, genre_names: Iterable[str], match_all: bool = False) -> int:
+        """ The bitset of games with all (match_all) or any of the given genres. No genres matches no games. """
+        bitsets = [self.__bitsets.get(genre_name, 0) for genre_name in genre_names]
+        if not bitsets:
+            return 0
+        return reduce(and_ if match_all else or_, bitsets)
+
+    def count(self, genre_names: Iterable[str], match_all: bool = False) -> int:
+        return bin(self.bitset(genre_names, match_all)).count("1")
+
+    def games(self, genre_names: Iterable[str], match_all: bool = False, start: int = 0, stop: int = None) -> list:
+        """ The matching games, in index order, from the start-th match up to (not including) the stop-th """
+        return [self.__games[position] for position in set_bits(self.bitset(genre_names, match_all), start, stop)]
+
+
+def set_bits(bits: int, start: int = 0, stop: int = None) -> list:
+    """ Positions of the set bits in bits, lowest first, skipping the first `start` of them and ending before `stop` """
+    if stop is None:
+        # Every set bit is wanted, so convert the whole bitset in one go
+        binary = format(bits, "b")[::-1]
+        positions = []
+        position = binary.find("1")
+        while position != -1:
+            positions.append(position)
+            position = binary.find("1", position + 1)
+        return positions[start:]
+
+    positions = []
+    found = 0
+    offset = 0
+    while bits and found < stop:
+        # Jump to the lowest set bit, then read a window of bits above it as a string (lowest bit first), which lets
+        # str.find skip over runs of zeros in C. Only the windows we need are ever converted.
+        skip = (bits & -bits).bit_length() - 1
+        bits >>= skip
+        offset += skip
+        binary = format(bits & WINDOW_MASK, "b")[::-1]
+        position = binary.find("1")
+        while position != -1 and found < stop:
+            if found >= start:
+                positions.append(offset + position)
+            found += 1
+            position = binary.find("1", position + 1)
+        bits >>= WINDOW_BITS
+        offset += WINDOW_BITS
+    return positions
@@ -1,55 +1,98 @@
-from typing import List, Union
-from datetime import datetime
+from typing import Iterable, List, Union
+from bisect import bisect_left, bisect_right
 
 from pathlib import Path
 
-from games.adapters.repository import AbstractRepository
+from games.adapters import snapshot
+from games.adapters.repository import AbstractRepository, GameFilters, SORT_NEWEST, SORT_RELEVANCE, \
+    RELEVANCE_LIMIT, LOAD_LIST, keyset_cursor, offset_cursor, parse_cursor
 from games.adapters.datareader.csvdatareader import GameFileCSVReader
-from games.domainmodel.model import Game, Genre, Publisher, User, Review
+from games.adapters.fuzzy_index import FuzzyTitleIndex
+from games.adapters.genre_index import GenreBitsetIndex, set_bits
+from games.adapters.prefix_index import PrefixIndex
+from games.adapters.text_index import BM25Index
+from games.adapters.title_index import TitleTrigramIndex
+from games.domainmodel.model import Game, Genre, Publisher, User, Review, RatingSummary, normalize_search_text
 
 import csv
+from itertools import chain
 from werkzeug.security import generate_password_hash
 
 
+def newest_first(game: Game) -> int:
+    # Sort key for keeping games newest first. Games with the same release date stay in the order they were added.
+    return -game.release_ordinal
+
+
 class MemoryRepository(AbstractRepository):
     def __init__(self):
         self.__games = list()
+        # newest_first of each game in self.__games, for bisecting (bisect only takes a key= from Python 3.10)
+        self.__newest_keys = list()
         self.__genres = list()
         self.__publishers = list()
         self.__users = list()
         self.__reviews = list()
 
+        # Primary key indexes over the lists above, so lookups and duplicate checks don't scan the lists.
+        # Every method that adds to a list also adds to its index.
+        self.__games_by_id = dict()
+        self.__genres_by_name = dict()
+        self.__publishers_by_name = dict()
+        self.__users_by_name = dict()
+
+        # Each game's reviews and rating totals by game id, kept up to date by add_review and remove_review
+        self.__reviews_by_game = dict()
+        self.__rating_summaries = dict()
+
+        # Built from the games on first use, and thrown away whenever a game is added
+        self.__genre_index = None
+        self.__title_index = None
+        self.__text_index = None
+        self.__title_prefixes = None
+        self.__publisher_prefixes = None
+        self.__fuzzy_index = None
+
     def add_user(self, user: User):
-        if isinstance(user, User) and user not in self.__users:
+        if isinstance(user, User) and user.username not in self.__users_by_name:
+            self.__users_by_name[user.username] = user
             self.__users.append(user)
 
-    def get_user(self, user_name: str):
+    def get_user(self, user_name: str, load: str = None):
         # Assume usernames will be modified as they are when set under User constructor
         # For security, bail if the username isn't a string before trying to format.
         if not isinstance(user_name, str):
             return None
-        user_name = user_name.lower().strip()
-        for user in self.__users:
-            if user.username == user_name:
-                return user
-        return None
+        return self.__users_by_name.get(user_name.lower().strip())
 
     def get_all_users(self):
         return self.__users
 
     def add_game(self, game: Game):
-        if game not in self.__games:
-            self.__games.append(game)
+        if isinstance(game, Game) and game.game_id not in self.__games_by_id:
+            self.__games_by_id[game.game_id] = game
+            # The games are already sorted, so drop the new one straight into place, after any released the same day
+            key = newest_first(game)
+            position = bisect_right(self.__newest_keys, key)
+            self.__games.insert(position, game)
+            self.__newest_keys.insert(position, key)
+            self.__genre_index = None
+            self.__title_index = None
+            self.__text_index = None
+            self.__title_prefixes = None
+            self.__fuzzy_index = None
+
+    def add_games(self, games: Iterable[Game]):
+        # Only sort once everything is in
+        for game in games:
+            if isinstance(game, Game) and game.game_id not in self.__games_by_id:
+                self.__games_by_id[game.game_id] = game
+                self.__games.append(game)
         self.sort_games()
 
     def get_game(self, app_id: int) -> Union[None, Game]:
-        # Check each game's id field for specified
-        for game in self.__games:
-            if game.game_id == app_id:
-                return game
-
-        # If for we reach this point, the game isn't in the repository and we return None.
-        return None
+        # If the game isn't in the repository, we return None.
+        return self.__games_by_id.get(app_id)
 
     def get_number_of_games(self):
         return len(self.__games)
@@ -57,57 +100,209 @@ class MemoryRepository(AbstractRepository):
     def get_all_games(self):
         return self.__games
 
-    def get_games_by_genres(self, genres: List[Genre]):
-        hits = []
-        for game in self.__games:
-            for genre in genres:
-                if genre in game.genres:
-                    hits.append(game)
-                    continue
-
-        return hits
+    def get_games_by_genres(self, genres: List[Genre], match_all: bool = False):
+        return self.genre_index.games([genre.genre_name for genre in genres], match_all)
+
+    @property
+    def genre_index(self) -> GenreBitsetIndex:
+        # Bit positions follow the sorted list of games, so the index is rebuilt the first time it is needed after
+        # any game is added
+        if self.__genre_index is None:
+            self.__genre_index = GenreBitsetIndex(self.__games)
+        return self.__genre_index
+
+    @property
+    def title_index(self) -> TitleTrigramIndex:
+        # Like the genre index, postings are positions in the sorted list of games
+        if self.__title_index is None:
+            self.__title_index = TitleTrigramIndex(self.__games)
+        return self.__title_index
+
+    def get_games_page(self, filters: GameFilters, sort: str = SORT_NEWEST, limit: int = 6, cursor: str = None,
+                       load: str = LOAD_LIST):
+        limit = max(0, limit)
+        kind, values = parse_cursor(cursor)
+        if not filters.search_query and filters.publisher is None:
+            # Newest first, sliced out of the sorted list of games or the genre index, so only the page itself is read
+            if kind == "after":
+                start, skip = self.__position_after(self.__games, self.__newest_keys, *values), 0
+            else:
+                start, skip = 0, values[0]
+            if filters.genres:
+                bits = self.genre_index.bitset([genre.genre_name for genre in filters.genres], filters.match_all_genres)
+                games = [self.__games[start + position] for position in set_bits(bits >> start, skip, skip + limit + 1)]
+            else:
+                games = self.__games[start + skip:start + skip + limit + 1]
+            if len(games) > limit > 0:
+                return games[:limit], keyset_cursor(games[limit - 1])
+            return games[:limit], None
+
+        # Searches and publishers page through the list of matching games instead
+        games = self.__matching_games(filters, sort)
+        ranked = self.__is_ranked(filters, sort)
+        if kind == "offset":
+            start = values[0]
+        elif ranked:
+            # Not in newest order, so look for the game itself
+            start = next((position + 1 for position, game in enumerate(games) if game.game_id == values[1]), 0)
+        else:
+            start = self.__position_after(games, [newest_first(game) for game in games], *values)
+        page = games[start:start + limit]
+        if start + limit >= len(games) or not page:
+            return page, None
+        return page, offset_cursor(start + limit) if ranked else keyset_cursor(page[-1])
+
+    def count_games(self, filters: GameFilters, sort: str = SORT_NEWEST) -> int:
+        if not filters.search_query and filters.publisher is None:
+            if filters.genres:
+                return self.genre_index.count([genre.genre_name for genre in filters.genres], filters.match_all_genres)
+            return len(self.__games)
+        return len(self.__matching_games(filters, sort))
+
+    def count_games_per_genre(self) -> dict:
+        counts = {genre.genre_name: self.genre_index.count([genre.genre_name]) for genre in self.__genres}
+        return {genre_name: count for genre_name, count in counts.items() if count}
+
+    @staticmethod
+    def __is_ranked(filters: GameFilters, sort: str) -> bool:
+        # Fuzzy and relevance searches come back best match first rather than newest first
+        return bool(filters.search_query) and (filters.fuzzy or sort == SORT_RELEVANCE)
+
+    def __matching_games(self, filters: GameFilters, sort: str) -> List[Game]:
+        if filters.search_query:
+            # A search matches far fewer games than a genre does, so start from its hits and check the rest one by one
+            if filters.fuzzy:
+                games = self.get_games_by_fuzzy_name_query(filters.search_query)
+            elif sort == SORT_RELEVANCE:
+                # With a genre or publisher filter, rank every hit and cut them down only once they are filtered, so
+                # the filter keeps its best matches even when they fall outside the overall top RELEVANCE_LIMIT
+                filtered = bool(filters.genres) or filters.publisher is not None
+                games = self.get_games_by_relevance(filters.search_query, None if filtered else RELEVANCE_LIMIT)
+            else:
+                games = self.get_games_by_name_query(filters.search_query)
+        elif filters.genres:
+            games = self.genre_index.games([genre.genre_name for genre in filters.genres], filters.match_all_genres)
+        else:
+            games = self.__games
+        if filters.search_query or filters.publisher is not None:
+            games = [game for game in games if filters.matches(game)]
+        if self.__is_ranked(filters, sort) and not filters.fuzzy:
+            games = games[:RELEVANCE_LIMIT]
+        return games
+
+    @staticmethod
+    def __position_after(games: List[Game], newest_keys: List[int], release_ordinal: int, game_id: int) -> int:
+        # Where the games after the given one start in a newest first list, given the newest_first key of each game.
+        # If that game has gone, skip every game released on the same day.
+        position = bisect_left(newest_keys, -release_ordinal)
+        while position < len(games) and games[position].release_ordinal == release_ordinal:
+            if games[position].game_id == game_id:
+                return position + 1
+            position += 1
+        return position
 
     def get_games_by_name_query(self, query: str):
-        hits = []
-        for game in self.__games:
-            if query in game.title:
-                hits.append(game)
+        hits = self.title_index.games(query)
+        if hits is None:
+            # Too short for the index, so fall back to checking every title
+            query = normalize_search_text(query)
+            hits = [game for game in self.__games if query in game.search_key]
 
         return hits
 
-    def get_game_by_id(self, game_id: int) -> Union[None, Game]:
-        hits = [game for game in self.__games if game.game_id == game_id]
-        if hits:
-            return hits[0]
-        else:
-            return None
+    def get_games_by_fuzzy_name_query(self, query: str, max_distance: int = 2):
+        if self.__fuzzy_index is None:
+            self.__fuzzy_index = FuzzyTitleIndex((game.game_id, game.title) for game in self.__games)
+        return [self.__games_by_id[game_id] for game_id in self.__fuzzy_index.search(query, max_distance)]
+
+    @property
+    def text_index(self) -> BM25Index:
+        if self.__text_index is None:
+            self.__text_index = BM25Index((game.game_id, game.title, game.description) for game in self.__games)
+        return self.__text_index
+
+    def get_games_by_relevance(self, query: str, limit: int = None):
+        return [self.__games_by_id[game_id] for _, game_id in self.text_index.search(query, limit)]
+
+    def get_titles_by_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        if self.__title_prefixes is None:
+            self.__title_prefixes = PrefixIndex(game.title for game in self.__games)
+        return self.__title_prefixes.starting_with(prefix, limit)
+
+    def retitle_game(self, game: Game, title: str):
+        """ Change the title of a game in the repository, keeping the title index up to date """
+        old_title = game.title
+        game.title = title
+        self.__text_index = None
+        self.__title_prefixes = None
+        self.__fuzzy_index = None
+        if self.__title_index is not None and self.__games_by_id.get(game.game_id) is game:
+            self.__title_index.retitle(self.__game_position(game), old_title)
+
+    def __game_position(self, game: Game) -> int:
+        # Games are sorted by release date, so jump to the first game released on the same day
+        position = bisect_left(self.__newest_keys, newest_first(game))
+        while self.__games[position] is not game:
+            position += 1
+        return position
+
+    def get_game_by_id(self, game_id: int, load: str = None) -> Union[None, Game]:
+        return self.__games_by_id.get(game_id)
 
     def add_genre(self, genre: Genre):
-        if genre not in self.__genres:
+        if isinstance(genre, Genre) and genre.genre_name not in self.__genres_by_name:
+            self.__genres_by_name[genre.genre_name] = genre
             self.__genres.append(genre)
         self.sort_genres()
 
+    def add_genres(self, genres: Iterable[Genre]):
+        for genre in genres:
+            if isinstance(genre, Genre) and genre.genre_name not in self.__genres_by_name:
+                self.__genres_by_name[genre.genre_name] = genre
+                self.__genres.append(genre)
+        self.sort_genres()
+
     def get_genre(self, name: str):
-        hits = [genre for genre in self.__genres if genre.genre_name == name]
-        if hits:
-            return hits[0]
-        else:
-            return None
+        return self.__genres_by_name.get(name)
 
     def get_all_genres(self):
         return self.__genres
 
     def add_publisher(self, publisher: Publisher):
-        if publisher not in self.__publishers:
+        if isinstance(publisher, Publisher) and publisher.publisher_name not in self.__publishers_by_name:
+            self.__publishers_by_name[publisher.publisher_name] = publisher
             self.__publishers.append(publisher)
+            self.__publisher_prefixes = None
+        self.sort_publishers()
+
+    def add_publishers(self, publishers: Iterable[Publisher]):
+        for publisher in publishers:
+            if isinstance(publisher, Publisher) and publisher.publisher_name not in self.__publishers_by_name:
+                self.__publishers_by_name[publisher.publisher_name] = publisher
+                self.__publishers.append(publisher)
+        self.__publisher_prefixes = None
         self.sort_publishers()
 
+    def get_publisher(self, name: str):
+        return self.__publishers_by_name.get(name)
+
     def get_all_publishers(self):
         return self.__publishers
 
+    def get_publisher_names_by_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        if self.__publisher_prefixes is None:
+            self.__publisher_prefixes = PrefixIndex(publisher.publisher_name for publisher in self.__publishers)
+        return self.__publisher_prefixes.starting_with(prefix, limit)
+
     def sort_games(self):
-        # Sort by newest games first
-        self.__games = list(reversed(sorted(self.__games, key=lambda x: datetime.strptime(x.release_date, "%b %d, %Y"))))
+        # Sort by newest games first, using the release date each game parsed when it was set
+        self.__games.sort(key=newest_first)
+        self.__newest_keys = [newest_first(game) for game in self.__games]
+        self.__genre_index = None
+        self.__title_index = None
+        self.__text_index = None
+        self.__title_prefixes = None
+        self.__fuzzy_index = None
 
     def sort_genres(self):
         self.__genres = sorted(self.__genres)
@@ -121,18 +316,34 @@ class MemoryRepository(AbstractRepository):
         self.sort_publishers()
 
     def add_review(self, review: Review):
-        if isinstance(review, Review) and review not in self.__reviews:
+        # Equal reviews are always for the same game, so only that game's reviews need checking
+        if isinstance(review, Review) and review not in self.__reviews_by_game.get(review.game.game_id, []):
             super().add_review(review)
+            game_id = review.game.game_id
             self.__reviews.append(review)
+            self.__reviews_by_game.setdefault(game_id, []).append(review)
+            self.__rating_summaries.setdefault(game_id, RatingSummary(game_id)).add(review.rating)
 
     def remove_review(self, review: Review):
-        if isinstance(review, Review) and review in self.__reviews:
+        if isinstance(review, Review) and review in self.__reviews_by_game.get(review.game.game_id, []):
             super().remove_review(review)
+            game_id = review.game.game_id
             self.__reviews.remove(review)
+            self.__reviews_by_game[game_id].remove(review)
+            self.__rating_summaries[game_id].remove(review.rating)
 
     def get_reviews(self) -> List[Review]:
         return self.__reviews
 
+    def get_reviews_for_game(self, game_id: int) -> List[Review]:
+        return list(self.__reviews_by_game.get(game_id, []))
+
+    def get_rating_summary(self, game_id: int) -> RatingSummary:
+        summary = self.__rating_summaries.get(game_id)
+        if summary is None:
+            return RatingSummary(game_id)
+        return summary
+
     def add_game_to_wishlist(self, user: User, game: Game):
         user.add_to_wishlist(game)
 
@@ -144,7 +355,7 @@ class MemoryRepository(AbstractRepository):
 
     def get_user_history(self, user: User):
         history = user.history
-        history = list(sorted(history, key=lambda x: datetime.strptime(x.datetimestamp, "%d/%m/%Y %I:%M %p")))
+        history = list(sorted(history, key=lambda x: x.timestamp_key))
         return history
 
 
@@ -162,22 +373,37 @@ def read_csv_simple(file_path: str):
         return rows
 
 
-def load_games(repo: AbstractRepository, data_path: Path):
-    path = str(Path(data_path) / "games.csv")
-    reader = GameFileCSVReader(path)
-    reader.read_csv_file()
+def load_games(repo: AbstractRepository, data_path: Path, workers: int = 1, use_snapshot: bool = False):
+    path = Path(data_path) / "games.csv"
+
+    if use_snapshot:
+        catalogue = snapshot.load_snapshot(path)
+        if catalogue is not None:
+            games, genres, publishers = catalogue
+            repo.add_games(games)
+            repo.add_genres(genres)
+            repo.add_publishers(publishers)
+            return
 
-    # Add everything from the CSV file to the repo for use on the website. Might be slow, but only needs to run once
-    for game in reader.dataset_of_games:
-        repo.add_game(game)
+    reader = GameFileCSVReader(str(path))
 
-    for genre in reader.dataset_of_genres:
-        repo.add_genre(genre)
+    # Add the games to the repo in bulk, so the repo only has to sort each list once. The genres and publishers are
+    # collected by the reader while the games go past.
+    if workers > 1:
+        reader.read_csv_file_parallel(workers)
+    elif use_snapshot:
+        # The snapshot needs the games in file order, so keep hold of them
+        reader.read_csv_file()
 
-    for publisher in reader.dataset_of_publishers:
-        repo.add_publisher(publisher)
+    if reader.dataset_of_games:
+        repo.add_games(reader.dataset_of_games)
+    else:
+        repo.add_games(chain.from_iterable(reader.iter_games()))
+    repo.add_genres(reader.dataset_of_genres)
+    repo.add_publishers(reader.dataset_of_publishers)
 
-    repo.sort_self()
+    if use_snapshot and path.exists():
+        snapshot.write_snapshot(path, reader.dataset_of_games, reader.dataset_of_genres, reader.dataset_of_publishers)
 
 
 def load_users(repo: AbstractRepository, data_path: Path):
@@ -188,5 +414,5 @@ def load_users(repo: AbstractRepository, data_path: Path):
         repo.add_user(User(row[1], generate_password_hash(row[2])))
 
 
-def populate(repo: AbstractRepository, data_path: Path):
-    load_games(repo, data_path)
+def populate(repo: AbstractRepository, data_path: Path, workers: int = 1, use_snapshot: bool = False):
+    load_games(repo, data_path, workers, use_snapshot)
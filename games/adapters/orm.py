@@ -1,10 +1,15 @@
+from typing import Iterable
+
 from sqlalchemy import (
-    Table, MetaData, Column, Integer, String, Text, Float, ForeignKey
+    Table, MetaData, Column, Integer, String, Text, Float, ForeignKey, Index, inspect, select, bindparam, text, event,
+    func
 )
 
 from sqlalchemy.orm import mapper, relationship
 
 from games.domainmodel.model import *
+from games.adapters.fuzzy_index import word_deletions
+from games.adapters.text_index import tokenize
 
 metadata = MetaData()
 
@@ -12,19 +17,30 @@ publishers_table = Table(
     'publishers', metadata,
     # We only want to maintain those attributes that are in our domain model
     # For publisher, we only have name.
-    Column('name', String(255), primary_key=True)  # nullable=False, unique=True)
+    Column('name', String(255), primary_key=True),  # nullable=False, unique=True)
+    # The name as searches compare it (Publisher.search_key)
+    Column('search_key', Text, nullable=True)
 )
 
+# Names starting with a prefix (typed into the search box) are a range scan of this index, already in order
+Index('ix_publishers_search_key_name', publishers_table.c.search_key, publishers_table.c.name)
+
 games_table = Table(
     'games', metadata,
     Column('game_id', Integer, primary_key=True),
     Column('game_title', Text, nullable=False),
     Column('game_price', Float, nullable=False),
     Column('release_date', String(50), nullable=False),
+    # The release date as a day number (date.toordinal()), so "newest first" can be sorted and limited in SQL
+    Column('release_ordinal', Integer, nullable=True, index=True),
     Column('game_description', String(255), nullable=True),
     Column('game_image_url', String(255), nullable=True),
     Column('game_website_url', String(255), nullable=True),
-    Column('publisher_name', ForeignKey('publishers.name'))
+    Column('publisher_name', ForeignKey('publishers.name')),
+    # Not part of the domain model. Written by the bulk loader so catalogue syncs can spot changed games.
+    Column('content_hash', String(32), nullable=True),
+    # The title as searches compare it (Game.search_key). Indexed so titles starting with a prefix are a range scan.
+    Column('search_key', Text, nullable=True, index=True)
 )
 
 genres_table = Table(
@@ -40,6 +56,11 @@ game_genres_table = Table(
     Column('genre_name', ForeignKey('genres.genre_name'))
 )
 
+# Both ways through the link table: a game's genres (and whether it has a given genre, which filtering asks for every
+# game it looks at), and a genre's games. Each index holds both columns, so neither lookup has to visit the table.
+Index('ix_game_genres_game_id_genre_name', game_genres_table.c.game_id, game_genres_table.c.genre_name)
+Index('ix_game_genres_genre_name_game_id', game_genres_table.c.genre_name, game_genres_table.c.game_id)
+
 users_table = Table(
     'users', metadata,
     Column('username', String(255), primary_key=True),
@@ -49,16 +70,26 @@ users_table = Table(
 reviews_table = Table(
     'reviews', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('user_name', String(255), ForeignKey('users.username')),
-    Column('game_id', Integer, ForeignKey('games.game_id')),
+    Column('user_name', String(255), ForeignKey('users.username'), index=True),
+    Column('game_id', Integer, ForeignKey('games.game_id'), index=True),
     Column('comment', Text),
     Column('rating', Integer),
 )
 
+# Each game's review totals (see RatingSummary), updated in the same transaction as the review that changes them, so a
+# game's average and review count are one row lookup. rating_1 to rating_5 count the reviews with each rating.
+rating_summary_table = Table(
+    'game_rating_summary', metadata,
+    Column('game_id', Integer, ForeignKey('games.game_id'), primary_key=True),
+    Column('review_count', Integer, nullable=False, default=0),
+    Column('rating_sum', Integer, nullable=False, default=0),
+    *[Column(f'rating_{rating}', Integer, nullable=False, default=0) for rating in HISTOGRAM_RATINGS],
+)
+
 wishlists_table = Table(
     'wishlists', metadata,
     Column('wishlist_id', Integer, primary_key=True, autoincrement=True),
-    Column('user', String(255), ForeignKey('users.username')),
+    Column('user', String(255), ForeignKey('users.username'), index=True),
 )
 
 wishlist_games_table = Table(
@@ -68,32 +99,243 @@ wishlist_games_table = Table(
     Column('game_id', ForeignKey('games.game_id'))
 )
 
+# A wishlist's games, for listing them and checking whether a game is already on the list
+Index('ix_wishlist_games_wishlist_id_game_id', wishlist_games_table.c.wishlist_id, wishlist_games_table.c.game_id)
+
 history_table = Table(
     'history', metadata,
     Column('id', Integer, primary_key=True, autoincrement=True),
-    Column('user_name', String(255), ForeignKey('users.username')),
+    Column('user_name', String(255), ForeignKey('users.username'), index=True),
     Column('datetime', Text),
     Column('entry', Text),
 )
 
+# The typo tolerant search's vocabulary: every title word under each of its deletions (see fuzzy_index), so the words
+# near a query word are an index lookup. Words are only ever added, by every way of writing games; a word no title
+# uses any more just finds no games in the full-text index.
+title_word_deletions_table = Table(
+    'title_word_deletions', metadata,
+    Column('deletion', Text, primary_key=True),
+    Column('word', Text, primary_key=True),
+    sqlite_with_rowid=False
+)
+
+
+# Full-text index over game titles and descriptions. It is an FTS5 "external content" table: it stores only the index
+# and reads the text back from the games table, and triggers on the games table keep it up to date, so every way of
+# writing games (the ORM, the bulk loader, catalogue syncs) is covered. Terms of two and three characters also get a
+# prefix index, so prefix queries don't have to scan the whole term list.
+SEARCH_TABLE = 'games_search'
+
+SEARCH_INDEX_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+        game_title, game_description, content='games', content_rowid='game_id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_insert AFTER INSERT ON games BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, game_title, game_description)
+        VALUES (new.game_id, new.game_title, new.game_description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_delete AFTER DELETE ON games BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, game_title, game_description)
+        VALUES ('delete', old.game_id, old.game_title, old.game_description);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {SEARCH_TABLE}_update AFTER UPDATE OF game_title, game_description ON games BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, game_title, game_description)
+        VALUES ('delete', old.game_id, old.game_title, old.game_description);
+        INSERT INTO {SEARCH_TABLE}(rowid, game_title, game_description)
+        VALUES (new.game_id, new.game_title, new.game_description);
+    END""",
+]
+
+
+def create_search_index(connection) -> bool:
+    """ Create the full-text index and its triggers if they don't exist yet. Returns whether the index was created.
+    FTS5 is SQLite only, so other databases are left alone. """
+    if connection.dialect.name != 'sqlite':
+        return False
+    created = SEARCH_TABLE not in inspect(connection).get_table_names()
+    for statement in SEARCH_INDEX_DDL:
+        connection.execute(text(statement))
+    return created
+
+
+@event.listens_for(metadata, 'after_create')
+def _create_search_index(target, connection, **kw):
+    create_search_index(connection)
+
+
+@event.listens_for(metadata, 'before_drop')
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text(f'DROP TABLE IF EXISTS {SEARCH_TABLE}'))
+
+
+def migrate_database(connection):
+    """ Bring a database created by an older version of the app up to date with metadata, without repopulating it.
+    Only adds what is missing (columns, indexes declared in metadata, the rating summaries, the full-text index), so it
+    is safe to run on every startup. """
+    columns = [column['name'] for column in inspect(connection).get_columns('games')]
+    if 'content_hash' not in columns:
+        # Existing games count as changed on their first catalogue sync, which fills this in
+        connection.execute(text('ALTER TABLE games ADD COLUMN content_hash VARCHAR(32)'))
+    if 'release_ordinal' not in columns:
+        connection.execute(text('ALTER TABLE games ADD COLUMN release_ordinal INTEGER'))
+    if 'search_key' not in columns:
+        connection.execute(text('ALTER TABLE games ADD COLUMN search_key TEXT'))
+    if 'search_key' not in [column['name'] for column in inspect(connection).get_columns('publishers')]:
+        connection.execute(text('ALTER TABLE publishers ADD COLUMN search_key TEXT'))
+
+    # Fill in release ordinals for games written before the column existed. Dates that can't be read get
+    # UNKNOWN_RELEASE_ORDINAL rather than staying NULL, so they are only looked at once and still sort (and page) last.
+    missing = connection.execute(select(games_table.c.game_id, games_table.c.release_date)
+                                 .where(games_table.c.release_ordinal.is_(None))).all()
+    updates = []
+    for game_id, release_date in missing:
+        try:
+            release_ordinal = datetime.strptime(release_date, RELEASE_DATE_FORMAT).toordinal()
+        except (TypeError, ValueError):
+            release_ordinal = UNKNOWN_RELEASE_ORDINAL
+        updates.append({'b_game_id': game_id, 'release_ordinal': release_ordinal})
+    if updates:
+        connection.execute(games_table.update().where(games_table.c.game_id == bindparam('b_game_id')), updates)
+
+    # And search keys for games and publishers written before those columns existed
+    missing = connection.execute(select(games_table.c.game_id, games_table.c.game_title)
+                                 .where(games_table.c.search_key.is_(None))).all()
+    updates = [{'b_game_id': game_id, 'search_key': normalize_search_text(title)} for game_id, title in missing]
+    if updates:
+        connection.execute(games_table.update().where(games_table.c.game_id == bindparam('b_game_id')), updates)
+    missing = connection.execute(select(publishers_table.c.name)
+                                 .where(publishers_table.c.search_key.is_(None))).scalars().all()
+    updates = [{'b_name': name, 'search_key': normalize_search_text(name)} for name in missing]
+    if updates:
+        connection.execute(publishers_table.update().where(publishers_table.c.name == bindparam('b_name')), updates)
+
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+    if not inspect(connection).has_table(rating_summary_table.name):
+        rating_summary_table.create(connection)
+        # Total up the reviews written before the summaries existed
+        reviews = reviews_table.c
+        connection.execute(rating_summary_table.insert().from_select(
+            [column.name for column in rating_summary_table.columns],
+            select(reviews.game_id, func.count(), func.coalesce(func.sum(reviews.rating), 0),
+                   *[func.count().filter(reviews.rating == rating) for rating in HISTOGRAM_RATINGS])
+            .where(reviews.game_id.is_not(None)).group_by(reviews.game_id)))
+
+    if not inspect(connection).has_table(title_word_deletions_table.name):
+        title_word_deletions_table.create(connection)
+        seen_words = set()
+        for titles in connection.execute(select(games_table.c.game_title)).scalars().partitions(10000):
+            add_title_words(connection, titles, seen_words)
+
+    if create_search_index(connection):
+        # Index the games that were written before the index existed
+        connection.execute(text(f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES ('rebuild')"))
+
+
+def _change_rating_summary(connection, game_id: int, rating: int, change: int):
+    """ Add (change=1) or take away (change=-1) one review with the given rating in a game's rating summary. The
+    game's first review inserts its summary row. """
+    summary = rating_summary_table.c
+    values = {'review_count': summary.review_count + change, 'rating_sum': summary.rating_sum + change * rating}
+    if rating in HISTOGRAM_RATINGS:
+        values[f'rating_{rating}'] = summary[f'rating_{rating}'] + change
+    updated = connection.execute(rating_summary_table.update().where(summary.game_id == game_id).values(values))
+    if updated.rowcount == 0 and change > 0:
+        row = {'game_id': game_id, 'review_count': 1, 'rating_sum': rating}
+        if rating in HISTOGRAM_RATINGS:
+            row[f'rating_{rating}'] = 1
+        connection.execute(rating_summary_table.insert().values(row))
+
+
+def add_title_words(connection, titles: Iterable[str], seen_words: set = None):
+    """ Add the words of the given titles to title_word_deletions. Words in seen_words are skipped, and the words
+    added are put into it, so a caller writing many chunks of games only adds each word once. """
+    if seen_words is None:
+        seen_words = set()
+    rows = []
+    for title in titles:
+        for word in tokenize(title):
+            if word not in seen_words:
+                seen_words.add(word)
+                rows.extend({'deletion': deletion, 'word': word} for deletion in word_deletions(word))
+    if rows:
+        connection.execute(title_word_deletions_table.insert().prefix_with('OR IGNORE', dialect='sqlite'), rows)
+
+
+def _add_game_title_words(mapper, connection, game: Game):
+    add_title_words(connection, [game.title])
+
+
+def _add_changed_game_title_words(mapper, connection, game: Game):
+    if inspect(game).attrs._Game__game_title.history.has_changes():
+        add_title_words(connection, [game.title])
+
+
+# The summaries are updated from the review rows as stored rather than from the Review objects, because a review
+# detached from its game has already lost its game on the object by the time it is deleted.
+
+def _stored_review(connection, review: Review):
+    return connection.execute(select(reviews_table.c.game_id, reviews_table.c.rating)
+                              .where(reviews_table.c.id == review.id)).first()
+
+
+def _change_stored_review(connection, review: Review, change: int):
+    stored = _stored_review(connection, review)
+    if stored is not None and stored.game_id is not None and stored.rating is not None:
+        _change_rating_summary(connection, stored.game_id, stored.rating, change)
+
+
+def _rating_or_game_changed(review: Review) -> bool:
+    # Editing a review's comment leaves the summaries alone
+    attributes = inspect(review).attrs
+    return attributes._Review__rating.history.has_changes() or attributes._Review__game.history.has_changes()
+
+
+def _count_review(mapper, connection, review: Review):
+    _change_stored_review(connection, review, 1)
+
+
+def _uncount_review(mapper, connection, review: Review):
+    _change_stored_review(connection, review, -1)
+
+
+def _uncount_changed_review(mapper, connection, review: Review):
+    if _rating_or_game_changed(review):
+        _change_stored_review(connection, review, -1)
+
+
+def _count_changed_review(mapper, connection, review: Review):
+    if _rating_or_game_changed(review):
+        _change_stored_review(connection, review, 1)
+
 
 def map_model_to_tables():
     mapper(Publisher, publishers_table, properties={
         '_Publisher__publisher_name': publishers_table.c.name,
+        '_Publisher__search_key': publishers_table.c.search_key,
     })
 
-    mapper(Game, games_table, properties={
+    game_mapper = mapper(Game, games_table, properties={
         '_Game__game_id': games_table.c.game_id,
         '_Game__game_title': games_table.c.game_title,
         '_Game__price': games_table.c.game_price,
         '_Game__release_date': games_table.c.release_date,
+        '_Game__release_ordinal': games_table.c.release_ordinal,
+        '_Game__search_key': games_table.c.search_key,
         '_Game__description': games_table.c.game_description,
         '_Game__image_url': games_table.c.game_image_url,
         '_Game__website_url': games_table.c.game_website_url,
         '_Game__publisher': relationship(Publisher),
         '_Game__genres': relationship(Genre, secondary=game_genres_table),
-        '_Game__reviews': relationship(Review, back_populates='_Review__game'),
+        '_Game__reviews': relationship(Review, back_populates='_Review__game', order_by=reviews_table.c.id),
     })
+    # The bulk loader and catalogue syncs add the words of the games they write themselves
+    event.listen(game_mapper, 'after_insert', _add_game_title_words)
+    event.listen(game_mapper, 'after_update', _add_changed_game_title_words)
 
     mapper(Genre, genres_table, properties={
         '_Genre__genre_name': genres_table.c.genre_name,
@@ -107,12 +349,17 @@ def map_model_to_tables():
         '_User__history': relationship(History, back_populates='_History__user'),
     })
 
-    mapper(Review, reviews_table, properties={
+    review_mapper = mapper(Review, reviews_table, properties={
         '_Review__user': relationship(User, back_populates='_User__reviews'),
         '_Review__game': relationship(Game, back_populates='_Game__reviews'),
         '_Review__comment': reviews_table.c.comment,
         '_Review__rating': reviews_table.c.rating,
     })
+    # Keep each game's rating summary in step with its reviews, in the flush that writes them
+    event.listen(review_mapper, 'after_insert', _count_review)
+    event.listen(review_mapper, 'before_delete', _uncount_review)
+    event.listen(review_mapper, 'before_update', _uncount_changed_review)
+    event.listen(review_mapper, 'after_update', _count_changed_review)
 
     mapper(Wishlist, wishlists_table, properties={
         '_Wishlist__user': relationship(User, back_populates='_User__wishlist'),
@@ -0,0 +1,55 @@
+from array import array
+from bisect import bisect_left
+from typing import Iterable, List
+
+from games.domainmodel.model import normalize_search_text
+
+# Keeps a stored string from running into the next one. Names are stored as single lines, and search keys never
+# contain one, so this never appears inside a string.
+SEPARATOR = "\n"
+
+
+class _Packed:
+    """ A read-only sequence of strings stored back to back in one str, with an array of where each one starts.
+    Takes a few bytes of overhead per string instead of a whole str object each. """
+
+    def __init__(self, strings: List[str]):
+        offsets = array("Q", [0])
+        for string in strings:
+            offsets.append(offsets[-1] + len(string) + len(SEPARATOR))
+        self.__text = SEPARATOR.join(strings)
+        self.__offsets = offsets
+
+    def __len__(self):
+        return len(self.__offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return self.__text[self.__offsets[index]:self.__offsets[index + 1] - len(SEPARATOR)]
+
+
+class PrefixIndex:
+    """ Names sorted by their search key (normalize_search_text), for finding the names that start with a prefix.
+
+    A lookup is a binary search for the first name at or after the prefix, followed by reading names until one no
+    longer starts with it, so it costs O(log n + limit) however many names there are. Names and their sort keys are
+    packed into two strings, which keeps the index small enough to hold millions of titles. """
+
+    def __init__(self, names: Iterable[str] = ()):
+        entries = sorted({(normalize_search_text(name), name.replace(SEPARATOR, " ")) for name in names if name})
+        self.__keys = _Packed([key for key, _ in entries])
+        self.__names = _Packed([name for _, name in entries])
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def starting_with(self, prefix: str, limit: int = 10) -> List[str]:
+        """ Up to limit names whose search key starts with prefix's, in order of their search keys """
+        prefix = normalize_search_text(prefix)
+        if not prefix or limit <= 0:
+            return []
+        matches = []
+        position = bisect_left(self.__keys, prefix)
+        while position < len(self.__keys) and len(matches) < limit and self.__keys[position].startswith(prefix):
+            matches.append(self.__names[position])
+            position += 1
+        return matches
@@ -1,15 +1,110 @@
 import abc
-from typing import List
-from games.domainmodel.model import Game, Genre, Publisher, User, Review
+from typing import Iterable, List, Tuple, Union
+from games.domainmodel.model import Game, Genre, Publisher, User, Review, RatingSummary
 
 repo_instance = None
 
 
+def writes_on_get(view):
+    """ Mark a Flask view that writes to the repository even when answering a GET request. The database repository
+    serves GET requests to every other view from its read-only engine. """
+    view.writes_on_get = True
+    return view
+
+
+# Orders for a page of games
+SORT_NEWEST = "newest"
+SORT_RELEVANCE = "relevance"
+
+# Sorting by relevance only ranks this many of the best matches
+RELEVANCE_LIMIT = 600
+
+# Load profiles say which related objects a page is about to read, so the SQL repository can load them alongside
+# the games or user it returns rather than one query per object. The memory repository has them all to hand.
+# list: each game's genres and publisher. detail: those, plus the game's reviews and their users. profile: a user's
+# wishlist and the genres of the games on it.
+LOAD_LIST = "list"
+LOAD_DETAIL = "detail"
+LOAD_PROFILE = "profile"
+
+
 class RepositoryException(Exception):
     def __init__(self, message=None):
         pass
 
 
+class GameFilters:
+    """ What a page of games is narrowed down to. Every filter that is set has to match. """
+
+    def __init__(self, genres: List[Genre] = None, match_all_genres: bool = False, publisher: str = None,
+                 search_query: str = None, fuzzy: bool = False):
+        self.__genres = list(genres or [])
+        self.__match_all_genres = match_all_genres
+        self.__publisher = publisher or None
+        self.__search_query = search_query or None
+        self.__fuzzy = fuzzy
+
+    @property
+    def genres(self) -> List[Genre]:
+        return self.__genres
+
+    @property
+    def match_all_genres(self) -> bool:
+        # Games need every genre instead of any of them
+        return self.__match_all_genres
+
+    @property
+    def publisher(self) -> Union[None, str]:
+        return self.__publisher
+
+    @property
+    def search_query(self) -> Union[None, str]:
+        return self.__search_query
+
+    @property
+    def fuzzy(self) -> bool:
+        # Match the search query allowing for typos (get_games_by_fuzzy_name_query) instead of as typed
+        return self.__fuzzy
+
+    def with_fuzzy_search(self) -> 'GameFilters':
+        return GameFilters(self.__genres, self.__match_all_genres, self.__publisher, self.__search_query, True)
+
+    def matches(self, game: Game) -> bool:
+        """ Whether game passes the genre and publisher filters (the search is up to the repository) """
+        if self.__genres:
+            found = [genre in game.genres for genre in self.__genres]
+            if not (all(found) if self.__match_all_genres else any(found)):
+                return False
+        if self.__publisher is not None:
+            if game.publisher is None or game.publisher.publisher_name != self.__publisher:
+                return False
+        return True
+
+
+# Cursors say where a page of games starts. They are strings so they can go straight into a URL. "offset:N" starts at
+# the N-th match, and "after:ORDINAL:ID" (newest first only) starts just after the game with that release ordinal and
+# id, so it still lands in the right place if games are added in the meantime.
+
+def offset_cursor(offset: int) -> str:
+    return f"offset:{max(0, offset)}"
+
+
+def keyset_cursor(game: Game) -> str:
+    return f"after:{game.release_ordinal}:{game.game_id}"
+
+
+def parse_cursor(cursor: Union[None, str]) -> Tuple[str, tuple]:
+    """ ("offset", (N,)) or ("after", (ordinal, game_id)). Anything unreadable starts from the first match. """
+    try:
+        kind, *values = (cursor or "").split(":")
+        values = tuple(int(value) for value in values)
+        if (kind == "offset" and len(values) == 1 and values[0] >= 0) or (kind == "after" and len(values) == 2):
+            return kind, values
+    except ValueError:
+        pass
+    return "offset", (0,)
+
+
 class AbstractRepository(abc.ABC):
 
     @abc.abstractmethod
@@ -18,8 +113,8 @@ class AbstractRepository(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_user(self, user_name) -> User:
-        """Returns existing user from repository based on unique user_name"""
+    def get_user(self, user_name, load: str = None) -> User:
+        """Returns existing user from repository based on unique user_name, with what the load profile asks for"""
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -27,6 +122,12 @@ class AbstractRepository(abc.ABC):
         """ Add a game to the repository """
         raise NotImplementedError
 
+    def add_games(self, games: Iterable[Game]):
+        """ Add many games to the repository at once. Repositories should override this where they can do better
+        than adding each game one at a time """
+        for game in games:
+            self.add_game(game)
+
     @abc.abstractmethod
     def get_all_users(self):
         """ Returns a list of every user in the repository """
@@ -43,19 +144,71 @@ class AbstractRepository(abc.ABC):
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_games_by_genres(self, genres: List[Genre]):
-        """ Returns a list of all games in the repository which are associated with at least one of the input genres """
+    def get_games_by_genres(self, genres: List[Genre], match_all: bool = False):
+        """ Returns a list of all games in the repository which are associated with at least one of the input genres,
+        or with all of them if match_all is set, newest first. Each game appears once. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_games_page(self, filters: GameFilters, sort: str = SORT_NEWEST, limit: int = 6, cursor: str = None,
+                       load: str = LOAD_LIST) -> Tuple[List[Game], Union[None, str]]:
+        """ Returns one page of at most limit games that match filters, in the given order, starting where cursor
+        says (the first match if None), and the cursor for the page after it (None if this is the last page) """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def count_games(self, filters: GameFilters, sort: str = SORT_NEWEST) -> int:
+        """ Returns how many games get_games_page can page through for filters """
+        raise NotImplementedError
+
+    def count_games_by_genres(self, genres: List[Genre], match_all: bool = False) -> int:
+        """ Returns how many games get_games_by_genres would return, without loading them """
+        if not genres:
+            return 0
+        return self.count_games(GameFilters(genres, match_all_genres=match_all))
+
+    def count_games_by_publisher(self, publisher_name: str) -> int:
+        """ Returns how many games were published by the publisher with exactly this name """
+        return self.count_games(GameFilters(publisher=publisher_name))
+
+    def count_games_by_name_query(self, query: str) -> int:
+        """ Returns how many games get_games_by_name_query would return, without loading them """
+        return self.count_games(GameFilters(search_query=query))
+
+    @abc.abstractmethod
+    def count_games_per_genre(self) -> dict:
+        """ Returns the number of games with each genre, by genre name. Genres without any games are left out. """
         raise NotImplementedError
 
     @abc.abstractmethod
     def get_games_by_name_query(self, query: str):
-        """ Returns a list of all games in the repository where the title of the game contains the input string """
+        """ Returns a list of all games in the repository where the title of the game contains the input string, newest
+        first. Both are compared by their search keys (normalize_search_text), so case, accents and symbols don't
+        matter. """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_games_by_fuzzy_name_query(self, query: str, max_distance: int = 2):
+        """ Returns a list of all games with a word in their title within max_distance typos (edits) of every word of
+        the input string, ignoring case, closest match first """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_games_by_relevance(self, query: str, limit: int = None):
+        """ Returns the games whose title or description shares a word with the input string, best match first
+        (ranked by BM25), at most limit of them """
         raise NotImplementedError
 
     @abc.abstractmethod
-    def get_game_by_id(self, id: int):
+    def get_titles_by_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """ Returns up to limit game titles that start with the input string, ignoring case, in alphabetical order """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_game_by_id(self, id: int, load: str = None):
         """ Returns a single game from the repository, where the id of the game matches the input exactly.
-         If multiple exist, which should not happen, the first is given. If none are found, return None."""
+         If multiple exist, which should not happen, the first is given. If none are found, return None.
+         load is the load profile for what the caller will read from the game."""
         raise NotImplementedError
 
     @abc.abstractmethod
@@ -63,6 +216,11 @@ class AbstractRepository(abc.ABC):
         """ Add a genre to the repository """
         raise NotImplementedError
 
+    def add_genres(self, genres: Iterable[Genre]):
+        """ Add many genres to the repository at once """
+        for genre in genres:
+            self.add_genre(genre)
+
     @abc.abstractmethod
     def get_all_genres(self):
         """ Returns a list of every genre in the repository """
@@ -73,11 +231,22 @@ class AbstractRepository(abc.ABC):
         """ Add a publisher to the repository """
         raise NotImplementedError
 
+    def add_publishers(self, publishers: Iterable[Publisher]):
+        """ Add many publishers to the repository at once """
+        for publisher in publishers:
+            self.add_publisher(publisher)
+
     @abc.abstractmethod
     def get_all_publishers(self):
         """ Returns a list of every publisher in the repository """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_publisher_names_by_prefix(self, prefix: str, limit: int = 10) -> List[str]:
+        """ Returns up to limit publisher names that start with the input string, ignoring case, in alphabetical
+        order """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def sort_games(self):
         """ Updates the list of games in the repo to be sorted """
@@ -123,6 +292,17 @@ class AbstractRepository(abc.ABC):
         """ Fetch all reviews from the repository """
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def get_reviews_for_game(self, game_id: int) -> List[Review]:
+        """ Fetch the reviews of the game with the given id, oldest first, with the users who wrote them """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def get_rating_summary(self, game_id: int) -> RatingSummary:
+        """ The rating totals of the game with the given id, kept up to date by add_review and remove_review. A game
+        with no reviews has an empty summary. """
+        raise NotImplementedError
+
     @abc.abstractmethod
     def add_game_to_wishlist(self, user: User, game: Game):
         """ Add a game to the given user's wishlist """
@@ -0,0 +1,101 @@
+import gc
+import hashlib
+import os
+import pickle
+from pathlib import Path
+from typing import Union
+
+import games.domainmodel.model as model
+
+# Bump this if the layout of the snapshot itself changes. Changes to the domain model are picked up automatically,
+# since the model's source is part of the key.
+SNAPSHOT_VERSION = 1
+
+
+def snapshot_path(csv_path: Path) -> Path:
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.name + ".snapshot")
+
+
+def file_digest(path: Path) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _model_digest() -> str:
+    return file_digest(Path(model.__file__))
+
+
+def load_snapshot(csv_path: Path) -> Union[None, tuple]:
+    """ Return (games, genres, publishers) from the snapshot of csv_path, or None if there is no usable snapshot.
+
+    The snapshot is only used if it was written from a CSV file of the same size and content. The content hash is
+    only computed when the modification time has changed, so an untouched file costs a single stat() call. If the
+    content turns out to be the same, the snapshot is rewritten with the new modification time, so the hash is only
+    computed once after the file is touched. """
+    csv_path = Path(csv_path)
+    path = snapshot_path(csv_path)
+    if not path.exists() or not csv_path.exists():
+        return None
+
+    stat = os.stat(csv_path)
+    try:
+        with open(path, "rb") as file:
+            # The key is pickled separately in front of the catalogue, so a stale snapshot is rejected without
+            # reading the rest of the file
+            key = pickle.load(file)
+            if key.get("version") != SNAPSHOT_VERSION or key.get("model") != _model_digest():
+                return None
+            if key.get("size") != stat.st_size:
+                return None
+            touched = key.get("mtime_ns") != stat.st_mtime_ns
+            if touched and key.get("digest") != file_digest(csv_path):
+                return None
+            # Unpickling creates a lot of objects and nothing to collect, so keep the cyclic GC out of the way
+            gc_was_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                catalogue = pickle.load(file)
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, TypeError) as e:
+        print(f"Ignoring unreadable catalogue snapshot {path}: {e}")
+        return None
+
+    if touched:
+        _write(path, dict(key, mtime_ns=stat.st_mtime_ns), catalogue)
+    return catalogue["games"], catalogue["genres"], catalogue["publishers"]
+
+
+def write_snapshot(csv_path: Path, games: list, genres: list, publishers: list):
+    """ Write a snapshot of the parsed catalogue next to csv_path. Failing to write one is not an error. """
+    csv_path = Path(csv_path)
+    path = snapshot_path(csv_path)
+    stat = os.stat(csv_path)
+    key = {
+        "version": SNAPSHOT_VERSION,
+        "model": _model_digest(),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "digest": file_digest(csv_path),
+    }
+    catalogue = {"games": list(games), "genres": list(genres), "publishers": list(publishers)}
+    _write(path, key, catalogue)
+
+
+def _write(path: Path, key: dict, catalogue: dict):
+    # Write to a temporary file and move it into place, so a worker starting up never sees half a snapshot
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(temp_path, "wb") as file:
+            pickle.dump(key, file, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(catalogue, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not write catalogue snapshot {path}: {e}")
+        if temp_path.exists():
+            temp_path.unlink()
@@ -0,0 +1,106 @@
+import heapq
+import math
+from array import array
+from collections import Counter
+from typing import Hashable, Iterable, List, Tuple
+
+from games.domainmodel.model import normalize_search_text
+
+# Standard BM25 parameters: how quickly repeats of a term stop adding to the score, and how much long documents are
+# penalised for being long
+K1 = 1.2
+B = 0.75
+
+# Each title term counts as this many description terms, so a match in the title outranks one buried in the
+# description
+TITLE_WEIGHT = 3
+
+
+def tokenize(text: str) -> List[str]:
+    # The words of the text's search key, so "Pok\u00e9mon\u00ae" and "pokemon" are the same word
+    return normalize_search_text(text).split()
+
+
+class BM25Index:
+    """ An inverted index over the title and description of each game, ranking games against a query with BM25.
+
+    Documents are identified by a key (the game id) and numbered in the order they were given, and each term maps
+    to an array of document numbers and an array of how often the term occurs in each of them. A query only visits
+    the postings of its own terms, and the best `limit` documents are picked with a heap rather than a full sort. """
+
+    def __init__(self, documents: Iterable[Tuple[Hashable, str, str]] = None):
+        self.__keys = []
+        self.__lengths = array("I")
+        self.__average_length = 1.0
+        self.__postings = {}
+        self.__weights = {}
+        if documents is not None:
+            self.rebuild(documents)
+
+    def rebuild(self, documents: Iterable[Tuple[Hashable, str, str]]):
+        """ Index (key, title, description) triples """
+        keys = []
+        lengths = array("I")
+        postings = {}
+        for number, (key, title, description) in enumerate(documents):
+            counts = Counter(tokenize(description))
+            for term in tokenize(title):
+                counts[term] += TITLE_WEIGHT
+            for term, count in counts.items():
+                posting = postings.get(term)
+                if posting is None:
+                    posting = postings[term] = (array("I"), array("I"))
+                posting[0].append(number)
+                posting[1].append(count)
+            keys.append(key)
+            lengths.append(sum(counts.values()))
+
+        self.__keys = keys
+        self.__lengths = lengths
+        self.__average_length = (sum(lengths) / len(lengths)) if lengths else 1.0
+        self.__postings = postings
+        self.__weights = {}
+
+    def __len__(self):
+        return len(self.__keys)
+
+    def idf(self, term: str) -> float:
+        # Lucene's variant of the idf, which never goes negative for very common terms
+        frequency = len(self.__postings[term][0]) if term in self.__postings else 0
+        return math.log(1 + (len(self.__keys) - frequency + 0.5) / (frequency + 0.5))
+
+    def weights(self, term: str) -> array:
+        """ The BM25 weight of term in each document on its posting list, leaving out the idf.
+
+        These only depend on the documents, so they are worked out the first time a term is searched for and kept,
+        which leaves later queries with one multiplication per posting. """
+        weights = self.__weights.get(term)
+        if weights is None:
+            lengths = self.__lengths
+            average_length = self.__average_length
+            numbers, counts = self.__postings[term]
+            weights = array("d", (count * (K1 + 1) / (count + K1 * (1 - B + B * lengths[number] / average_length))
+                                  for number, count in zip(numbers, counts)))
+            self.__weights[term] = weights
+        return weights
+
+    def search(self, query: str, limit: int = None) -> List[Tuple[float, Hashable]]:
+        """ (score, key) of the best matches for query, best first, at most limit of them. Documents that match
+        none of the query's terms are left out. Equal scores keep the order the documents were indexed in. """
+        scores = {}
+        for term in set(tokenize(query)):
+            if term not in self.__postings:
+                continue
+            idf = self.idf(term)
+            for number, weight in zip(self.__postings[term][0], self.weights(term)):
+                scores[number] = scores.get(number, 0.0) + idf * weight
+
+        def rank(item):
+            number, score = item
+            return score, -number
+
+        if limit is None:
+            best = sorted(scores.items(), key=rank, reverse=True)
+        else:
+            best = heapq.nlargest(limit, scores.items(), key=rank)
+        return [(score, self.__keys[number]) for number, score in best]
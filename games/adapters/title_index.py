@@ -0,0 +1,93 @@
+from array import array
+from bisect import bisect_left, insort
+from typing import List, Union
+
+from games.domainmodel.model import Game, normalize_search_text
+
+# Length of the substrings the titles are broken into
+GRAM_SIZE = 3
+
+# Once this few candidates are left, checking their titles directly is cheaper than intersecting more posting lists
+VERIFY_CANDIDATES = 32
+
+
+def trigrams(text: str) -> set:
+    if not text:
+        return set()
+    return {text[start:start + GRAM_SIZE] for start in range(len(text) - GRAM_SIZE + 1)}
+
+
+class TitleTrigramIndex:
+    """ An inverted index from every three character substring of a title's search key (Game.search_key) to the games
+    whose key contains it.
+
+    A title that contains the query must contain every trigram of the query, so a substring search only has to look
+    at the games in the intersection of the query's posting lists, and then check each of those with `in` to get rid
+    of false positives. Queries are normalized like the keys, so matching ignores case, accents and symbols. Each
+    posting list is an array of positions into the list the index was built from, in ascending order, so matches come
+    back in the same order as that list. Queries shorter than a trigram can't be answered from the index. """
+
+    def __init__(self, games: List[Game] = None):
+        self.__games = []
+        self.__postings = {}
+        if games is not None:
+            self.rebuild(games)
+
+    def rebuild(self, games: List[Game]):
+        postings = {}
+        for position, game in enumerate(games):
+            for gram in trigrams(game.search_key):
+                posting = postings.get(gram)
+                if posting is None:
+                    posting = postings[gram] = array("I")
+                posting.append(position)
+
+        self.__games = list(games)
+        self.__postings = postings
+
+    def retitle(self, position: int, old_title: str):
+        """ Update the postings of the game at position, whose title used to be old_title """
+        old_grams = trigrams(normalize_search_text(old_title))
+        new_grams = trigrams(self.__games[position].search_key)
+        for gram in old_grams - new_grams:
+            posting = self.__postings[gram]
+            posting.remove(position)
+            if not posting:
+                del self.__postings[gram]
+        for gram in new_grams - old_grams:
+            insort(self.__postings.setdefault(gram, array("I")), position)
+
+    def games(self, query: str) -> Union[None, List[Game]]:
+        """ The games whose search key contains query's, in index order, or None if the query is too short to use the
+        index """
+        query = normalize_search_text(query)
+        grams = trigrams(query)
+        if not grams:
+            return None
+
+        postings = [self.__postings.get(gram) for gram in grams]
+        if any(posting is None for posting in postings):
+            return []
+        postings.sort(key=len)
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            if len(candidates) <= VERIFY_CANDIDATES:
+                break
+            if len(candidates) * 16 < len(posting):
+                # Far fewer candidates than postings, so binary search the posting list for each candidate
+                candidates = {position for position in candidates if _contains(posting, position)}
+            else:
+                candidates.intersection_update(posting)
+
+        hits = []
+        for position in sorted(candidates):
+            game = self.__games[position]
+            if query in game.search_key:
+                hits.append(game)
+        return hits
+
+
+def _contains(posting: array, position: int) -> bool:
+    index = bisect_left(posting, position)
+    return index < len(posting) and posting[index] == position
@@ -0,0 +1,26 @@
+from itertools import chain
+from pathlib import Path
+
+import click
+from flask.cli import AppGroup
+
+import games.adapters.repository as repo
+from games.adapters.database_repository import SqlAlchemyRepository
+from games.adapters.datareader.csvdatareader import GameFileCSVReader
+
+# Registered on the app as `flask catalogue ...`
+catalogue_cli = AppGroup('catalogue', help='Manage the games catalogue.')
+
+
+@catalogue_cli.command('sync')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False, path_type=Path))
+def sync_catalogue(csv_path: Path):
+    """ Upsert the new and changed games in CSV_PATH into the database, keeping users, reviews and wishlists. """
+    if not isinstance(repo.repo_instance, SqlAlchemyRepository):
+        raise click.ClickException('catalogue sync needs REPOSITORY=database')
+
+    reader = GameFileCSVReader(str(csv_path))
+    counts = repo.repo_instance.sync_catalogue(chain.from_iterable(reader.iter_games()))
+
+    click.echo(f"{counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged "
+               f"in {counts['seconds']:.2f}s")
@@ -1,5 +1,16 @@
+import re
+import unicodedata
 from datetime import datetime
 
+RELEASE_DATE_FORMAT = "%b %d, %Y"
+# The release ordinal of a game whose release date can't be read. Day numbers start at 1, so these games come after
+# every dated game newest first.
+UNKNOWN_RELEASE_ORDINAL = 0
+HISTORY_TIMESTAMP_FORMAT = "%d/%m/%Y %I:%M %p"
+
+# Anything that isn't a letter or a digit: punctuation, symbols like ® and ™, and whitespace
+NOT_WORD_CHARACTERS = re.compile(r"[\W_]+")
+
 
 class Publisher:
     def __init__(self, publisher_name: str):
@@ -7,6 +18,7 @@ class Publisher:
             self.__publisher_name = None
         else:
             self.__publisher_name = publisher_name.strip()
+        self.__search_key = normalize_search_text(self.__publisher_name)
 
     @property
     def publisher_name(self) -> str:
@@ -18,6 +30,15 @@ class Publisher:
             self.__publisher_name = None
         else:
             self.__publisher_name = new_publisher_name.strip()
+        self.__search_key = normalize_search_text(self.__publisher_name)
+
+    @property
+    def search_key(self) -> str:
+        # The name as searches compare it, like Game.search_key
+        if self.__search_key is None:
+            # Loaded from a database row written before the search_key column existed
+            self.__search_key = normalize_search_text(self.__publisher_name)
+        return self.__search_key
 
     def __repr__(self):
         return f'<Publisher {self.__publisher_name}>'
@@ -74,9 +95,11 @@ class Game:
             self.__game_title = game_title.strip()
         else:
             self.__game_title = None
+        self.__search_key = normalize_search_text(self.__game_title)
 
         self.__price = None
         self.__release_date = "Jan 1, 1970"
+        self.__release_ordinal = datetime(1970, 1, 1).toordinal()
         self.__description = None
         self.__image_url = None
         self.__website_url = None
@@ -109,6 +132,15 @@ class Game:
             self.__game_title = new_title.strip()
         else:
             self.__game_title = None
+        self.__search_key = normalize_search_text(self.__game_title)
+
+    @property
+    def search_key(self) -> str:
+        # The title as searches compare it, worked out once whenever the title is set
+        if self.__search_key is None:
+            # Loaded from a database row written before the search_key column existed
+            self.__search_key = normalize_search_text(self.__game_title)
+        return self.__search_key
 
     @property
     def price(self):
@@ -130,13 +162,19 @@ class Game:
         if isinstance(release_date, str):
             try:
                 # Check if the release_date string is in the correct date format (e.g., "Oct 21, 2008")
-                datetime.strptime(release_date, "%b %d, %Y")
-                self.__release_date = release_date
+                parsed_date = datetime.strptime(release_date, RELEASE_DATE_FORMAT)
             except ValueError:
                 raise ValueError("Release date must be in 'Oct 21, 2008' format!")
+            self.__release_date = release_date
+            # Keep the parsed date around as a day number, so games can be sorted without parsing the string again
+            self.__release_ordinal = parsed_date.toordinal()
         else:
             raise ValueError("Release date must be a string in 'Oct 21, 2008' format!")
 
+    @property
+    def release_ordinal(self) -> int:
+        return self.__release_ordinal
+
     @property
     def description(self):
         return self.__description
@@ -381,6 +419,67 @@ class Review:
         return other.user == self.__user and other.game == self.__game and other.comment == self.__comment
 
 
+# The ratings the review form offers, which are what the rating histogram counts
+HISTOGRAM_RATINGS = range(1, 6)
+
+
+class RatingSummary:
+    """ Running totals of a game's review ratings: how many reviews it has, their ratings added up, and how many
+    reviews gave each rating in HISTOGRAM_RATINGS. Kept up to date as reviews are added and removed, so a game's
+    average doesn't need its reviews. """
+
+    def __init__(self, game_id: int, review_count: int = 0, rating_sum: int = 0, histogram: dict = None):
+        self.__game_id = game_id
+        self.__review_count = review_count
+        self.__rating_sum = rating_sum
+        self.__histogram = {rating: 0 for rating in HISTOGRAM_RATINGS}
+        if histogram is not None:
+            self.__histogram.update(histogram)
+
+    @property
+    def game_id(self) -> int:
+        return self.__game_id
+
+    @property
+    def review_count(self) -> int:
+        return self.__review_count
+
+    @property
+    def rating_sum(self) -> int:
+        return self.__rating_sum
+
+    @property
+    def histogram(self) -> dict:
+        return dict(self.__histogram)
+
+    @property
+    def average(self) -> float:
+        if self.__review_count == 0:
+            return 0
+        return self.__rating_sum / self.__review_count
+
+    def add(self, rating: int):
+        self.__review_count += 1
+        self.__rating_sum += rating
+        if rating in self.__histogram:
+            self.__histogram[rating] += 1
+
+    def remove(self, rating: int):
+        self.__review_count -= 1
+        self.__rating_sum -= rating
+        if rating in self.__histogram:
+            self.__histogram[rating] -= 1
+
+    def __repr__(self):
+        return f"<RatingSummary {self.__game_id}: {self.__review_count} reviews, {self.__histogram}>"
+
+    def __eq__(self, other):
+        if not isinstance(other, self.__class__):
+            return False
+        return (other.game_id, other.review_count, other.rating_sum, other.histogram) == \
+               (self.__game_id, self.__review_count, self.__rating_sum, self.__histogram)
+
+
 class Wishlist:
     def __init__(self, user: User):
         if not isinstance(user, User):
@@ -437,8 +536,10 @@ class History:
         if not isinstance(entry, str):
             raise ValueError("Entry must be a string")
 
+        now = datetime.now()
         self.__user = user
-        self.__datetimestamp = datetime_stamp()
+        self.__datetimestamp = now.strftime(HISTORY_TIMESTAMP_FORMAT)
+        self.__timestamp_key = minute_key(now)
         self.__entry = entry
 
     @property
@@ -449,6 +550,16 @@ class History:
     def datetimestamp(self):
         return self.__datetimestamp
 
+    @property
+    def timestamp_key(self) -> int:
+        # Histories loaded from the database skip __init__, so work the key out from the stored string the first
+        # time it is needed
+        try:
+            return self.__timestamp_key
+        except AttributeError:
+            self.__timestamp_key = minute_key(datetime.strptime(self.__datetimestamp, HISTORY_TIMESTAMP_FORMAT))
+            return self.__timestamp_key
+
     @property
     def entry(self):
         return self.__entry
@@ -469,8 +580,7 @@ class History:
     def __lt__(self, other):
         if not isinstance(other, self.__class__):
             return False
-        return (datetime.strptime(self.__datetimestamp, "%d/%m/%Y %I:%M %p")
-                < datetime.strptime(other.__datetimestamp, "%d/%m/%Y %I:%M %p"))
+        return self.timestamp_key < other.timestamp_key
 
 
 def create_review(user: User, game: Game, rating: int, comment: str):
@@ -481,5 +591,33 @@ def create_review(user: User, game: Game, rating: int, comment: str):
     return review
 
 
-def datetime_stamp():
-    return datetime.now().strftime("%d/%m/%Y %I:%M %p")
+def normalize_search_text(text: str) -> str:
+    """ text in the form every search compares: accents removed (NFKD), case folded, and every run of punctuation,
+    symbols and whitespace turned into a single space. "Pok\u00e9mon\u00ae: Let's Go" becomes "pokemon let s go". """
+    if not text:
+        return ""
+    if not text.isascii():
+        # Split accents off their letters and drop them first, since a combining mark on its own isn't a word
+        # character. Then drop symbols before NFKD, which would otherwise turn ™ into the letters TM.
+        text = unicodedata.normalize("NFD", text).translate(_combining_marks())
+        text = NOT_WORD_CHARACTERS.sub(" ", text)
+        text = unicodedata.normalize("NFKD", text).translate(_combining_marks())
+    return NOT_WORD_CHARACTERS.sub(" ", text.casefold()).strip()
+
+
+_COMBINING_MARKS = None
+
+
+def _combining_marks() -> dict:
+    # Accents and other combining marks, which NFKD splits off the letters they sit on, mapped to None for
+    # str.translate. Takes a moment to build, so it is only built once a title that needs it comes along.
+    global _COMBINING_MARKS
+    if _COMBINING_MARKS is None:
+        _COMBINING_MARKS = dict.fromkeys(code_point for code_point in range(0x20000)
+                                         if unicodedata.category(chr(code_point)) in ("Mn", "Me"))
+    return _COMBINING_MARKS
+
+
+def minute_key(moment: datetime) -> int:
+    """ A sortable number for the minute that moment falls in, matching the resolution of a history timestamp """
+    return (moment.toordinal() * 24 + moment.hour) * 60 + moment.minute
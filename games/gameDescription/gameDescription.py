@@ -5,6 +5,7 @@ from wtforms import SelectField, TextAreaField, HiddenField, SubmitField
 from wtforms.validators import DataRequired, Length
 
 import games.adapters.repository as repo
+from games.adapters.repository import LOAD_LIST
 import games.gameDescription.services as services
 
 from games.authentication.authentication import login_required
@@ -25,9 +26,10 @@ def game_description():
     publishers = get_publishers(repo.repo_instance)
 
     game_id = int(request.args.get('id'))
-    game_to_show = services.get_game_by_id(repo.repo_instance, game_id)
+    game_to_show = services.get_game_by_id(repo.repo_instance, game_id, LOAD_LIST)
     reviews = services.get_game_reviews(repo.repo_instance, game_id)
     reviews = list(reversed(reviews))
+    review_count = services.get_review_count(repo.repo_instance, game_id)
     review_average = services.get_average_rating(repo.repo_instance, game_id)
 
     if 'user_name' not in session:
@@ -36,7 +38,7 @@ def game_description():
         on_wishlist = services.game_in_user_wishlist(repo.repo_instance, session['user_name'], game_id)
 
     return render_template('gameDescription/gameDescription.html', genres_list=genres_list,
-                           game=game_to_show, reviews=reviews, review_count=len(reviews), review_average=review_average,
+                           game=game_to_show, reviews=reviews, review_count=review_count, review_average=review_average,
                            on_wishlist=on_wishlist, user=user, form=None, publishers=publishers)
 
 
@@ -78,6 +80,7 @@ class ReviewForm(FlaskForm):
 
 
 @gameDescription_blueprint.route('/gameDescription/wishlist', methods=['GET', 'POST'])
+@repo.writes_on_get
 @login_required
 def wishlist_request():
     username = session['user_name']
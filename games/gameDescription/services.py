@@ -10,8 +10,8 @@ class UnknownUserException(Exception):
     pass
 
 
-def get_game_by_id(repo: AbstractRepository, game_id: int):
-    return repo.get_game_by_id(game_id)
+def get_game_by_id(repo: AbstractRepository, game_id: int, load: str = None):
+    return repo.get_game_by_id(game_id, load)
 
 
 def add_review(repo: AbstractRepository, username: str, game_id: int,  rating: int, review_text: str):
@@ -32,15 +32,20 @@ def add_review(repo: AbstractRepository, username: str, game_id: int,  rating: i
 
 
 def get_game_reviews(repo: AbstractRepository, game_id: int):
-    return [review for review in repo.get_reviews() if review.game.game_id == game_id]
+    # The game's own reviews, with their users, rather than every review in the repository
+    return repo.get_reviews_for_game(game_id)
+
+
+def get_review_count(repo: AbstractRepository, game_id: int):
+    return repo.get_rating_summary(game_id).review_count
 
 
 def get_average_rating(repo: AbstractRepository, game_id: int):
-    reviews = get_game_reviews(repo, game_id)
-    ratings = [review.rating for review in reviews]
+    # From the game's rating summary, so the reviews themselves aren't needed
+    summary = repo.get_rating_summary(game_id)
 
-    if len(ratings) > 0:
-        return round(sum(ratings) / len(ratings), 2)
+    if summary.review_count > 0:
+        return round(summary.average, 2)
     else:
         return 0
 
@@ -1,6 +1,9 @@
 from flask import Blueprint, render_template, url_for, request, session
 
+from math import ceil
+
 import games.adapters.repository as repo
+from games.adapters.repository import offset_cursor
 import games.search.services as search_services
 import games.gamesList.services as services
 
@@ -25,9 +28,16 @@ def games_list():
 
 
     search_handler = search_services.process_url()
-    max_page = services.get_number_of_pages(search_handler["games_to_show"], number_to_show)
-    games_to_show = services.get_page_of_games(search_handler["games_to_show"], search_handler["search_page"],
-                                               number_to_show)
+    filters, number_of_games = search_services.get_filters_and_count(repo.repo_instance,
+                                                                     search_handler["search_filters"],
+                                                                     search_handler["search_sort"])
+    max_page = max(1, ceil(number_of_games / number_to_show))
+    search_handler["search_page"] = max(1, min(search_handler["search_page"], max_page))
+
+    # The next link carries on from where this page ends. Any other page is found by its offset.
+    cursor = search_handler["search_cursor"] or offset_cursor((search_handler["search_page"] - 1) * number_to_show)
+    games_to_show, next_cursor = search_services.get_games_page(repo.repo_instance, filters,
+                                                                search_handler["search_sort"], number_to_show, cursor)
 
     if request.method == "POST":
         # Ready in case jump-to-page is implemented
@@ -39,20 +49,28 @@ def games_list():
     pagination_urls["next"] = url_for('gamesList_bp.games_list', page=min(search_handler["search_page"] + 1,
                                                                           max_page),
                                       genre_filter=[genre.genre_name for genre in search_handler["search_genres"]],
-                                      search=search_handler["search_query"])
+                                      search=search_handler["search_query"], sort=search_handler["search_sort"],
+                                      selectPublisher=search_handler["search_publishers"], cursor=next_cursor,
+                                      genre_match=search_handler["search_genre_match"])
 
     pagination_urls["prev"] = url_for('gamesList_bp.games_list', page=max(search_handler["search_page"] - 1, 1),
                                       genre_filter=[genre.genre_name for genre in search_handler["search_genres"]],
-                                      search=search_handler["search_query"])
+                                      search=search_handler["search_query"], sort=search_handler["search_sort"],
+                                      selectPublisher=search_handler["search_publishers"],
+                                      genre_match=search_handler["search_genre_match"])
 
     pagination_urls["first"] = url_for('gamesList_bp.games_list', page=1,
                                        genre_filter=[genre.genre_name for genre in search_handler["search_genres"]],
-                                       search=search_handler["search_query"])
+                                       search=search_handler["search_query"], sort=search_handler["search_sort"],
+                                       selectPublisher=search_handler["search_publishers"],
+                                      genre_match=search_handler["search_genre_match"])
 
     pagination_urls["last"] = url_for('gamesList_bp.games_list',
                                       page=max_page,
                                       genre_filter=[genre.genre_name for genre in search_handler["search_genres"]],
-                                      search=search_handler["search_query"])
+                                      search=search_handler["search_query"], sort=search_handler["search_sort"],
+                                      selectPublisher=search_handler["search_publishers"],
+                                      genre_match=search_handler["search_genre_match"])
 
     return render_template('gameList/gameList.html', games_list=games_to_show,
                            genres_list=genres_list, pagination_urls=pagination_urls,
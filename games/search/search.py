@@ -0,0 +1,14 @@
+from flask import Blueprint, jsonify, request
+
+import games.adapters.repository as repo
+import games.search.services as services
+
+# Configure Blueprint.
+search_blueprint = Blueprint('search_bp', __name__, url_prefix='/api/search')
+
+
+@search_blueprint.route('/suggest', methods=['GET'])
+def suggest():
+    query = request.args.get('q', '')
+    limit = request.args.get('limit', services.SUGGESTION_LIMIT, type=int)
+    return jsonify(services.get_suggestions(repo.repo_instance, query, limit))
@@ -1,12 +1,20 @@
-from typing import List, Union
+from typing import List, Tuple, Union
 
 from flask import request
 
-from games.adapters.repository import AbstractRepository
+from games.adapters.repository import AbstractRepository, GameFilters, SORT_RELEVANCE, LOAD_LIST
 from games.domainmodel.model import Genre, Publisher
 import games.adapters.repository as repo
 import games.genres.services as genre_services
 
+# Values of the genre_match request argument. Games need every selected genre unless it asks for any of them.
+GENRE_MATCH_ALL = "all"
+GENRE_MATCH_ANY = "any"
+
+# Suggestions of each kind shown under the search box by default, and the most that can be asked for
+SUGGESTION_LIMIT = 8
+MAX_SUGGESTION_LIMIT = 50
+
 
 def get_games_by_genre(repo: AbstractRepository, genres: Union[Genre, List[Genre]]):
     # Contingency case for easier cascade sorting
@@ -24,26 +32,61 @@ def get_games_by_name(repo: AbstractRepository, query: str):
     return repo.get_games_by_name_query(query)
 
 
-def get_games_by_cascade(repo: AbstractRepository, genres: Union[None, Genre, List[Genre]],
-                         publishers: Union[None, Publisher, List[Publisher]], search_query: str):
-    # Get games which match genre(s). get_games_by_genre() will handle instance of genres == None.
-    valid_games = get_games_by_genre(repo, genres)
+def get_games_by_fuzzy_name(repo: AbstractRepository, query: str):
+    return repo.get_games_by_fuzzy_name_query(query)
 
-    # Remove games which are not by a desired publisher
-    if publishers:
-        # Ensure input is a list
-        if type(publishers) == Publisher:
-            publishers = [publishers]
 
-        valid_games = [game for game in valid_games if game.publisher.publisher_name in publishers]
+def get_games_by_relevance(repo: AbstractRepository, query: str, limit: int = None):
+    return repo.get_games_by_relevance(query, limit)
 
-    # Searching for a query is likely the most resource-intensive operation, so we perform it last on the least games
-    if search_query:
-        valid_games = [game for game in valid_games if search_query in game.title]
 
+def get_suggestions(repo: AbstractRepository, query: str, limit: int = SUGGESTION_LIMIT) -> dict:
+    # Titles and publishers starting with what has been typed so far
+    limit = max(0, min(limit, MAX_SUGGESTION_LIMIT))
+    return {
+        "query": query,
+        "titles": repo.get_titles_by_prefix(query, limit),
+        "publishers": repo.get_publisher_names_by_prefix(query, limit),
+    }
+
+
+def get_games_by_cascade(repo: AbstractRepository, genres: Union[None, Genre, List[Genre]],
+                         publishers: Union[None, str, Publisher, List[Union[str, Publisher]]], search_query: str,
+                         sort: str = None):
+    # Every game with any of the genres, by one of the publishers and matching the search, read through the same
+    # repository paging as the games list. Each publisher's games come back in turn.
+    if type(genres) == Genre:
+        genres = [genres]
+    if not publishers or isinstance(publishers, (str, Publisher)):
+        publishers = [publishers or None]
+
+    valid_games = []
+    for publisher in publishers:
+        if isinstance(publisher, Publisher):
+            publisher = publisher.publisher_name
+        filters, count = get_filters_and_count(repo, GameFilters(genres, publisher=publisher,
+                                                                 search_query=search_query), sort)
+        if count:
+            valid_games += get_games_page(repo, filters, sort, count)[0]
     return valid_games
 
 
+def get_filters_and_count(repo: AbstractRepository, filters: GameFilters, sort: str = None) -> Tuple[GameFilters, int]:
+    # The filters to page through and how many games match them. A search that matches nothing as typed allows for
+    # a typo or two in each word of the query instead.
+    count = repo.count_games(filters, sort)
+    if count == 0 and filters.search_query and not filters.fuzzy:
+        filters = filters.with_fuzzy_search()
+        count = repo.count_games(filters, sort)
+    return filters, count
+
+
+def get_games_page(repo: AbstractRepository, filters: GameFilters, sort: str = None, limit: int = 6,
+                   cursor: str = None):
+    # The games are shown in a list, with their genres
+    return repo.get_games_page(filters, sort, limit, cursor, LOAD_LIST)
+
+
 def process_url() -> dict:
     output_data = {}
 
@@ -51,6 +94,7 @@ def process_url() -> dict:
     output_data["search_genres"] = None
     output_data["search_publishers"] = None
     output_data["search_page"] = 1
+    output_data["search_sort"] = None
 
     page_arg = request.args.get("page")
     if page_arg:
@@ -62,10 +106,15 @@ def process_url() -> dict:
     output_data["search_genres"] = [genre for genre in output_data["genres_in_dataset"] if genre.genre_name
                                     in request.args.getlist('genre_filter')]
     output_data["search_publishers"] = request.args.get("selectPublisher")
-
-
-    output_data["games_to_show"] = get_games_by_cascade(repo.repo_instance, output_data["search_genres"],
-                                                         output_data["search_publishers"], output_data["search_query"])
+    output_data["search_sort"] = request.args.get("sort")
+    output_data["search_genre_match"] = request.args.get("genre_match")
+    output_data["search_cursor"] = request.args.get("cursor")
+
+    # Only the page being shown is fetched, so hand over the filters rather than every matching game
+    output_data["search_filters"] = GameFilters(output_data["search_genres"],
+                                                match_all_genres=output_data["search_genre_match"] != GENRE_MATCH_ANY,
+                                                publisher=output_data["search_publishers"],
+                                                search_query=output_data["search_query"])
 
     return output_data
 
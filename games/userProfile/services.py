@@ -1,4 +1,4 @@
-from games.adapters.repository import AbstractRepository
+from games.adapters.repository import AbstractRepository, LOAD_PROFILE
 from games.domainmodel.model import User
 
 
@@ -6,6 +6,11 @@ def get_user_from_username(repo: AbstractRepository, username: str):
     return repo.get_user(username)
 
 
+def get_user_profile(repo: AbstractRepository, username: str):
+    # The user along with their wishlist, ready for the profile page
+    return repo.get_user(username, LOAD_PROFILE)
+
+
 def get_user_history(repo: AbstractRepository, user: User, entries: int = 10):
     user_history = repo.get_user_history(user)
     user_history = [(history.datetimestamp, history.entry) for history in user_history]
@@ -15,7 +15,7 @@ userProfile_blueprint = Blueprint('userProfile_bp', __name__)
 @userProfile_blueprint.route('/userProfile', methods=['GET', 'POST'])
 @login_required
 def user_profile():
-    user = services.get_user_from_username(repo.repo_instance, session['user_name'])
+    user = services.get_user_profile(repo.repo_instance, session['user_name'])
     publishers = get_publishers(repo.repo_instance)
     genres_list = get_genres(repo.repo_instance)
 
@@ -32,6 +32,7 @@ def client():
         'TESTING': True,                                # Set to True during testing.
         'REPOSITORY': 'memory',
         'TEST_DATA_PATH': TEST_DATA_PATH,               # Path for loading test data into the repository.
+        'CATALOGUE_SNAPSHOT': False,                    # Parse the CSV file rather than writing a snapshot next to it.
         'WTF_CSRF_ENABLED': False                       # test_client will not send a CSRF token, so disable validation.
     })
 
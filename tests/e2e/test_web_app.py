@@ -1,3 +1,6 @@
+import html
+import re
+
 import pytest
 
 from flask import session
@@ -102,6 +105,17 @@ def test_games_list(client):
     assert b'Ninjas Against the Machines' in response.data
 
 
+def test_games_list_next_page(client):
+    # The next page carries on from a cursor, and shows the same games as asking for page 2
+    response = client.get('/gamesList')
+    next_url = re.search(r"window.location.href='([^']*)';\">Next", response.data.decode()).group(1)
+    assert 'cursor=after' in next_url
+
+    titles = re.findall(r"<h2>(.*)</h2>", client.get(html.unescape(next_url)).data.decode())
+    assert len(titles) == 6
+    assert titles == re.findall(r"<h2>(.*)</h2>", client.get('/gamesList?page=2').data.decode())
+
+
 def test_articles_with_search_query(client):
     # Check that we can reach the game list.
     response = client.get('/gamesList?search=Call+of+Duty')
@@ -111,6 +125,30 @@ def test_articles_with_search_query(client):
     assert b'Call of Duty' in response.data
 
 
+def test_articles_with_relevance_search(client):
+    # Words from the description are enough when sorting by relevance
+    response = client.get('/gamesList?search=zombie+survival&sort=relevance')
+    assert response.status_code == 200
+    assert b'Alien Breed 3: Descent' in response.data
+
+    # Only an exact title match is found without it
+    response = client.get('/gamesList?search=zombie+survival')
+    assert response.status_code == 200
+    assert b'Alien Breed 3: Descent' not in response.data
+
+
+def test_search_suggestions(client):
+    response = client.get('/api/search/suggest?q=sp')
+    assert response.status_code == 200
+    assert response.json == {"query": "sp", "titles": ["Space Ace", "Space Pirate Trainer"], "publishers": []}
+
+    response = client.get('/api/search/suggest?q=a&limit=1')
+    assert response.json["titles"] == ["Alien Breed 3: Descent"]
+    assert response.json["publishers"] == ["Activision"]
+
+    assert client.get('/api/search/suggest').json == {"query": "", "titles": [], "publishers": []}
+
+
 def test_articles_with_genre_query(client):
     # Check that we can reach the game list.
     response = client.get('/gamesList?genre_filter=Casual')
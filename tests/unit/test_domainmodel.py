@@ -1,6 +1,8 @@
 import pytest
 import os
-from games.domainmodel.model import Publisher, Genre, Game, Review, User, Wishlist, create_review
+from datetime import date, datetime
+from games.domainmodel.model import Publisher, Genre, Game, Review, User, Wishlist, History, RatingSummary, \
+    create_review, minute_key, normalize_search_text
 from games.adapters.datareader.csvdatareader import GameFileCSVReader
 
 
@@ -165,6 +167,33 @@ def test_game_release_date_setter():
         game.release_date = "21/08/2008"
 
 
+def test_game_release_ordinal():
+    game = Game(1, "Super Soccer Blast")
+    assert game.release_ordinal == date(1970, 1, 1).toordinal()
+
+    game.release_date = "Oct 21, 2008"
+    assert game.release_ordinal == date(2008, 10, 21).toordinal()
+
+    # A rejected release date leaves the ordinal as it was
+    with pytest.raises(ValueError):
+        game.release_date = "21/08/2008"
+    assert game.release_ordinal == date(2008, 10, 21).toordinal()
+
+
+def test_game_search_key():
+    game = Game(1, "Call of Duty® 4: Modern Warfare®")
+    assert game.search_key == "call of duty 4 modern warfare"
+    game.title = "  Pokémon™ Let's GO  "
+    assert game.search_key == "pokemon let s go"
+    game.title = ""
+    assert game.search_key == ""
+
+    assert normalize_search_text("Straße   ＦＵＬＬ_width") == "strasse full width"
+    assert normalize_search_text(None) == ""
+    # Decomposed (NFD) accents are dropped like precomposed ones, rather than splitting the word
+    assert normalize_search_text("E\u0301clair") == normalize_search_text("\u00c9clair") == "eclair"
+
+
 def test_game_description_setter():
     game = Game(1, "Domino House")
     game.description = "This is a domino game"
@@ -360,6 +389,30 @@ def test_review_eq():
     assert review1 != 2
 
 
+def test_rating_summary_add_remove():
+    summary = RatingSummary(1)
+    assert summary.review_count == 0 and summary.average == 0
+    assert summary.histogram == {1: 0, 2: 0, 3: 0, 4: 0, 5: 0}
+
+    for rating in [5, 4, 4, 1]:
+        summary.add(rating)
+    assert summary.review_count == 4 and summary.rating_sum == 14 and summary.average == 3.5
+    assert summary.histogram == {1: 1, 2: 0, 3: 0, 4: 2, 5: 1}
+
+    summary.remove(4)
+    assert summary == RatingSummary(1, 3, 10, {1: 1, 4: 1, 5: 1})
+
+    # A rating of 0 counts towards the average, but has no place in the histogram
+    summary.add(0)
+    assert summary.review_count == 4 and summary.average == 2.5
+    assert sum(summary.histogram.values()) == 3
+
+    # The histogram handed out is a copy
+    summary.histogram[5] = 100
+    assert summary.histogram[5] == 1
+    assert summary != RatingSummary(2, 4, 10, {1: 1, 4: 1, 5: 1})
+
+
 @pytest.fixture
 def user():
     return User("Shyamli", "pw12345")
@@ -578,3 +631,19 @@ def test_user_history_update_history(user, game):
     assert f"Added '{game.title}' to wishlist" in history_messages
     assert f"Removed '{game.title}' from wishlist" in history_messages
     assert f"Removed a review for '{review.game.title}'" in history_messages
+
+
+def test_history_timestamp_key(user):
+    history1 = History(user, "First")
+    history2 = History(user, "Second")
+
+    # The key matches the minute in the timestamp string
+    parsed = datetime.strptime(history1.datetimestamp, "%d/%m/%Y %I:%M %p")
+    assert history1.timestamp_key == minute_key(parsed)
+
+    # Histories from the database have no key until it is asked for
+    history2._History__datetimestamp = "25/12/2030 01:30 PM"
+    del history2._History__timestamp_key
+    assert history2.timestamp_key == minute_key(datetime(2030, 12, 25, 13, 30))
+    assert history1 < history2
+    assert not history2 < history1
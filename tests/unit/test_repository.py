@@ -1,10 +1,21 @@
 import pytest
+import csv
 import os
+import pickle
+import tracemalloc
 from pathlib import Path
-from games.domainmodel.model import Publisher, Genre, Game, Review, User, Wishlist
+from games.domainmodel.model import Publisher, Genre, Game, Review, User, Wishlist, RatingSummary, create_review, \
+    normalize_search_text
 from games.adapters.datareader.csvdatareader import GameFileCSVReader
 
+from games.adapters import snapshot
+from games.adapters.fuzzy_index import FuzzyTitleIndex, deletions, edit_distance
+from games.adapters.genre_index import GenreBitsetIndex, set_bits
 from games.adapters.memory_repository import MemoryRepository, populate
+from games.adapters.prefix_index import PrefixIndex
+from games.adapters.repository import GameFilters, SORT_RELEVANCE, offset_cursor, parse_cursor
+from games.adapters.text_index import BM25Index, tokenize
+from games.adapters.title_index import TitleTrigramIndex
 
 
 def test_repository_add_game():
@@ -45,6 +56,161 @@ def test_repository_add_game():
     assert game1 in repo.get_all_games()
 
 
+def test_repository_add_games_in_bulk():
+    repo = MemoryRepository()
+
+    game1 = Game(1, "Test Game")
+    game1.release_date = "Jan 1, 2000"
+    game2 = Game(2, "Test Quest")
+    game2.release_date = "Jan 1, 2010"
+    game3 = Game(3, "Unit Tests: The Game")
+    game3.release_date = "Jan 1, 2005"
+    repo.add_game(game1)
+
+    # Duplicates, both within the batch and against what is already stored, are ignored
+    repo.add_games([game2, game1, game3, game2])
+    assert repo.get_number_of_games() == 3
+
+    # Games are still kept newest first
+    assert repo.get_all_games() == [game2, game3, game1]
+
+    repo.add_genres([Genre("Racing"), Genre("Action"), Genre("Racing")])
+    assert repo.get_all_genres() == [Genre("Action"), Genre("Racing")]
+
+    repo.add_publishers(publisher for publisher in [Publisher("Valve"), Publisher("Activision")])
+    assert repo.get_all_publishers() == [Publisher("Activision"), Publisher("Valve")]
+
+
+def test_reader_iter_games_in_batches():
+    reader = GameFileCSVReader(str(Path(__file__).parents[1] / 'data' / 'games.csv'))
+
+    batches = list(reader.iter_games(batch_size=10))
+
+    # The 29 games in the test data come out in batches of at most 10, and nothing is kept in dataset_of_games
+    assert [len(batch) for batch in batches] == [10, 10, 9]
+    assert reader.dataset_of_games == []
+    assert reader.get_unique_genres_count() == 3
+    assert reader.get_unique_publishers_count() == 29
+
+
+def test_reader_iter_games_stays_under_memory_budget(tmp_path):
+    # About 15MB of CSV, mostly in columns we never use, like the screenshots and movies in the real export
+    path = tmp_path / "games.csv"
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["AppID", "Name", "Release date", "Price", "About the game", "Header image", "Publishers",
+                         "Genres", "Screenshots", "Movies"])
+        for app_id in range(1, 3001):
+            writer.writerow([app_id, f"Game {app_id}", "Oct 21, 2008", "9.99", "A game,\nwith a description",
+                             "https://example.com/header.jpg", f"Publisher {app_id % 50}", "Action,Indie",
+                             "s" * 2500, "m" * 2500])
+
+    reader = GameFileCSVReader(str(path))
+    games_read = 0
+    tracemalloc.start()
+    try:
+        for batch in reader.iter_games(batch_size=200):
+            games_read += len(batch)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert games_read == 3000
+    assert peak < 2 * 1024 * 1024
+
+
+def test_reader_parallel_matches_sequential(tmp_path):
+    # Descriptions with quoted newlines and quotes mean a lot of newlines in the file are not record boundaries
+    path = tmp_path / "games.csv"
+    with open(path, "w", encoding="utf-8-sig", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(["AppID", "Name", "Release date", "Price", "About the game", "Header image", "Publishers",
+                         "Genres"])
+        for app_id in range(1, 301):
+            description = f'Line one of "{app_id}"\n' * (app_id % 7) + "the end"
+            writer.writerow([app_id, f"Game {app_id}", "Oct 21, 2008", "9.99", description,
+                             "https://example.com/header.jpg", f"Publisher {app_id % 13}", f"Genre {app_id % 5}"])
+
+    sequential = GameFileCSVReader(str(path))
+    sequential.read_csv_file()
+    parallel = GameFileCSVReader(str(path))
+    parallel.read_csv_file_parallel(workers=3)
+
+    assert parallel.dataset_of_games == sequential.dataset_of_games
+    assert [game.description for game in parallel.dataset_of_games] == \
+           [game.description for game in sequential.dataset_of_games]
+    assert parallel.dataset_of_genres == sequential.dataset_of_genres
+    assert parallel.dataset_of_publishers == sequential.dataset_of_publishers
+    assert parallel.get_unique_publishers_count() == 13
+
+
+def test_populate_in_parallel(in_memory_repo):
+    repo = MemoryRepository()
+    populate(repo, Path(__file__).parents[2] / 'games' / 'adapters' / 'data', workers=2)
+
+    assert repo.get_all_games() == in_memory_repo.get_all_games()
+    assert repo.get_all_genres() == in_memory_repo.get_all_genres()
+    assert repo.get_all_publishers() == in_memory_repo.get_all_publishers()
+
+
+def test_populate_from_snapshot(tmp_path, monkeypatch):
+    csv_path = tmp_path / "games.csv"
+    csv_path.write_bytes((Path(__file__).parents[1] / 'data' / 'games.csv').read_bytes())
+
+    # The first load parses the CSV file and writes a snapshot next to it
+    parsed_repo = MemoryRepository()
+    populate(parsed_repo, tmp_path, use_snapshot=True)
+    assert snapshot.snapshot_path(csv_path).exists()
+
+    # The second load comes from the snapshot, and ends up with the same catalogue
+    games, genres, publishers = snapshot.load_snapshot(csv_path)
+    assert len(games) == 29 and len(genres) == 3 and len(publishers) == 29
+    snapshot_repo = MemoryRepository()
+    populate(snapshot_repo, tmp_path, use_snapshot=True)
+    assert snapshot_repo.get_all_games() == parsed_repo.get_all_games()
+    assert snapshot_repo.get_all_genres() == parsed_repo.get_all_genres()
+    assert snapshot_repo.get_all_publishers() == parsed_repo.get_all_publishers()
+    assert snapshot_repo.get_game_by_id(7940).genres == parsed_repo.get_game_by_id(7940).genres
+
+    # Touching the file without changing it keeps the snapshot, since the content hash still matches. The snapshot
+    # takes the new modification time, so the next load doesn't hash the file again.
+    os.utime(csv_path, ns=(0, 0))
+    assert snapshot.load_snapshot(csv_path) is not None
+    with open(snapshot.snapshot_path(csv_path), "rb") as file:
+        assert pickle.load(file)["mtime_ns"] == 0
+    hashed = []
+    file_digest = snapshot.file_digest
+    monkeypatch.setattr(snapshot, "file_digest", lambda path: hashed.append(path) or file_digest(path))
+    assert snapshot.load_snapshot(csv_path) is not None
+    assert csv_path not in hashed
+    monkeypatch.undo()
+
+    # Changing the CSV file invalidates the snapshot
+    with open(csv_path, "a", encoding="utf-8") as file:
+        file.write('1,Snapshot Test,"Oct 21, 2008",0,,,,,,,,,,,,,Publisher,,Action,,,\n')
+    assert snapshot.load_snapshot(csv_path) is None
+    changed_repo = MemoryRepository()
+    populate(changed_repo, tmp_path, use_snapshot=True)
+    assert changed_repo.get_number_of_games() == 30
+    assert snapshot.load_snapshot(csv_path) is not None
+
+
+def test_repository_add_game_keeps_newest_first():
+    repo = MemoryRepository()
+
+    dates = ["Jan 1, 2000", "Jan 1, 2010", "Jan 1, 2005", "Jan 1, 2010", "Jan 1, 1999"]
+    for game_id, release_date in enumerate(dates):
+        game = Game(game_id, f"Game {game_id}")
+        game.release_date = release_date
+        repo.add_game(game)
+
+    # Newest first, and games released on the same day stay in the order they were added
+    assert [game.game_id for game in repo.get_all_games()] == [1, 3, 2, 0, 4]
+
+    repo.sort_games()
+    assert [game.game_id for game in repo.get_all_games()] == [1, 3, 2, 0, 4]
+
+
 def test_get_game():
     repo = MemoryRepository()
 
@@ -63,6 +229,31 @@ def test_get_game():
     assert repo.get_game_by_id(4) is None
 
 
+def test_repository_lookups_use_indexes():
+    repo = MemoryRepository()
+
+    game = Game(1, "Test Game")
+    game.publisher = Publisher("Valve")
+    repo.add_games([game])
+    repo.add_game(Game(1, "Same ID, different object"))
+    repo.add_genre(Genre("Action"))
+    repo.add_publishers([Publisher("Valve"), Publisher("Valve")])
+
+    # Lookups and duplicate checks go by primary key, whichever method added the item
+    assert repo.get_game_by_id(1) is game and repo.get_game(1) is game
+    assert repo.get_number_of_games() == 1
+    assert repo.get_genre("Action") == Genre("Action")
+    assert repo.get_publisher("Valve") == Publisher("Valve") and len(repo.get_all_publishers()) == 1
+    assert repo.get_publisher("Activision") is None
+
+    # Things that aren't domain objects are never stored
+    repo.add_game("Not a game")
+    repo.add_genre(None)
+    repo.add_publisher(42)
+    assert repo.get_number_of_games() == 1
+    assert len(repo.get_all_genres()) == 1 and len(repo.get_all_publishers()) == 1
+
+
 def test_repo_genres(in_memory_repo):
     repo = in_memory_repo
 
@@ -107,10 +298,128 @@ def test_genre_search(in_memory_repo):
     # Is a known game of the genre found?
     assert game_callofduty in repo.get_games_by_genres([genre1])
 
-    # Does the repo handle multiple genres?
-    assert len(repo.get_games_by_genres([genre1, genre2])) == 594
-    assert len(repo.get_games_by_genres([genre1, genre3])) == 411
-    assert len(repo.get_games_by_genres([genre1, genre2, genre3])) == 600
+    # Does the repo handle multiple genres? Games with more than one of the genres should only be listed once.
+    assert len(repo.get_games_by_genres([genre1, genre2])) == 534
+    assert len(repo.get_games_by_genres([genre1, genre3])) == 405
+    assert len(repo.get_games_by_genres([genre1, genre2, genre3])) == 534
+
+    # Can it find only the games which have all the genres?
+    assert len(repo.get_games_by_genres([genre1, genre2], match_all=True)) == 60
+    assert len(repo.get_games_by_genres([genre1, genre3], match_all=True)) == 6
+    assert repo.get_games_by_genres([genre1, genre2, genre3], match_all=True) == []
+
+    # Results keep the repo's newest first order
+    games = repo.get_games_by_genres([genre1, genre2])
+    assert games == [game for game in repo.get_all_games() if genre1 in game.genres or genre2 in game.genres]
+
+    # Adding a game updates the results
+    new_game = Game(1, "Newest Violent Game")
+    new_game.release_date = "Jan 1, 2030"
+    new_game.add_genre(genre3)
+    repo.add_game(new_game)
+    assert repo.get_games_by_genres([genre3])[0] == new_game
+    assert len(repo.get_games_by_genres([genre3])) == 7
+
+
+def test_genre_bitset_index():
+    games = [Game(game_id, f"Game {game_id}") for game_id in range(20)]
+    for game in games:
+        if game.game_id % 2 == 0:
+            game.add_genre(Genre("Even"))
+        if game.game_id % 3 == 0:
+            game.add_genre(Genre("Triple"))
+    index = GenreBitsetIndex(games)
+
+    assert index.count(["Even"]) == 10
+    assert index.count(["Even", "Triple"]) == 13
+    assert index.count(["Even", "Triple"], match_all=True) == 4
+    assert index.games(["Even", "Triple"], match_all=True) == [games[0], games[6], games[12], games[18]]
+    assert index.games(["Even"], start=2, stop=4) == [games[4], games[6]]
+    assert index.games(["Not a genre"]) == [] and index.games([]) == []
+    assert set_bits(0b101001) == [0, 3, 5]
+
+
+def walk_pages(repo, filters, sort=None, limit=7):
+    # Every game get_games_page hands out, following the cursors from the first page to the last
+    games, cursor = repo.get_games_page(filters, sort, limit)
+    while cursor is not None:
+        page, cursor = repo.get_games_page(filters, sort, limit, cursor)
+        assert 0 < len(page) <= limit
+        games += page
+    return games
+
+
+def test_games_page(in_memory_repo):
+    repo = in_memory_repo
+    action = repo.get_genre("Action")
+    simulation = repo.get_genre("Simulation")
+
+    # The first page, and the cursor for the next one
+    games, cursor = repo.get_games_page(GameFilters(), limit=6)
+    assert games == repo.get_all_games()[:6]
+    assert repo.get_games_page(GameFilters(), limit=6, cursor=cursor)[0] == repo.get_all_games()[6:12]
+    assert repo.get_games_page(GameFilters(), limit=6, cursor=offset_cursor(6))[0] == repo.get_all_games()[6:12]
+
+    # Following the cursors visits every matching game once, in the same order as the list queries
+    both = GameFilters([action, simulation])
+    assert walk_pages(repo, GameFilters()) == repo.get_all_games()
+    assert walk_pages(repo, both) == repo.get_games_by_genres([action, simulation])
+    assert walk_pages(repo, GameFilters([action, simulation], match_all_genres=True)) == \
+           repo.get_games_by_genres([action, simulation], match_all=True)
+    assert walk_pages(repo, GameFilters(search_query="the")) == repo.get_games_by_name_query("the")
+    assert repo.count_games(both) == 534 and repo.count_games(GameFilters()) == repo.get_number_of_games()
+
+    # Publishers have to match exactly
+    by_big_fish = GameFilters(publisher="Big Fish Games")
+    assert walk_pages(repo, by_big_fish, limit=4) == [game for game in repo.get_all_games()
+                                                      if game.publisher.publisher_name == "Big Fish Games"]
+    assert repo.count_games(by_big_fish) == 6
+    assert repo.count_games(GameFilters(publisher="Big Fish")) == 0
+
+    # Ranked searches page through their own order
+    relevance = GameFilters([action], search_query="zombie survival")
+    expected = [game for game in repo.get_games_by_relevance("zombie survival") if action in game.genres][:600]
+    assert walk_pages(repo, relevance, SORT_RELEVANCE, limit=3) == expected
+    assert repo.count_games(relevance, SORT_RELEVANCE) == len(expected)
+
+    # Filters apply before the ranked hits are cut down, so a game ranked outside the overall top 600 still matches
+    ranked = repo.get_games_by_relevance("the")
+    assert len(ranked) > 600
+    outsider = ranked[-1]
+    by_outsider = GameFilters(publisher=outsider.publisher.publisher_name, search_query="the")
+    assert outsider in walk_pages(repo, by_outsider, SORT_RELEVANCE)
+    assert repo.count_games(by_outsider, SORT_RELEVANCE) == \
+           len([game for game in ranked if game.publisher == outsider.publisher])
+    fuzzy = GameFilters(search_query="call of dutty", fuzzy=True)
+    assert walk_pages(repo, fuzzy) == repo.get_games_by_fuzzy_name_query("call of dutty")
+
+    # A keyset cursor still lands after its game when a newer game is added in between
+    games, cursor = repo.get_games_page(both, limit=6)
+    new_game = Game(1, "Newest Action Game")
+    new_game.release_date = "Jan 1, 2030"
+    new_game.add_genre(action)
+    repo.add_game(new_game)
+    assert repo.get_games_page(both, limit=6, cursor=cursor)[0] == repo.get_games_by_genres([action, simulation])[7:13]
+
+    # Past the end, and cursors that can't be read
+    assert repo.get_games_page(GameFilters(), cursor=offset_cursor(10 ** 6)) == ([], None)
+    assert parse_cursor("nonsense") == parse_cursor(None) == ("offset", (0,))
+
+
+def test_game_counts(in_memory_repo):
+    repo = in_memory_repo
+    action = repo.get_genre("Action")
+    simulation = repo.get_genre("Simulation")
+
+    assert repo.count_games_by_genres([action, simulation]) == 534
+    assert repo.count_games_by_genres([action, simulation], match_all=True) == 60
+    assert repo.count_games_by_genres([]) == 0
+    assert repo.count_games_by_publisher("Big Fish Games") == 6
+    assert repo.count_games_by_name_query("the") == len(repo.get_games_by_name_query("the"))
+
+    per_genre = repo.count_games_per_genre()
+    assert per_genre["Action"] == 405 and per_genre["Violent"] == 6
+    assert all(count == len(repo.get_games_by_genres([repo.get_genre(name)])) for name, count in per_genre.items())
 
 
 def test_text_search(in_memory_repo):
@@ -123,8 +432,8 @@ def test_text_search(in_memory_repo):
     assert len(repo.get_games_by_name_query("Call of Duty")) == 1
     assert game_callofduty in repo.get_games_by_name_query("Call of Duty")
 
-    # Try a more broad query, will it search the whole repo properly?
-    assert len(repo.get_games_by_name_query("e")) == 739
+    # Try a more broad query, will it search the whole repo properly? Case doesn't matter, so this includes "E"s too.
+    assert len(repo.get_games_by_name_query("e")) == 773
     assert game_callofduty in repo.get_games_by_name_query("e")
 
     # Try searching for nonsense. Does it handle no games found?
@@ -136,6 +445,144 @@ def test_text_search(in_memory_repo):
     assert repo.get_games_by_name_query("") == repo.get_all_games()
 
 
+def test_text_search_index_matches_scan(in_memory_repo):
+    repo = in_memory_repo
+    games = repo.get_all_games()
+
+    for query in ["Call of Duty", "the", "The", "Simulator", "VR", "2", "ing ", "e: ", "zzzz"]:
+        key = normalize_search_text(query)
+        assert repo.get_games_by_name_query(query) == [game for game in games if key in game.search_key]
+
+    # Case, accents and symbols are ignored
+    game_callofduty = repo.get_game_by_id(7940)
+    assert repo.get_games_by_name_query("CALL OF DUTY 4 MODERN warfare") == [game_callofduty]
+    assert repo.get_games_by_name_query("Duty® 4: Modern") == [game_callofduty]
+
+
+def test_title_trigram_index():
+    games = [Game(1, "Dungeon Quest"), Game(2, "Space Dungeon"), Game(3, "Quest for Space")]
+    index = TitleTrigramIndex(games)
+
+    assert index.games("Dungeon") == [games[0], games[1]]
+    assert index.games("Quest") == [games[0], games[2]]
+    # Every trigram of the query is in the title, but not in the right order
+    assert index.games("Space Quest") == []
+    assert index.games("Nothing") == []
+    # Too short to answer from the index
+    assert index.games("Qu") is None
+
+
+def test_text_search_after_add_and_retitle():
+    repo = MemoryRepository()
+    first = Game(1, "Dungeon Quest")
+    second = Game(2, "Space Dungeon")
+    second.release_date = "Jan 1, 2020"
+    repo.add_game(first)
+    repo.add_game(second)
+    assert repo.get_games_by_name_query("Dungeon") == [second, first]
+
+    third = Game(3, "Dungeon Farm")
+    third.release_date = "Jan 1, 2030"
+    repo.add_game(third)
+    assert repo.get_games_by_name_query("Dungeon") == [third, second, first]
+
+    repo.retitle_game(second, "Space Farm")
+    assert repo.get_games_by_name_query("Dungeon") == [third, first]
+    assert repo.get_games_by_name_query("Farm") == [third, second]
+    assert second.title == "Space Farm"
+
+
+def test_bm25_index():
+    index = BM25Index([
+        (1, "Zombie Farm", "Grow crops and keep the zombies out."),
+        (2, "Survival Island", "A survival game. Build a shelter, find food, survive."),
+        (3, "Zombie Survival", "Survive the zombie apocalypse."),
+        (4, "Space Quest", "Nothing to do with the undead."),
+    ])
+
+    assert tokenize("Call of Duty® 4: Modern_Warfare") == ["call", "of", "duty", "4", "modern", "warfare"]
+    # Matching both words in the title beats matching one
+    assert [key for _, key in index.search("zombie survival")] == [3, 2, 1]
+    assert [key for _, key in index.search("zombie survival", limit=1)] == [3]
+    assert index.search("apocalypse")[0][1] == 3
+    assert index.search("dragon") == [] and index.search("") == []
+
+
+def test_relevance_search(in_memory_repo):
+    repo = in_memory_repo
+
+    games = repo.get_games_by_relevance("modern warfare")
+    assert games[0] == repo.get_game_by_id(7940)
+    assert len(repo.get_games_by_relevance("space", limit=2)) == 2
+    assert repo.get_games_by_relevance("857r6t2q378g78r1g282g8") == []
+
+    # Adding a game that is already there, or something that isn't a game, keeps the index
+    index = repo.text_index
+    repo.add_game(repo.get_game_by_id(7940))
+    repo.add_game("Not a game")
+    assert repo.text_index is index
+
+    new_game = Game(1, "Warfare Modern Warfare")
+    new_game.description = "Modern warfare."
+    repo.add_game(new_game)
+    assert repo.get_games_by_relevance("modern warfare")[0] == new_game
+
+
+def test_prefix_index():
+    index = PrefixIndex(["Space Ace", "space pirate", "Spacewar!", "Arcadia", "Space Ace", "", None])
+
+    assert len(index) == 4
+    assert index.starting_with("SPACE") == ["Space Ace", "space pirate", "Spacewar!"]
+    assert index.starting_with("space ", limit=1) == ["Space Ace"]
+    assert index.starting_with("Spaces") == []
+    assert index.starting_with("") == [] and index.starting_with("a", limit=0) == []
+
+
+def test_names_by_prefix(in_memory_repo_shortened):
+    repo = in_memory_repo_shortened
+
+    assert repo.get_titles_by_prefix("sp") == ["Space Ace", "Space Pirate Trainer"]
+    assert repo.get_titles_by_prefix("a", limit=2) == ["Alien Breed 3: Descent", "Arcadia"]
+    assert repo.get_publisher_names_by_prefix("ACTI") == ["Activision"]
+
+    repo.add_game(Game(1, "Spacewar!"))
+    repo.add_publisher(Publisher("Activity Games"))
+    assert repo.get_titles_by_prefix("sp") == ["Space Ace", "Space Pirate Trainer", "Spacewar!"]
+    assert repo.get_publisher_names_by_prefix("acti") == ["Activision", "Activity Games"]
+
+    repo.add_publisher(Publisher("Électronique Arts™"))
+    assert repo.get_publisher_names_by_prefix("electronique-a") == ["Électronique Arts™"]
+
+
+def test_fuzzy_title_index():
+    assert deletions("abc", 1) == {"abc", "ab", "ac", "bc"}
+    assert edit_distance("wticher", "witcher", 2) == 1
+    assert edit_distance("skyrm", "skyrim", 2) == 1
+    assert edit_distance("dragon", "zombie", 2) == 3
+
+    index = FuzzyTitleIndex([(1, "The Witcher 3"), (2, "Skyrim"), (3, "Witcher Skyrim"), (4, "Star Wars 3")])
+
+    assert index.search("Wticher") == [1, 3]
+    assert index.search("skyrm witcher") == [3]
+    # Short words and numbers have to be spelt right
+    assert index.search("witcher 4") == []
+    assert index.search("Stra Wars 3") == [4]
+    assert index.search("Wticher", max_distance=0) == []
+    assert index.search("") == [] and index.search("xyzzy") == []
+
+
+def test_fuzzy_text_search(in_memory_repo_shortened):
+    repo = in_memory_repo_shortened
+
+    assert repo.get_games_by_fuzzy_name_query("space ase") == [repo.get_game_by_id(240340)]
+    assert repo.get_game_by_id(7940) in repo.get_games_by_fuzzy_name_query("Call of Dutty")
+    assert repo.get_games_by_fuzzy_name_query("857r6t2q378g78r1g282g8") == []
+
+    new_game = Game(1, "Ace of Spaces")
+    repo.add_game(new_game)
+    assert new_game in repo.get_games_by_fuzzy_name_query("space ase")
+
+
 def test_user_get_add():
     repo = MemoryRepository()
 
@@ -261,3 +708,29 @@ def test_review_add_remove():
     assert review1 not in repo.get_reviews()
     assert review2 not in repo.get_reviews()
     assert review3 not in repo.get_reviews()
+
+
+def test_rating_summary_follows_reviews():
+    repo = MemoryRepository()
+    user1, user2 = User("Shyamli", "pw12345"), User("Alex", "pw12345")
+    game1, game2 = Game(1, "Domino Game"), Game(2, "Chess Game")
+
+    review1 = create_review(user1, game1, 5, "Great game!")
+    review2 = create_review(user2, game1, 2, "Boring game!")
+    review3 = create_review(user1, game2, 4, "Superb game!")
+    for review in [review1, review2, review3, review1]:
+        repo.add_review(review)
+
+    assert repo.get_reviews_for_game(1) == [review1, review2]
+    assert repo.get_reviews_for_game(2) == [review3]
+    assert repo.get_reviews_for_game(3) == []
+    assert repo.get_rating_summary(1) == RatingSummary(1, 2, 7, {2: 1, 5: 1})
+    assert repo.get_rating_summary(2).average == 4
+    assert repo.get_rating_summary(3) == RatingSummary(3)
+
+    user2.remove_review(review2)
+    game1.remove_review(review2)
+    repo.remove_review(review2)
+    repo.remove_review(review2)
+    assert repo.get_reviews_for_game(1) == [review1]
+    assert repo.get_rating_summary(1) == RatingSummary(1, 1, 5, {5: 1})
@@ -6,6 +6,7 @@ from games.domainmodel.model import Publisher, Genre, Game, Review, User, Wishli
 from games.adapters.datareader.csvdatareader import GameFileCSVReader
 from games.adapters.memory_repository import MemoryRepository, populate
 from games.adapters.repository import AbstractRepository
+import games.adapters.repository as repository
 from games.gameDescription.services import *
 from games.gamesList.services import *
 from games.genres.services import *
@@ -39,6 +40,10 @@ def test_gamesDescription_services():
     # Test get_average_rating
     add_review(repo, "John Doe", 1, 1, "Not Good!")
     assert get_average_rating(repo, 1) == 3.0
+    assert get_review_count(repo, 1) == 2
+    add_review(repo, "John Doe", 1, 5, "Good again!")
+    assert get_average_rating(repo, 1) == 3.67
+    assert get_average_rating(repo, 2) == 0 and get_review_count(repo, 2) == 0
 
     # Test get_user_from_username
     assert get_user_from_username(repo, "John Doe") == user1
@@ -122,6 +127,22 @@ def test_search_services():
     # Test service layer returns an empty list if it searchs for a game which does exist in the repo but does not belong to the given genre
     assert get_games_by_cascade(repo, [horror], None, "TEST") == []
 
+    # Test service layer falls back to allowing typos when nothing matches exactly
+    assert get_games_by_cascade(repo, None, None, "TEST GAEM") == [game2]
+    assert get_games_by_cascade(repo, [horror], None, "TEST GAEM") == []
+
+    # Test service layer ranks games by relevance, ignoring case, when asked to
+    assert get_games_by_cascade(repo, [action], None, "the sequel", SORT_RELEVANCE) == [game3]
+    assert get_games_by_cascade(repo, [horror], None, "test", SORT_RELEVANCE) == []
+
+    # Test service layer pages through the same games, falling back to typos when nothing matches as typed
+    filters, count = get_filters_and_count(repo, GameFilters([action], search_query="TEST GAEM"))
+    assert filters.fuzzy and count == 1
+    assert get_games_page(repo, filters) == ([game2], None)
+    filters, count = get_filters_and_count(repo, GameFilters(search_query="GGUN897s"))
+    assert not filters.fuzzy and count == 2
+    assert get_games_page(repo, filters, limit=1)[0] == get_games_by_name(repo, "GGUN897s")[:1]
+
 
 def test_userProfile_services():
     repo = MemoryRepository()
@@ -174,3 +195,39 @@ def test_authentication_services():
     # Not a real user, should raise UnknownUserException from calling get_user BEFORE failing authentication
     with pytest.raises(UnknownUserException):
         authenticate_user("Logan Nilson", "Password", repo)
+
+
+def test_search_cascade_filters_by_publisher():
+    repo = MemoryRepository()
+    action = Genre("Action")
+    games = []
+    for game_id, publisher_name in [(1, "Activision"), (2, "Ubisoft"), (3, "Activision")]:
+        game = Game(game_id, f"Cascade Game {game_id}")
+        game.publisher = Publisher(publisher_name)
+        game.add_genre(action)
+        repo.add_game(game)
+        games.append(game)
+
+    # The cascade reads every matching game through the same paging as the games list
+    assert get_games_by_cascade(repo, action, "Activision", None) == [games[0], games[2]]
+    assert get_games_by_cascade(repo, None, Publisher("Ubisoft"), "cascade") == [games[1]]
+    assert get_games_by_cascade(repo, [action], ["Ubisoft", "Activision"], "cascade") == \
+           [games[1], games[0], games[2]]
+    assert len(get_games_by_cascade(repo, None, [], None)) == 3
+
+
+def test_process_url_matches_every_genre_unless_asked_for_any(client):
+    repo = repository.repo_instance
+    adventure, action = Genre("Adventure"), Genre("Action")
+
+    def games_matching(url):
+        with client.application.test_request_context(url):
+            filters, count = get_filters_and_count(repo, process_url()["search_filters"])
+        return get_games_page(repo, filters, limit=count or 1)[0] if count else []
+
+    both = repo.get_games_by_genres([adventure, action], match_all=True)
+    either = repo.get_games_by_genres([adventure, action])
+    assert 0 < len(both) < len(either)
+    assert games_matching('/gamesList?genre_filter=Adventure&genre_filter=Action') == both
+    assert games_matching('/gamesList?genre_filter=Adventure&genre_filter=Action&genre_match=all') == both
+    assert games_matching('/gamesList?genre_filter=Adventure&genre_filter=Action&genre_match=any') == either
@@ -1,8 +1,21 @@
 import pytest
 
+from itertools import chain
+
+from sqlalchemy import event
+
+from games import create_app
+from games.adapters import database_repository
 from games.adapters.database_repository import SqlAlchemyRepository
+from games.adapters.datareader.csvdatareader import GameFileCSVReader
 from games.domainmodel.model import *
-from games.adapters.repository import RepositoryException
+from games.adapters.repository import RepositoryException, GameFilters, SORT_RELEVANCE, offset_cursor, LOAD_LIST, \
+    LOAD_DETAIL, LOAD_PROFILE
+import games.gameDescription.services as game_description_services
+
+from utils import get_project_root
+
+TEST_DATA_PATH_DATABASE_LIMITED = get_project_root() / "tests" / "data"
 
 
 
@@ -26,6 +39,9 @@ def test_repo_can_add_retrieve_publisher(session_factory):
     publishers = repo.get_all_publishers()
 
     assert publisher in publishers
+    assert repo.get_publisher("publisher name") == publisher
+    assert repo.get_publisher("not a publisher") is None
+
 def test_repo_can_add_retrieve_genre(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
@@ -66,6 +82,23 @@ def test_get_number_of_games(session_factory):
 
     assert num == 29;
 
+
+def test_filtered_game_counts(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    adventure, action = Genre("Adventure"), Genre("Action")
+
+    assert repo.count_games_by_genres([adventure, action]) == len(repo.get_games_by_genres([adventure, action]))
+    assert repo.count_games_by_genres([adventure, action], match_all=True) == \
+           len(repo.get_games_by_genres([adventure, action], match_all=True))
+    assert repo.count_games_by_genres([]) == 0
+    assert repo.count_games_by_publisher("Activision") == 1
+    assert repo.count_games_by_name_query("SPACE") == len(repo.get_games_by_name_query("space")) == 2
+
+    per_genre = repo.count_games_per_genre()
+    assert per_genre["Action"] == len(repo.get_games_by_genres([action]))
+    assert sum(per_genre.values()) == session_factory().execute("SELECT count(*) FROM game_genres").scalar()
+
+
 def test_get_games_by_genre(session_factory):
     repo = SqlAlchemyRepository(session_factory)
     genre = Genre("Adventure")
@@ -77,6 +110,26 @@ def test_get_games_by_genre(session_factory):
 
     assert adventure_game in games and action_game not in games
 
+    # Any of the genres by default, or all of them with match_all
+    any_games = repo.get_games_by_genres([Genre("Adventure"), Genre("Action")])
+    all_games = repo.get_games_by_genres([Genre("Adventure"), Genre("Action")], match_all=True)
+    assert adventure_game in any_games and action_game in any_games
+    assert len(any_games) == len(set(any_games))
+    assert all(Genre("Adventure") in game.genres and Genre("Action") in game.genres for game in all_games)
+    assert len(all_games) < len(any_games)
+
+def test_games_come_back_newest_first(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    ordinals = [game.release_ordinal for game in repo.get_all_games()]
+    assert ordinals == sorted(ordinals, reverse=True)
+    assert all(ordinal == datetime.strptime(game.release_date, "%b %d, %Y").toordinal()
+               for ordinal, game in zip(ordinals, repo.get_all_games()))
+
+    genre_ordinals = [game.release_ordinal for game in repo.get_games_by_genres([Genre("Action")])]
+    assert genre_ordinals == sorted(genre_ordinals, reverse=True)
+
+
 def test_get_games_by_search_query(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
@@ -86,6 +139,11 @@ def test_get_games_by_search_query(session_factory):
 
     assert game in games
 
+    # Case, accents and symbols are ignored
+    game = repo.get_game_by_id(7940)
+    assert repo.get_games_by_name_query("Duty® 4: MODERN") == [game]
+    assert repo.get_games_by_name_query("call of duty 4 modern warfare") == [game]
+
 def test_get_all_genres(session_factory):
     repo = SqlAlchemyRepository(session_factory)
 
@@ -97,3 +155,376 @@ def test_get_all_genres(session_factory):
     assert (genre1 and genre2) in genres and len(genres) == 3
 
 
+def test_bulk_load_reports_rows_written(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    game1 = Game(40, "Bulk Game")
+    game1.price = 1.99
+    game1.publisher = Publisher("Bulk Publisher")
+    game1.add_genre(Genre("Adventure"))
+    game1.add_genre(Genre("Bulk Genre"))
+    game2 = Game(41, "Bulk Game 2")
+    game2.price = 2.99
+    game2.publisher = Publisher("Bulk Publisher")
+
+    # The duplicate game is skipped, and the existing Adventure genre is left alone
+    stats = repo.bulk_load([game1, game2, game1], chunk_size=1)
+
+    assert stats["games"] == 2 and stats["publishers"] == 1 and stats["genres"] == 1 and stats["game_genres"] == 2
+    assert stats["rows"] == 6 and stats["rows_per_second"] > 0
+    assert repo.get_number_of_games() == 31
+    assert Genre("Bulk Genre") in repo.get_all_genres()
+    assert repo.get_game_by_id(40).publisher == Publisher("Bulk Publisher")
+    assert Genre("Adventure") in repo.get_game_by_id(40).genres
+
+
+def write_changed_catalogue(tmp_path):
+    # The test catalogue with one game renamed and one new game added
+    source = (TEST_DATA_PATH_DATABASE_LIMITED / "games.csv").read_text(encoding="utf-8-sig")
+    assert "Call of Duty® 4: Modern Warfare®" in source
+    changed = source.replace("Call of Duty® 4: Modern Warfare®", "Call of Duty® 4: Remastered")
+    changed += '42,Synced Game,"Oct 21, 2008",1.99,,,,,,,,,,,,,Sync Publisher,,"Action,Sync Genre",,,\n'
+    csv_path = tmp_path / "games.csv"
+    csv_path.write_text(changed, encoding="utf-8")
+    return csv_path
+
+
+def test_sync_catalogue_upserts_only_changed_games(session_factory, tmp_path):
+    repo = SqlAlchemyRepository(session_factory)
+    user = User("username", "password")
+    repo.add_user(user)
+    review = create_review(user, repo.get_game_by_id(7940), 4, "Keep me")
+    repo.add_review(review)
+
+    assert repo.get_game_by_id(7940) not in repo.get_games_by_relevance("remastered")
+
+    reader = GameFileCSVReader(str(write_changed_catalogue(tmp_path)))
+    counts = repo.sync_catalogue(chain.from_iterable(reader.iter_games()))
+
+    assert counts["inserted"] == 1 and counts["updated"] == 1 and counts["unchanged"] == 28
+    assert repo.get_number_of_games() == 30
+    assert repo.get_game_by_id(7940).title == "Call of Duty® 4: Remastered"
+    assert Genre("Sync Genre") in repo.get_game_by_id(42).genres
+    assert repo.get_game_by_id(42).publisher == Publisher("Sync Publisher")
+
+    # Updating a game keeps its links and its reviews
+    assert repo.get_game_by_id(7940).genres == [Genre("Action")]
+    assert [review.comment for review in repo.get_reviews()] == ["Keep me"]
+
+    # Syncing the same file again changes nothing
+    counts = repo.sync_catalogue(chain.from_iterable(reader.iter_games()))
+    assert counts["inserted"] == 0 and counts["updated"] == 0 and counts["unchanged"] == 30
+
+    # The full-text index follows the updated title
+    assert repo.get_game_by_id(7940) in repo.get_games_by_relevance("remastered")
+
+
+def test_catalogue_sync_command(tmp_path):
+    app = create_app({
+        'TESTING': 'True',
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'games.db'}",
+        'TEST_DATA_PATH': TEST_DATA_PATH_DATABASE_LIMITED,
+    })
+
+    result = app.test_cli_runner().invoke(args=['catalogue', 'sync', str(write_changed_catalogue(tmp_path))])
+
+    assert result.exit_code == 0
+    assert "1 inserted, 1 updated, 28 unchanged" in result.output
+
+
+def test_get_games_by_relevance(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    games = repo.get_games_by_relevance("modern warfare")
+    assert games[0] == repo.get_game_by_id(7940)
+    assert len(repo.get_games_by_relevance("space", limit=2)) == 2
+    assert repo.get_games_by_relevance("857r6t2q378g78r1g282g8") == []
+
+    new_game = Game(1, "Warfare Modern Warfare")
+    new_game.price = 0.0
+    new_game.publisher = Publisher("Activision")
+    new_game.description = "Modern warfare."
+    repo.add_game(new_game)
+    assert repo.get_games_by_relevance("modern warfare")[0] == new_game
+
+
+def test_get_games_by_relevance_matches_prefixes(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    # The last word is matched as a prefix
+    assert repo.get_games_by_relevance("call of du")[0] == repo.get_game_by_id(7940)
+    # FTS5 query syntax is searched for as plain words
+    assert repo.get_games_by_relevance('warfare" OR NOT (') == repo.get_games_by_relevance("warfare or not")
+    assert repo.get_games_by_relevance("***") == []
+
+
+def test_names_by_prefix(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    assert repo.get_titles_by_prefix("sp") == ["Space Ace", "Space Pirate Trainer"]
+    assert repo.get_titles_by_prefix("a", limit=2) == ["Alien Breed 3: Descent", "Arcadia"]
+    assert repo.get_publisher_names_by_prefix("ACTI") == ["Activision"]
+    assert repo.get_titles_by_prefix("") == []
+
+    # Publisher names are compared like the memory repository compares them, accents and symbols ignored
+    repo.add_publisher(Publisher("Électronique Arts™"))
+    assert repo.get_publisher_names_by_prefix("electronique-a") == ["Électronique Arts™"]
+
+    # Both lookups are range scans of an index
+    assert "ix_games_search_key" in query_plans(session_factory, lambda: repo.get_titles_by_prefix("sp"))[0]
+    plan = query_plans(session_factory, lambda: repo.get_publisher_names_by_prefix("sp"))[0]
+    assert "ix_publishers_search_key_name" in plan and "TEMP B-TREE" not in plan
+
+
+def test_get_games_by_fuzzy_name_query(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    assert repo.get_games_by_fuzzy_name_query("space ase") == [repo.get_game_by_id(240340)]
+    assert repo.get_games_by_fuzzy_name_query("857r6t2q378g78r1g282g8") == []
+
+    new_game = Game(1, "Ace of Spaces")
+    new_game.price = 0.0
+    new_game.publisher = Publisher("Activision")
+    repo.add_game(new_game)
+    assert new_game in repo.get_games_by_fuzzy_name_query("space ase")
+
+    # The words live in the database, so games written through another repository (another process) are found too
+    other_repo = SqlAlchemyRepository(session_factory)
+    other_game = Game(2, "Spacce Ace")
+    other_game.price = 0.0
+    other_repo.sync_catalogue([other_game])
+    assert 2 in [game.game_id for game in repo.get_games_by_fuzzy_name_query("space ase")]
+
+
+def test_filtered_relevance_search_ranks_before_the_limit(session_factory, monkeypatch):
+    repo = SqlAlchemyRepository(session_factory)
+    ranked = repo.get_games_by_relevance("space")
+    assert len(ranked) > 1
+    outsider = ranked[-1]
+
+    # With only the best match kept, a filter on the last one still finds it
+    monkeypatch.setattr(database_repository, "RELEVANCE_LIMIT", 1)
+    by_outsider = GameFilters(publisher=outsider.publisher.publisher_name, search_query="space")
+    games, _ = repo.get_games_page(by_outsider, SORT_RELEVANCE, limit=10)
+    assert outsider in games
+    assert repo.count_games(by_outsider, SORT_RELEVANCE) == 1
+
+
+def test_get_games_page(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    adventure, action = Genre("Adventure"), Genre("Action")
+
+    def walk_pages(filters, sort=None, limit=4):
+        games, cursor = repo.get_games_page(filters, sort, limit)
+        while cursor is not None:
+            page, cursor = repo.get_games_page(filters, sort, limit, cursor)
+            games += page
+        return games
+
+    # Pages come back in the same order as the list queries, whichever cursor is followed
+    assert repo.get_games_page(GameFilters(), limit=5)[0] == repo.get_all_games()[:5]
+    assert repo.get_games_page(GameFilters(), limit=5, cursor=offset_cursor(5))[0] == repo.get_all_games()[5:10]
+    assert walk_pages(GameFilters()) == repo.get_all_games()
+    assert walk_pages(GameFilters([adventure, action])) == repo.get_games_by_genres([adventure, action])
+    assert walk_pages(GameFilters([adventure, action], match_all_genres=True)) == \
+           repo.get_games_by_genres([adventure, action], match_all=True)
+    assert walk_pages(GameFilters(search_query="SPACE")) == repo.get_games_by_name_query("space")
+    assert walk_pages(GameFilters(publisher="Activision")) == [repo.get_game_by_id(7940)]
+
+    relevance = GameFilters([action], search_query="space")
+    assert walk_pages(relevance, SORT_RELEVANCE, limit=1) == \
+           [game for game in repo.get_games_by_relevance("space") if action in game.genres]
+    assert walk_pages(GameFilters(search_query="space ase", fuzzy=True)) == [repo.get_game_by_id(240340)]
+
+    # Counts match the pages
+    assert repo.count_games(GameFilters()) == repo.get_number_of_games()
+    assert repo.count_games(GameFilters([adventure, action])) == len(repo.get_games_by_genres([adventure, action]))
+    assert repo.count_games(relevance, SORT_RELEVANCE) == len(walk_pages(relevance, SORT_RELEVANCE))
+
+    # A keyset page is read straight off the release_ordinal index instead of sorting every game
+    cursor = repo.get_games_page(GameFilters(), limit=7)[1]
+    plan = query_plans(session_factory, lambda: repo.get_games_page(GameFilters(), limit=7, cursor=cursor))[0]
+    assert "ix_games_release_ordinal" in plan and "TEMP B-TREE" not in plan
+
+
+def test_genre_filters_combine_in_one_statement(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    adventure, action = Genre("Adventure"), Genre("Action")
+
+    # Games with both genres and "the" in the title, by a given publisher, a page at a time
+    both = GameFilters([adventure, action, action], match_all_genres=True, search_query="THE")
+    assert [game.game_id for game in repo.get_games_page(both, limit=10)[0]] == [1581010, 1570340]
+    assert repo.count_games(both) == 2
+    by_thq = GameFilters([adventure, action], match_all_genres=True, publisher="THQ Nordic", search_query="dead")
+    assert repo.get_games_page(by_thq) == ([repo.get_game_by_id(231330)], None)
+    assert repo.count_games(by_thq) == 1
+    assert repo.count_games(GameFilters([adventure, Genre("Casual")], match_all_genres=True)) == 1
+    assert repo.count_games(GameFilters([adventure, Genre("Casual")])) == 10
+
+    # The genres, publisher, search, order and LIMIT all go in the statement that picks the page, and counting
+    # joins the games to those with every genre, found with GROUP BY ... HAVING
+    def page_and_count():
+        repo.get_games_page(by_thq, limit=3)
+        repo.count_games(by_thq)
+
+    statements = record_statements(repo, session_factory, page_and_count)
+    page, count = statements[0], statements[-1]
+    assert all(part in page for part in ["EXISTS", "publisher_name", "search_key LIKE", "ORDER BY", "LIMIT"])
+    assert all(part in count for part in ["JOIN", "GROUP BY", "HAVING count(DISTINCT", "publisher_name"])
+
+
+def count_statements(repo, session_factory, render_page) -> int:
+    # How many SQL statements render_page runs, starting from a fresh session as each request does
+    return len(record_statements(repo, session_factory, render_page))
+
+
+def record_statements(repo, session_factory, render_page) -> list:
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engine = session_factory.kw['bind']
+    repo.reset_session()
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        render_page()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return statements
+
+
+def query_plans(session_factory, run) -> list:
+    # SQLite's plan for each SELECT that run executes, explained with the parameters it was executed with
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    engine = session_factory.kw['bind']
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        run()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    with engine.connect() as connection:
+        return [" ".join(row[3] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters))
+                for statement, parameters in executed if statement.lstrip().upper().startswith("SELECT")]
+
+
+def test_load_profiles_keep_statement_counts_constant(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+
+    # A list page reads each game's genres and publisher
+    def games_list(limit, load):
+        def render():
+            for game in repo.get_games_page(GameFilters(), limit=limit, load=load)[0]:
+                [genre.genre_name for genre in game.genres], game.publisher.publisher_name
+        return render
+
+    assert count_statements(repo, session_factory, games_list(2, LOAD_LIST)) == \
+           count_statements(repo, session_factory, games_list(12, LOAD_LIST))
+    # Without a profile every game costs more queries
+    assert count_statements(repo, session_factory, games_list(12, None)) > \
+           count_statements(repo, session_factory, games_list(2, None))
+
+    # A game's page reads its reviews and who wrote them
+    user_names = [f"reviewer{number}" for number in range(3)]
+    for user_name in user_names:
+        repo.add_user(User(user_name, "password"))
+    reviewed = repo.get_game_by_id(7940)
+    for number, user_name in enumerate(user_names):
+        repo.add_review(create_review(repo.get_user(user_name), reviewed, number + 1, "A review"))
+
+    def game_page(game_id):
+        def render():
+            game = repo.get_game_by_id(game_id, LOAD_DETAIL)
+            [genre.genre_name for genre in game.genres], game.publisher.publisher_name
+            assert len([review.user.username for review in game.reviews]) == (3 if game_id == 7940 else 0)
+        return render
+
+    assert count_statements(repo, session_factory, game_page(7940)) == \
+           count_statements(repo, session_factory, game_page(316260))
+
+    # A profile page reads the user's wishlist and each game's genres
+    for user_name, wishes in zip(user_names, [1, 4]):
+        user = repo.get_user(user_name)
+        for game in repo.get_all_games()[:wishes]:
+            repo.add_game_to_wishlist(user, game)
+
+    def profile_page(user_name, wishes):
+        def render():
+            user = repo.get_user(user_name, LOAD_PROFILE)
+            games = user.wishlist.list_of_games()
+            assert len([[genre.genre_name for genre in game.genres] for game in games]) == wishes
+        return render
+
+    assert count_statements(repo, session_factory, profile_page("reviewer0", 1)) == \
+           count_statements(repo, session_factory, profile_page("reviewer1", 4))
+
+    with pytest.raises(ValueError):
+        repo.get_game_by_id(7940, "everything")
+
+
+def test_rating_summary_follows_reviews(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    for user_name in ["reviewer0", "reviewer1"]:
+        repo.add_user(User(user_name, "password"))
+
+    review = create_review(repo.get_user("reviewer0"), repo.get_game_by_id(7940), 5, "Great")
+    repo.add_review(review)
+    repo.add_review(create_review(repo.get_user("reviewer1"), repo.get_game_by_id(7940), 2, "Dull"))
+    repo.add_review(create_review(repo.get_user("reviewer1"), repo.get_game_by_id(316260), 4, "Fine"))
+    # Adding a stored review again doesn't count it twice
+    repo.add_review(review)
+
+    assert repo.get_rating_summary(7940) == RatingSummary(7940, 2, 7, {2: 1, 5: 1})
+    assert repo.get_rating_summary(316260).average == 4
+    assert repo.get_rating_summary(1) == RatingSummary(1)
+    reviews = repo.get_reviews_for_game(7940)
+    assert [(review.user.username, review.rating) for review in reviews] == [("reviewer0", 5), ("reviewer1", 2)]
+
+    removed = reviews[1]
+    removed.user.remove_review(removed)
+    removed.game.remove_review(removed)
+    repo.remove_review(removed)
+    assert repo.get_rating_summary(7940) == RatingSummary(7940, 1, 5, {5: 1})
+    assert [review.comment for review in repo.get_reviews_for_game(7940)] == ["Great"]
+    assert len(repo.get_reviews()) == 2
+
+    # Changing a stored review's rating moves it in the histogram, and editing its comment changes nothing
+    stored = repo.get_reviews_for_game(7940)[0]
+    stored.rating = 3
+    stored.comment = "Good"
+    repo.add_review(stored)
+    assert repo.get_rating_summary(7940) == RatingSummary(7940, 1, 3, {3: 1})
+    stored.comment = "Good enough"
+    repo.add_review(stored)
+    assert repo.get_rating_summary(7940) == RatingSummary(7940, 1, 3, {3: 1})
+
+
+def test_game_page_reads_only_its_own_reviews(session_factory):
+    repo = SqlAlchemyRepository(session_factory)
+    user_names = [f"reviewer{number}" for number in range(3)]
+    for user_name in user_names:
+        repo.add_user(User(user_name, "password"))
+    repo.add_review(create_review(repo.get_user("reviewer0"), repo.get_game_by_id(7940), 4, "A review"))
+
+    def game_page():
+        game = game_description_services.get_game_by_id(repo, 7940, LOAD_LIST)
+        [genre.genre_name for genre in game.genres], game.publisher.publisher_name
+        reviews = game_description_services.get_game_reviews(repo, 7940)
+        assert [review.user.username for review in reviews] == ["reviewer0"]
+        assert game_description_services.get_review_count(repo, 7940) == 1
+        assert game_description_services.get_average_rating(repo, 7940) == 4
+
+    statements = record_statements(repo, session_factory, game_page)
+
+    # Reviews of every other game don't change what the page runs
+    for game in repo.get_all_games():
+        if game.game_id != 7940:
+            for user_name in user_names:
+                repo.add_review(create_review(repo.get_user(user_name), game, 3, "Another review"))
+    assert len(repo.get_reviews()) > 50
+    assert record_statements(repo, session_factory, game_page) == statements
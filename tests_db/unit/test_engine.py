@@ -0,0 +1,191 @@
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import clear_mappers
+from sqlalchemy.pool import NullPool, QueuePool, StaticPool
+
+from games import create_app
+from games.adapters.engine import create_database_engine, pool_statistics, sqlite_pragma_statements, read_only_uri
+
+from utils import get_project_root
+
+
+def test_pool_reuses_connections(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'pool.db'}", "queue", pool_size=2, max_overflow=0)
+    assert isinstance(engine.pool, QueuePool)
+
+    for _ in range(10):
+        with engine.connect() as connection:
+            connection.exec_driver_sql("SELECT 1")
+    statistics = pool_statistics(engine)
+    assert statistics["checkouts"] == 10 and statistics["connections_opened"] == 1
+    assert statistics["checked_out"] == 0 and statistics["peak_checked_out"] == 1
+    assert statistics["longest_wait"] >= statistics["average_wait"] >= 0
+
+    # Threads holding connections at the same time need more of them, up to the size of the pool
+    def query(_):
+        with engine.connect() as connection:
+            return connection.exec_driver_sql("SELECT 1").scalar()
+
+    with ThreadPoolExecutor(4) as executor:
+        assert list(executor.map(query, range(40))) == [1] * 40
+    assert pool_statistics(engine)["connections_opened"] <= 2
+
+    # The statistics carry on after the pool is recreated
+    engine.dispose()
+    with engine.connect():
+        pass
+    assert pool_statistics(engine)["checkouts"] == 51
+
+
+def test_null_pool_connects_every_time(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'pool.db'}", "null")
+    assert isinstance(engine.pool, NullPool)
+    for _ in range(3):
+        with engine.connect():
+            pass
+    assert pool_statistics(engine)["connections_opened"] == 3
+
+
+def test_static_pool_shares_an_in_memory_database():
+    engine = create_database_engine("sqlite://", "static")
+    assert isinstance(engine.pool, StaticPool)
+    with engine.begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE shared (value INTEGER)")
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM shared").scalar() == 0
+
+    with pytest.raises(ValueError):
+        create_database_engine("sqlite://", "unknown")
+
+
+def test_app_uses_configured_pool(tmp_path):
+    clear_mappers()
+    app = create_app({
+        'TESTING': 'True',
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'games.db'}",
+        'DATABASE_POOL': 'queue',
+        'DATABASE_POOL_SIZE': 3,
+        'TEST_DATA_PATH': get_project_root() / "tests" / "data",
+        'WTF_CSRF_ENABLED': False,
+    })
+    client = app.test_client()
+    for _ in range(5):
+        assert client.get('/gamesList').status_code == 200
+
+    # Pages are read through the read engine, which gets the configured pool, and writes get a small pool of their own
+    engine = app.extensions['database_read_engine']
+    assert isinstance(engine.pool, QueuePool) and engine.pool.size() == 3
+    write_engine = app.extensions['database_engine']
+    assert isinstance(write_engine.pool, QueuePool) and write_engine.pool.size() == 2
+    with write_engine.connect() as connection:
+        assert current_pragmas(connection)["journal_mode"] == "wal"
+    statistics = pool_statistics(engine)
+    assert statistics["checked_out"] == 0
+    assert statistics["connections_opened"] < statistics["checkouts"]
+    engine.dispose()
+    write_engine.dispose()
+
+
+def current_pragmas(connection) -> dict:
+    names = ["journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store", "busy_timeout"]
+    return {name: connection.exec_driver_sql(f"PRAGMA {name}").scalar() for name in names}
+
+
+def test_pragmas_are_set_on_every_connection(tmp_path):
+    pragmas = {"journal_mode": "wal", "synchronous": "normal", "cache_size": "-2048", "mmap_size": 1 << 20,
+               "temp_store": "memory", "busy_timeout": "1500"}
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'pragmas.db'}", "null", sqlite_pragmas=pragmas)
+    for _ in range(2):
+        with engine.connect() as connection:
+            # synchronous NORMAL is 1 and temp_store MEMORY is 2
+            assert current_pragmas(connection) == {"journal_mode": "wal", "synchronous": 1, "cache_size": -2048,
+                                                   "mmap_size": 1 << 20, "temp_store": 2, "busy_timeout": 1500}
+
+    # Empty values leave SQLite's defaults
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'defaults.db'}", "null",
+                                    sqlite_pragmas={"journal_mode": "", "synchronous": None})
+    with engine.connect() as connection:
+        assert current_pragmas(connection)["journal_mode"] == "delete"
+
+
+def test_pragma_values_are_checked():
+    assert sqlite_pragma_statements({"temp_store": " Memory ", "busy_timeout": 10}) == \
+           ["PRAGMA busy_timeout = 10", "PRAGMA temp_store = MEMORY"]
+    for pragmas in [{"journal_mode": "wal; DROP TABLE games"}, {"cache_size": "lots"}, {"page_size": 4096}]:
+        with pytest.raises(ValueError):
+            sqlite_pragma_statements(pragmas)
+
+
+def test_statements_are_timed(tmp_path):
+    engine = create_database_engine(f"sqlite:///{tmp_path / 'timed.db'}", "queue")
+    with engine.connect() as connection:
+        for _ in range(3):
+            connection.exec_driver_sql("SELECT 1")
+        with pytest.raises(OperationalError):
+            connection.exec_driver_sql("SELECT * FROM missing")
+    statistics = pool_statistics(engine)
+    assert statistics["statements"] == 3
+    assert statistics["longest_statement_time"] >= statistics["average_statement_time"] > 0
+
+
+def test_read_only_uri_opens_the_file_read_only(tmp_path):
+    database_uri = f"sqlite:///{tmp_path / 'games #1.db'}"
+    with create_database_engine(database_uri, "null").begin() as connection:
+        connection.exec_driver_sql("CREATE TABLE games (game_id INTEGER PRIMARY KEY)")
+        connection.exec_driver_sql("INSERT INTO games VALUES (1)")
+
+    engine = create_database_engine(read_only_uri(database_uri), "queue")
+    with engine.connect() as connection:
+        assert connection.exec_driver_sql("SELECT count(*) FROM games").scalar() == 1
+        with pytest.raises(OperationalError, match="readonly"):
+            connection.exec_driver_sql("INSERT INTO games VALUES (2)")
+
+    # In-memory databases can't be shared between engines, and other databases need their replica named
+    assert read_only_uri("sqlite://") is None
+    assert read_only_uri("postgresql://localhost/games") is None
+
+
+def test_app_routes_get_requests_to_the_read_engine(tmp_path):
+    clear_mappers()
+    app = create_app({
+        'TESTING': 'True',
+        'REPOSITORY': 'database',
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'games.db'}",
+        'TEST_DATA_PATH': get_project_root() / "tests" / "data",
+        'WTF_CSRF_ENABLED': False,
+    })
+    engines = {'read': app.extensions['database_read_engine'], 'write': app.extensions['database_engine']}
+    client = app.test_client()
+
+    def statements_run(make_requests) -> dict:
+        before = {name: pool_statistics(engine)['statements'] for name, engine in engines.items()}
+        make_requests()
+        return {name: pool_statistics(engine)['statements'] - before[name] for name, engine in engines.items()}
+
+    # Registering and logging in are POSTs, and go to the write engine
+    def log_in():
+        client.post('/authentication/register', data={'user_name': 'reader', 'password': 'Testing&Checking12345'})
+        client.post('/authentication/login', data={'user_name': 'reader', 'password': 'Testing&Checking12345'})
+    assert statements_run(log_in)['read'] == 0
+
+    def browse():
+        for url in ['/', '/gamesList', '/gameDescription?id=7940', '/userProfile']:
+            assert client.get(url).status_code == 200
+    ran = statements_run(browse)
+    assert ran['read'] > 0 and ran['write'] == 0
+
+    # Toggling the wishlist is a GET that writes, and posting a review is a POST
+    def write():
+        assert client.get('/gameDescription/wishlist?id=7940').status_code == 302
+        client.post('/review', data={'game_id': 7940, 'rating': '4', 'review_text': 'Read it back'})
+    assert statements_run(write)['write'] > 0
+
+    # Both writes can be read straight back through the read engine
+    response = client.get('/gameDescription?id=7940')
+    assert b'Read it back' in response.data and b'Remove from wishlist' in response.data
+    for engine in engines.values():
+        engine.dispose()
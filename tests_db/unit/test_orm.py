@@ -3,8 +3,12 @@ import pytest
 import datetime
 
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import sessionmaker
 
 from games.domainmodel.model import *
+from games.adapters.database_repository import SqlAlchemyRepository
+from games.adapters.orm import migrate_database
+from games.adapters.repository import GameFilters
 
 
 def insert_users(empty_session, values):
@@ -185,3 +189,96 @@ def test_genres_for_game(empty_session):
 
     for genre in genres:
         assert genre in game.genres
+
+
+def test_migrate_database_adds_new_columns(empty_session):
+    # A games table from before release_ordinal, content_hash and the full-text index were added
+    empty_session.execute('DROP TABLE games_search')
+    empty_session.execute('DROP TABLE title_word_deletions')
+    empty_session.execute('DROP TABLE games')
+    empty_session.execute('CREATE TABLE games (game_id INTEGER PRIMARY KEY, game_title TEXT NOT NULL, '
+                          'game_price FLOAT NOT NULL, release_date VARCHAR(50) NOT NULL, game_description TEXT, '
+                          'game_image_url TEXT, game_website_url TEXT, publisher_name VARCHAR(255))')
+    empty_session.execute('INSERT INTO games (game_id, game_title, game_price, release_date) '
+                          'VALUES (1, "Test Game", 5.99, "Oct 21, 2008"), (2, "Undated Game", 0, "Coming soon")')
+    # and publishers from before their search_key
+    empty_session.execute('DROP TABLE publishers')
+    empty_session.execute('CREATE TABLE publishers (name VARCHAR(255) PRIMARY KEY)')
+    empty_session.execute('INSERT INTO publishers (name) VALUES ("Éclair Games")')
+
+    # Running it twice is harmless
+    migrate_database(empty_session.connection())
+    migrate_database(empty_session.connection())
+
+    rows = list(empty_session.execute('SELECT release_ordinal, content_hash, search_key FROM games'))
+    assert rows == [(datetime(2008, 10, 21).toordinal(), None, "test game"),
+                    (UNKNOWN_RELEASE_ORDINAL, None, "undated game")]
+    assert empty_session.query(Game).get(1).release_ordinal == datetime(2008, 10, 21).toordinal()
+
+    # The game whose date can't be read comes last, and a keyset cursor pages on to it
+    empty_session.commit()
+    repo = SqlAlchemyRepository(sessionmaker(bind=empty_session.get_bind()))
+    first_page, cursor = repo.get_games_page(GameFilters(), limit=1)
+    assert [game.game_id for game in first_page] == [1]
+    assert [game.game_id for game in repo.get_games_page(GameFilters(), limit=1, cursor=cursor)[0]] == [2]
+
+    indexes = [row[1] for row in empty_session.execute("PRAGMA index_list('games')")]
+    assert 'ix_games_release_ordinal' in indexes
+
+    assert list(empty_session.execute('SELECT name, search_key FROM publishers')) == [("Éclair Games", "eclair games")]
+    indexes = [row[1] for row in empty_session.execute("PRAGMA index_list('publishers')")]
+    assert 'ix_publishers_search_key_name' in indexes
+
+    # Games written before the index existed are searchable
+    assert list(empty_session.execute("SELECT rowid FROM games_search WHERE games_search MATCH 'test'")) == [(1,)]
+    # and their title words are in the typo tolerant search's vocabulary
+    assert list(empty_session.execute("SELECT word FROM title_word_deletions WHERE deletion = 'tst'")) == [('test',)]
+
+
+# The lookups the app makes on its link and child tables, and the index each one should use. Either game_genres index
+# answers a genre filter's per game check without visiting the table.
+HOT_QUERIES = [
+    ("SELECT games.game_id FROM games WHERE EXISTS (SELECT 1 FROM game_genres WHERE game_genres.game_id = "
+     "games.game_id AND game_genres.genre_name IN ('Action', 'Indie'))", 'COVERING INDEX ix_game_genres_'),
+    ("SELECT genre_name FROM game_genres WHERE game_id = 7940", 'ix_game_genres_game_id_genre_name'),
+    ("SELECT game_id FROM game_genres WHERE genre_name = 'Action'", 'ix_game_genres_genre_name_game_id'),
+    ("SELECT * FROM reviews WHERE game_id = 7940", 'ix_reviews_game_id'),
+    ("SELECT * FROM reviews WHERE user_name = 'tester'", 'ix_reviews_user_name'),
+    ("SELECT * FROM history WHERE user_name = 'tester'", 'ix_history_user_name'),
+    ("SELECT * FROM wishlists WHERE user = 'tester'", 'ix_wishlists_user'),
+    ("SELECT game_id FROM wishlist_games WHERE wishlist_id = 1", 'ix_wishlist_games_wishlist_id_game_id'),
+]
+
+
+def test_migrate_database_adds_missing_indexes(empty_session):
+    # A database from before the indexes were declared
+    for table in ['game_genres', 'reviews', 'history', 'wishlists', 'wishlist_games']:
+        for row in list(empty_session.execute(f"PRAGMA index_list('{table}')")):
+            if row[1].startswith('ix_'):
+                empty_session.execute(f'DROP INDEX {row[1]}')
+    assert 'SCAN game_genres' in " ".join(
+        row[3] for row in empty_session.execute(f'EXPLAIN QUERY PLAN {HOT_QUERIES[0][0]}'))
+
+    migrate_database(empty_session.connection())
+    migrate_database(empty_session.connection())
+
+    for query, index in HOT_QUERIES:
+        plan = " ".join(row[3] for row in empty_session.execute(f'EXPLAIN QUERY PLAN {query}'))
+        assert index in plan, query
+        assert 'SCAN game_genres' not in plan and 'SCAN reviews' not in plan
+
+
+def test_migrate_database_totals_existing_reviews(empty_session):
+    # A database from before the rating summaries, with reviews already written
+    empty_session.execute('DROP TABLE game_rating_summary')
+    insert_users(empty_session, [("reviewer0", "Password123!"), ("reviewer1", "Password123!")])
+    for user_name, game_id, rating in [("reviewer0", 1, 5), ("reviewer1", 1, 2), ("reviewer0", 2, 4)]:
+        empty_session.execute('INSERT INTO reviews (user_name, game_id, comment, rating) '
+                              'VALUES (:user_name, :game_id, "A review", :rating)',
+                              {'user_name': user_name, 'game_id': game_id, 'rating': rating})
+
+    migrate_database(empty_session.connection())
+    migrate_database(empty_session.connection())
+
+    rows = list(empty_session.execute('SELECT * FROM game_rating_summary ORDER BY game_id'))
+    assert rows == [(1, 2, 7, 0, 1, 0, 0, 1), (2, 1, 4, 0, 0, 0, 1, 0)]
@@ -5,7 +5,10 @@ from games.adapters.orm import metadata
 def test_database_populate_correct_table_names(database_engine):
 
     inspector = inspect(database_engine)
-    assert inspector.get_table_names() == ['game_genres', 'games', 'genres', 'history', 'publishers', 'reviews', 'users', 'wishlist_games', 'wishlists']
+    assert inspector.get_table_names() == ['game_genres', 'game_rating_summary', 'games', 'games_search',
+                                           'games_search_config', 'games_search_data', 'games_search_docsize',
+                                           'games_search_idx', 'genres', 'history', 'publishers', 'reviews',
+                                           'title_word_deletions', 'users', 'wishlist_games', 'wishlists']
 
 def test_database_populate_select_all_games(database_engine):
     inspector = inspect(database_engine)